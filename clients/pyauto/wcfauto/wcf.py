@@ -52,6 +52,7 @@ class WxMsgV2(WxMsg):
         self._content = msg.content
         self._thumb = msg.thumb.replace("\\", "/")
         self._extra = msg.extra.replace("\\", "/")
+        self._at = None
         self.__data = {'isSelf': True if self._is_self else False,
                        'isGroup': True if self._is_group else False,
                        'isPyq': True if self._type == 0 else False,
@@ -158,19 +159,6 @@ class WxMsgV2(WxMsg):
         """是否群聊消息"""
         return self._is_group
 
-    def is_at(self, wxid) -> bool:
-        """是否被 @：群消息，在 @ 名单里，并且不是 @ 所有人"""
-        if not self.from_group():
-            return False  # 只有群消息才能 @
-
-        if not re.findall(f"<atuserlist>.*({wxid}).*</atuserlist>", self.xml):
-            return False  # 不在 @ 清单里
-
-        if re.findall(r"@(?:所有人|all|All)", self.content):
-            return False  # 排除 @ 所有人
-
-        return True
-
     def is_text(self) -> bool:
         """是否文本消息"""
         return self.type == 1
@@ -0,0 +1,59 @@
+#! /usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""`Wcf` 与 `AsyncWcf` 的吞吐对比
+
+    PYTHONPATH=. python benchmarks/bench_async.py [-n 5000] [-c 200] [-d 0.0005]
+
+替身服务器运行在子进程中，`-d` 模拟服务端处理耗时。
+"""
+
+import argparse
+import asyncio
+import time
+
+from standin import StandInProcess
+from wcferry import wcf_pb2
+from wcferry import AsyncWcf, Wcf
+
+
+def bench_sync(port: int, n: int) -> float:
+    wcf = Wcf(host="127.0.0.1", port=port, block=False)
+    start = time.perf_counter()
+    for i in range(n):
+        wcf.send_text(f"msg {i}", "filehelper")
+    elapsed = time.perf_counter() - start
+    wcf.cleanup()
+    return n / elapsed
+
+
+async def bench_async(port: int, n: int, concurrency: int) -> float:
+    async with AsyncWcf(host="127.0.0.1", port=port) as wcf:
+        sem = asyncio.Semaphore(concurrency)
+
+        async def one(i):
+            async with sem:
+                await wcf.send_text(f"msg {i}", "filehelper")
+
+        start = time.perf_counter()
+        await asyncio.gather(*(one(i) for i in range(n)))
+        return n / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("-n", type=int, default=5000, help="请求数")
+    parser.add_argument("-c", type=int, default=200, help="并发协程数")
+    parser.add_argument("-d", "--delay", type=float, default=0.0005, help="服务端处理 send_text 的耗时（秒）")
+    parser.add_argument("-p", "--port", type=int, default=19086)
+    args = parser.parse_args()
+
+    delays = {wcf_pb2.FUNC_SEND_TXT: args.delay}
+    with StandInProcess(args.port, delays):
+        print(f"Wcf      : {bench_sync(args.port, args.n):10.0f} req/s")
+    with StandInProcess(args.port, delays):
+        print(f"AsyncWcf : {asyncio.run(bench_async(args.port, args.n, args.c)):10.0f} req/s (c={args.c})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+#! /usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""同一张图片发给很多群：逐个 `send_image` 与 `broadcast` 的对比，以及中途退出后从断点继续
+
+    PYTHONPATH=. python benchmarks/bench_broadcast.py [-n 300] [--delay 0.002] [--pool 1]
+
+替身服务器处理每个发送请求耗时 `--delay` 秒。
+"""
+
+import argparse
+import os
+import tempfile
+import time
+
+from standin import StandInServer
+from wcferry import Wcf, wcf_pb2
+from wcferry.broadcast import summarize
+
+
+class Crash(Exception):
+    pass
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("-n", type=int, default=300, help="接收人数")
+    parser.add_argument("--delay", type=float, default=0.002, help="服务端处理一个发送请求的耗时（秒）")
+    parser.add_argument("--pool", type=int, default=1, help="命令通道连接数")
+    parser.add_argument("-p", "--port", type=int, default=19086)
+    args = parser.parse_args()
+
+    rooms = [f"room{i}@chatroom" for i in range(args.n)]
+    delays = {wcf_pb2.FUNC_SEND_IMG: args.delay}
+    with StandInServer(args.port, delays, polyamorous=args.pool > 1), tempfile.TemporaryDirectory() as dir:
+        image = os.path.join(dir, "image.jpg")
+        with open(image, "wb") as f:
+            f.write(b"\xff\xd8\xff" + os.urandom(1 << 16))
+        wcf = Wcf(host="127.0.0.1", port=args.port, block=False, pool_size=args.pool)
+
+        start = time.perf_counter()
+        for room in rooms:
+            wcf.send_image(image, room)
+        print(f"逐个 send_image: {(time.perf_counter() - start) * 1000:8.1f} ms")
+
+        start = time.perf_counter()
+        report = wcf.broadcast("image", image, rooms)
+        print(f"broadcast      : {(time.perf_counter() - start) * 1000:8.1f} ms  {summarize(report, 'image')}")
+
+        checkpoint = os.path.join(dir, "broadcast.ckpt")
+        sent = []
+
+        def crash(receiver, entry):
+            sent.append(receiver)
+            if len(sent) == args.n // 2:
+                raise Crash()
+
+        try:
+            wcf.broadcast("image", image, rooms, checkpoint=checkpoint, callback=crash)
+        except Crash:
+            print(f"中途退出        : 已发送 {len(sent)}")
+        report = wcf.broadcast("image", image, rooms, checkpoint=checkpoint)
+        print(f"从断点继续      : {summarize(report, 'image')}")
+        wcf.cleanup()
+
+
+if __name__ == "__main__":
+    main()
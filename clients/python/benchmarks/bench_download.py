@@ -0,0 +1,84 @@
+#! /usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""`download_image` 从请求下载到拿到解密路径的延迟：原先每秒轮询一次与 `CompletionTracker` 自适应探测对比
+
+    PYTHONPATH=. python benchmarks/bench_download.py [-n 200] [--min 0.05] [--max 0.8]
+
+替身服务器在 `download_attach` 之后随机等待 [min, max] 秒才让 `decrypt_image` 成功。
+"""
+
+import argparse
+import random
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+
+from standin import StandInServer
+from wcferry import Wcf
+
+
+def legacy_download(wcf: Wcf, id: int, extra: str, dir: str, timeout: int = 30) -> str:
+    """原先的实现：请求下载后每秒尝试解密一次"""
+    if wcf.download_attach(id, "", extra) != 0:
+        return ""
+    cnt = 0
+    while cnt < timeout:
+        path = wcf.decrypt_image(extra, dir)
+        if path:
+            return path
+        time.sleep(1)
+        cnt += 1
+    return ""
+
+
+def run_legacy(wcf: Wcf, n: int) -> list:
+    latencies = []
+
+    def one(i):
+        start = time.perf_counter()
+        legacy_download(wcf, i, f"legacy_{i}.dat", "/tmp")
+        latencies.append((time.perf_counter() - start) * 1000)
+
+    with ThreadPoolExecutor(max_workers=n) as pool:  # 每张图一个线程，同时等待
+        wait([pool.submit(one, i) for i in range(n)])
+    return latencies
+
+
+def run_tracker(wcf: Wcf, n: int) -> list:
+    latencies = []
+    futures = []
+    for i in range(n):
+        start = time.perf_counter()
+        futures.append(wcf.download_image_future(
+            i, f"tracked_{i}.dat", "/tmp",
+            callback=lambda f, start=start: latencies.append((time.perf_counter() - start) * 1000)))
+    wait(futures)
+    return latencies
+
+
+def report(name: str, latencies: list, rpcs: int) -> None:
+    latencies = sorted(latencies)
+    p99 = latencies[int(len(latencies) * 0.99) - 1]
+    print(f"{name:<10}: p50 {statistics.median(latencies):8.1f} ms, p99 {p99:8.1f} ms, "
+          f"{rpcs / len(latencies):5.1f} RPC/张")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("-n", type=int, default=200, help="图片数")
+    parser.add_argument("--min", type=float, default=0.05, help="服务端最短下载耗时（秒）")
+    parser.add_argument("--max", type=float, default=0.8, help="服务端最长下载耗时（秒）")
+    parser.add_argument("-p", "--port", type=int, default=19086)
+    args = parser.parse_args()
+
+    with StandInServer(args.port, attach_latency=lambda: random.uniform(args.min, args.max)) as server:
+        wcf = Wcf(host="127.0.0.1", port=args.port, block=False)
+        for name, run in (("sleep(1)", run_legacy), ("tracker", run_tracker)):
+            served = server.served
+            report(name, run(wcf, args.n), server.served - served)
+        wcf.cleanup()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+#! /usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""一个群集中刷图时，逐张 `download_image` 与 `ImageDownloader` 的对比：总耗时、其他群图片的等待时间
+
+    PYTHONPATH=. python benchmarks/bench_downloader.py [-n 200] [-c 8] [--latency 0.2]
+
+替身服务器在 `download_attach` 之后 `--latency` 秒才让 `decrypt_image` 成功。
+"""
+
+import argparse
+import statistics
+import tempfile
+import time
+from concurrent.futures import wait
+
+from standin import StandInServer
+from wcferry import ImageDownloader, Wcf, WxMsg, wcf_pb2
+
+
+def burst(n: int, quiet: int) -> list:
+    """大群 `n` 张图，另外 `quiet` 个小群各一张，小群的图排在大群之后到达"""
+    msgs = []
+    for i in range(n + quiet):
+        room = "busy@chatroom" if i < n else f"quiet{i}@chatroom"
+        msgs.append(WxMsg(wcf_pb2.WxMsg(id=i, type=3, ts=int(time.time()), roomid=room, sender="wxid_a",
+                                        extra=f"img_{i}.dat", is_group=True)))
+    return msgs
+
+
+def run_serial(wcf: Wcf, msgs: list, dir: str) -> dict:
+    start = time.perf_counter()
+    done = {}
+    for msg in msgs:
+        wcf.download_image(msg.id, msg.extra, dir)
+        done[msg.roomid] = done.get(msg.roomid, []) + [(time.perf_counter() - start) * 1000]
+    return done
+
+
+def run_downloader(wcf: Wcf, msgs: list, dir: str, concurrency: int) -> dict:
+    downloader = ImageDownloader(wcf, dir, concurrency=concurrency)
+    start = time.perf_counter()
+    done = {}
+
+    def record(room):
+        return lambda f: done.setdefault(room, []).append((time.perf_counter() - start) * 1000)
+
+    wait([downloader.submit(msg, record(msg.roomid)) for msg in msgs])
+    print(f"{'':<12}  {downloader.stats()}")
+    downloader.close()
+    return done
+
+
+def report(name: str, done: dict) -> None:
+    busy = done.pop("busy@chatroom")
+    quiet = [t for ts in done.values() for t in ts]
+    print(f"{name:<12}: 总耗时 {max(busy + quiet):8.1f} ms, 小群图片 p50 {statistics.median(quiet):8.1f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("-n", type=int, default=200, help="大群图片数")
+    parser.add_argument("-q", "--quiet", type=int, default=10, help="小群个数")
+    parser.add_argument("-c", "--concurrency", type=int, default=8, help="同时下载的图片数")
+    parser.add_argument("--latency", type=float, default=0.2, help="服务端下载耗时（秒）")
+    parser.add_argument("-p", "--port", type=int, default=19086)
+    args = parser.parse_args()
+
+    with StandInServer(args.port, attach_latency=lambda: args.latency), tempfile.TemporaryDirectory() as dir:
+        wcf = Wcf(host="127.0.0.1", port=args.port, block=False)
+        msgs = burst(args.n, args.quiet)
+        report("逐张下载", run_serial(wcf, msgs, dir))
+        msgs = burst(args.n, args.quiet)
+        report("ImageDownloader", run_downloader(wcf, msgs, dir, args.concurrency))
+        wcf.cleanup()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+#! /usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""`WxMsg.is_at` 在大 xml 上的耗时：原来每次调用现拼的正则，与解析一次、缓存成 frozenset 的对比
+
+    PYTHONPATH=. python benchmarks/bench_isat.py [--xml 1048576] [--repeat 0,10,100] [--calls 3]
+
+原来的正则 `<atuserlist>[\\s|\\S]*({wxid})[\\s|\\S]*</atuserlist>` 在 @ 名单里没有自己、
+而自己的 wxid 又在 `</atuserlist>` 之后出现多次时（如引用消息），每出现一次都要回溯扫描一遍到末尾，
+耗时随出现次数成倍增长。`--calls` 模拟一条消息被几个处理函数各调一次 `is_at`。
+"""
+
+import argparse
+import re
+import time
+
+from wcferry import LazyWxMsg, WxMsg, wcf_pb2
+
+SELF = "wxid_self"
+
+
+def old_is_at(msg, wxid) -> bool:
+    # 改动前的实现
+    if not msg.from_group():
+        return False
+    if not re.findall(f"<atuserlist>[\\s|\\S]*({wxid})[\\s|\\S]*</atuserlist>", msg.xml):
+        return False
+    if re.findall(r"@(?:所有人|all|All)", msg.content):
+        return False
+    return True
+
+
+def make_pb(size: int, repeat: int, at: str) -> wcf_pb2.WxMsg:
+    chunk = "x" * max(size // max(repeat, 1) - len(SELF), 0)
+    body = (chunk + SELF) * repeat if repeat else "x" * size
+    xml = f"<msgsource><atuserlist><![CDATA[{at}]]></atuserlist>{body}</msgsource>"
+    return wcf_pb2.WxMsg(type=1, roomid="room@chatroom", sender="wxid_a", content="@机器人 你好", xml=xml, is_group=True)
+
+
+def timed(fn, msg, calls: int) -> tuple:
+    start = time.perf_counter()
+    for _ in range(calls):
+        result = fn(msg, SELF)
+    return (time.perf_counter() - start) * 1e3, result
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--xml", type=int, default=1 << 20, help="xml 字段大小（字节）")
+    parser.add_argument("--repeat", default="0,10,100", help="自己的 wxid 在 xml 正文中出现的次数")
+    parser.add_argument("--calls", type=int, default=3, help="每条消息调用 is_at 的次数")
+    args = parser.parse_args()
+
+    for repeat in map(int, args.repeat.split(",")):
+        for at in ("wxid_a,wxid_b", f"wxid_a,{SELF}"):
+            pb = make_pb(args.xml, repeat, at)
+            old_ms, old = timed(old_is_at, WxMsg(pb), args.calls)
+            new_ms, new = timed(WxMsg.is_at, WxMsg(pb), args.calls)
+            lazy_ms, lazy = timed(LazyWxMsg.is_at, LazyWxMsg(pb), args.calls)
+            assert old == new == lazy
+            print(f"出现 {repeat:>4} 次, {'@自己' if new else '没@自己'}: 正则 {old_ms:9.1f} ms, "
+                  f"frozenset {new_ms:6.2f} ms, LazyWxMsg {lazy_ms:6.2f} ms（{args.calls} 次调用）", flush=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+#! /usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""接收线程里过滤消息：先构造 `WxMsg` 再在用户代码里过滤，与 `MsgFilter` 直接在 protobuf 上过滤的对比
+
+    PYTHONPATH=. python benchmarks/bench_msgfilter.py [-n 100000] [--rooms 50] [--xml 2048]
+
+模拟一个只关心少数几个群里文本消息的机器人：消息来自 `--rooms` 个群，过滤条件只要其中 2 个群的文本消息。
+两种方式都包括解析，计时的是接收线程每条消息的开销。
+"""
+
+import argparse
+import time
+
+from wcferry import MsgFilter, WxMsg, wcf_pb2
+
+SELF = "wxid_self"
+
+
+def make_raw(n: int, rooms: int, xml: int) -> list:
+    raw = []
+    for i in range(n):
+        at = SELF if i % 7 == 0 else "wxid_other"
+        body = f"<msgsource><atuserlist>{at}</atuserlist>{'x' * xml}</msgsource>"
+        raw.append(wcf_pb2.Response(func=wcf_pb2.FUNC_ENABLE_RECV_TXT, wxmsg=wcf_pb2.WxMsg(
+            id=i, type=1 if i % 3 else 49, ts=int(time.time()), roomid=f"room{i % rooms}@chatroom",
+            sender=f"wxid_{i % 200}", content="内容" * 50, xml=body, is_group=True)).SerializeToString())
+    return raw
+
+
+def run(raw: list, accept) -> tuple:
+    start = time.perf_counter()
+    kept = []
+    for data in raw:
+        rsp = wcf_pb2.Response()
+        rsp.ParseFromString(data)
+        msg = accept(rsp.wxmsg)
+        if msg is not None:
+            kept.append(msg)
+    return (time.perf_counter() - start) / len(raw) * 1e9, len(kept)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("-n", type=int, default=100000, help="消息数")
+    parser.add_argument("--rooms", type=int, default=50, help="群数")
+    parser.add_argument("--xml", type=int, default=2048, help="xml 字段大小（字节）")
+    args = parser.parse_args()
+
+    raw = make_raw(args.n, args.rooms, args.xml)
+    rooms = {"room3@chatroom", "room7@chatroom"}
+
+    cases = []
+
+    def user_code(pb):
+        msg = WxMsg(pb)
+        if msg.type == 1 and msg.roomid in rooms:
+            return msg
+    cases.append(("WxMsg + 用户代码过滤", user_code))
+
+    f = MsgFilter(types={1}, roomids=rooms)
+    pred = f.compile(SELF)
+    cases.append(("MsgFilter(types, roomids)", lambda pb: WxMsg(pb) if pred(pb) else None))
+
+    def user_code_at(pb):
+        msg = WxMsg(pb)
+        if msg.type == 1 and msg.roomid in rooms and msg.is_at(SELF):
+            return msg
+    cases.append(("WxMsg + 用户代码过滤 + is_at", user_code_at))
+
+    f_at = MsgFilter(types={1}, roomids=rooms, at_me=True)
+    pred_at = f_at.compile(SELF)
+    cases.append(("MsgFilter(types, roomids, at_me)", lambda pb: WxMsg(pb) if pred_at(pb) else None))
+
+    for name, accept in cases:
+        run(raw[:1000], accept)  # 预热
+        ns, kept = run(raw, accept)
+        print(f"{name:<34} {ns:7.0f} ns/条, 保留 {kept}")
+    print(f"计数: {f_at.stats()}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+#! /usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""消费者卡住时各溢出策略的表现：入队、丢弃、溢出条数与最高水位，以及正常情况下与 `queue.Queue` 的吞吐对比
+
+    PYTHONPATH=. python benchmarks/bench_msgqueue.py [-n 100000] [--maxsize 10000]
+"""
+
+import argparse
+import os
+import tempfile
+import time
+from queue import Queue
+from threading import Thread
+
+from wcferry import WxMsg, wcf_pb2
+from wcferry.msgqueue import POLICIES, MsgQueue
+
+
+def make_msgs(n: int) -> list:
+    return [WxMsg(wcf_pb2.WxMsg(id=i, type=1, roomid="room@chatroom", sender="wxid_a", content="x" * 200,
+                                xml="<msgsource/>" * 20, is_group=True)) for i in range(n)]
+
+
+def throughput(q, msgs: list) -> float:
+    def consume():
+        for _ in range(len(msgs)):
+            q.get()
+
+    t = Thread(target=consume)
+    start = time.perf_counter()
+    t.start()
+    for msg in msgs:
+        q.put(msg)
+    t.join()
+    return len(msgs) / (time.perf_counter() - start)
+
+
+def stall(policy: str, msgs: list, maxsize: int, dir: str) -> None:
+    """消费者停住期间收到全部消息，之后再全部取出，检查顺序"""
+    q = MsgQueue(maxsize, policy, spill_path=os.path.join(dir, "spill.bin"))
+    start = time.perf_counter()
+    if policy == "block":
+        Thread(target=lambda: (time.sleep(0.5), [q.get() for _ in range(len(msgs) - maxsize)])).start()
+    for msg in msgs:
+        q.put(msg)
+    put_s = time.perf_counter() - start
+
+    stats = q.stats()
+    ids = []
+    while not q.empty():
+        ids.append(q.get().id)
+    ordered = ids == sorted(ids)
+    print(f"{policy:<12} 放入 {put_s * 1000:8.1f} ms, 取出 {len(ids):6d} 条, 有序 {ordered}  {stats}")
+    q.close()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("-n", type=int, default=100000, help="消息数")
+    parser.add_argument("--maxsize", type=int, default=10000, help="队列大小")
+    args = parser.parse_args()
+
+    msgs = make_msgs(args.n)
+    print(f"queue.Queue  吞吐 {throughput(Queue(), msgs):10.0f} msg/s")
+    print(f"MsgQueue     吞吐 {throughput(MsgQueue(args.maxsize), msgs):10.0f} msg/s")
+    with tempfile.TemporaryDirectory() as dir:
+        for policy in POLICIES:
+            stall(policy, msgs, args.maxsize, dir)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+#! /usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""一个接收人刷屏时，`Outbox` 的发送条数、合并效果与其他接收人的等待时间
+
+    PYTHONPATH=. python benchmarks/bench_outbox.py [-n 200] [-q 20] [--rate 50] [--dry-run]
+
+消息真正发给替身服务器；`--dry-run` 时不发 RPC，只测排队与限速。
+"""
+
+import argparse
+import statistics
+import time
+from concurrent.futures import wait
+
+from standin import StandInServer
+from wcferry import Wcf
+from wcferry.outbox import Outbox
+
+
+def run(outbox: Outbox, n: int, quiet: int) -> None:
+    start = time.perf_counter()
+    done = {}
+
+    def record(receiver):
+        return lambda f: done.setdefault(receiver, []).append((time.perf_counter() - start) * 1000)
+
+    futures = []
+    for i in range(n):
+        futures.append(outbox.send_text(f"刷屏 {i}", "busy", priority=0))
+        futures[-1].add_done_callback(record("busy"))
+        if i % 10 == 0 and i // 10 < quiet:  # 其他接收人的消息夹在中间到达
+            futures.append(outbox.send_text("你好", f"quiet{i // 10}"))
+            futures[-1].add_done_callback(record("quiet"))
+    urgent = outbox.send_text("告警", "ops", priority=10)
+    urgent.add_done_callback(record("urgent"))
+    wait(futures + [urgent])
+
+    print(f"  {outbox.stats()}")
+    print(f"  总耗时 {max(done['busy']):8.1f} ms, 其他接收人 p50 {statistics.median(done['quiet']):8.1f} ms"
+          f", 高优先级 {done['urgent'][0]:8.1f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("-n", type=int, default=200, help="刷屏的消息数")
+    parser.add_argument("-q", "--quiet", type=int, default=20, help="其他接收人个数")
+    parser.add_argument("--rate", type=float, default=50, help="全局每秒条数")
+    parser.add_argument("--receiver-rate", type=float, default=5, help="每个接收人每秒条数")
+    parser.add_argument("--coalesce", type=int, default=2000, help="合并文本的最大长度，0 为不合并")
+    parser.add_argument("--dry-run", action="store_true")
+    parser.add_argument("-p", "--port", type=int, default=19086)
+    args = parser.parse_args()
+
+    with StandInServer(args.port):
+        wcf = Wcf(host="127.0.0.1", port=args.port, block=False)
+        for coalesce in sorted({0, args.coalesce}):
+            print(f"coalesce={coalesce}")
+            outbox = Outbox(wcf, rate=args.rate, burst=args.rate, receiver_rate=args.receiver_rate,
+                            receiver_burst=args.receiver_rate, coalesce=coalesce, dry_run=args.dry_run)
+            run(outbox, args.n, args.quiet)
+            outbox.close()
+        wcf.cleanup()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+#! /usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""`HashIndex` 的规模测试：插入、`find_similar` 延迟、保存与加载耗时，以及单张图片的哈希耗时
+
+    PYTHONPATH=. python benchmarks/bench_phash.py [-n 1000000] [-q 1000] [-d 8]
+"""
+
+import argparse
+import os
+import statistics
+import tempfile
+import time
+
+import numpy as np
+from wcferry.phash import HashIndex, ahash, dhash, phash
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("-n", type=int, default=1000000, help="索引中的哈希数")
+    parser.add_argument("-q", type=int, default=1000, help="查询次数")
+    parser.add_argument("-d", "--distance", type=int, default=8, help="最大汉明距离")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    image = rng.integers(0, 256, (480, 640), dtype=np.uint8)
+    for func in (ahash, dhash, phash):
+        start = time.perf_counter()
+        for _ in range(200):
+            func(image)
+        print(f"{func.__name__:<6}: {(time.perf_counter() - start) / 200 * 1e3:6.3f} ms/张 (640x480 数组)")
+
+    hashes = rng.integers(0, 2 ** 63, args.n, dtype=np.int64).astype(np.uint64).tolist()
+    index = HashIndex()
+    start = time.perf_counter()
+    for i, h in enumerate(hashes):
+        index.add(str(i), h)
+    print(f"插入 {args.n} 个: {time.perf_counter() - start:6.2f} s")
+
+    # 查询与已有哈希相差若干位的近似值
+    latencies, hits = [], 0
+    for i in rng.integers(0, args.n, args.q).tolist():
+        q = hashes[i]
+        for bit in rng.choice(64, args.distance, replace=False).tolist():
+            q ^= 1 << bit
+        start = time.perf_counter()
+        found = index.find_similar(q, args.distance)
+        latencies.append((time.perf_counter() - start) * 1000)
+        hits += any(key == str(i) for key, _ in found)
+    latencies.sort()
+    print(f"find_similar(d={args.distance}): p50 {statistics.median(latencies):.3f} ms, "
+          f"p99 {latencies[int(len(latencies) * 0.99) - 1]:.3f} ms, 召回 {hits}/{args.q}")
+
+    with tempfile.TemporaryDirectory() as dir:
+        path = os.path.join(dir, "hashes.npz")
+        start = time.perf_counter()
+        index.save(path)
+        print(f"保存: {time.perf_counter() - start:6.2f} s, {os.path.getsize(path) / 1e6:.1f} MB")
+        start = time.perf_counter()
+        HashIndex.load(path)
+        print(f"加载: {time.perf_counter() - start:6.2f} s")
+
+
+if __name__ == "__main__":
+    main()
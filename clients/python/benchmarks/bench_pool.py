@@ -0,0 +1,70 @@
+#! /usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""单连接与 `WcfPool` 的对比：后台持续执行慢查询时，`send_text` 的延迟
+
+    PYTHONPATH=. python benchmarks/bench_pool.py [-n 500] [-s 3] [--db-delay 0.05]
+
+替身服务器运行在子进程中，按连接并行处理，`--db-delay`/`--txt-delay` 注入处理耗时。
+"""
+
+import argparse
+import statistics
+import time
+from threading import Event, Thread
+
+from standin import StandInProcess
+from wcferry import Wcf, wcf_pb2
+
+
+def run(port: int, n: int, size: int, db_threads: int) -> list:
+    wcf = Wcf(host="127.0.0.1", port=port, block=False, pool_size=size)
+    stop = Event()
+
+    def query_loop():
+        while not stop.is_set():
+            wcf.query_sql("MSG0.db", "SELECT * FROM MSG LIMIT 1000;")
+
+    workers = [Thread(target=query_loop, daemon=True) for _ in range(db_threads)]
+    for w in workers:
+        w.start()
+    time.sleep(0.1)
+
+    latencies = []
+    for i in range(n):
+        start = time.perf_counter()
+        wcf.send_text(f"msg {i}", "filehelper")
+        latencies.append((time.perf_counter() - start) * 1000)
+
+    stop.set()
+    for w in workers:
+        w.join()
+    wcf.cleanup()
+    return latencies
+
+
+def report(name: str, latencies: list) -> None:
+    latencies = sorted(latencies)
+    p99 = latencies[int(len(latencies) * 0.99) - 1]
+    print(f"{name:<16}: send_text p50 {statistics.median(latencies):8.2f} ms, p99 {p99:8.2f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("-n", type=int, default=500, help="send_text 次数")
+    parser.add_argument("-s", "--size", type=int, default=3, help="连接池大小")
+    parser.add_argument("-t", "--db-threads", type=int, default=2, help="并发执行慢查询的线程数")
+    parser.add_argument("--db-delay", type=float, default=0.05, help="服务端处理 query_sql 的耗时（秒）")
+    parser.add_argument("--txt-delay", type=float, default=0.0005, help="服务端处理 send_text 的耗时（秒）")
+    parser.add_argument("-p", "--port", type=int, default=19086)
+    args = parser.parse_args()
+
+    delays = {wcf_pb2.FUNC_EXEC_DB_QUERY: args.db_delay, wcf_pb2.FUNC_SEND_TXT: args.txt_delay}
+    with StandInProcess(args.port, delays, polyamorous=True):
+        report("single socket", run(args.port, args.n, 1, args.db_threads))
+    with StandInProcess(args.port, delays, polyamorous=True):
+        report(f"WcfPool(size={args.size})", run(args.port, args.n, args.size, args.db_threads))
+
+
+if __name__ == "__main__":
+    main()
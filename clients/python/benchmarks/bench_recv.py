@@ -0,0 +1,147 @@
+#! /usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""突发大量消息时的接收吞吐：逐条（`put` / `get`）与批量（`put_many` / `get_many`），1、2、8 个消费者
+
+    PYTHONPATH=. python benchmarks/bench_recv.py [-n 50000] [--max-n 64]
+
+第一部分只测消息队列：一个线程模拟接收线程放入已经构造好的消息，消费者取走。
+第二部分端到端：替身服务器负责命令通道，另起一个进程在 `port+1` 上尽快推送消息，
+计时从收到第一条消息开始，到全部消息被消费者取走为止；这部分通常受 nng 收发本身的速度限制。
+"""
+
+import argparse
+import multiprocessing
+import time
+from queue import Empty
+from threading import Lock, Thread
+
+import pynng
+from standin import StandInServer
+from wcferry import Wcf, WxMsg, wcf_pb2
+from wcferry.msgqueue import MsgQueue
+
+
+def make_raw(n: int) -> list:
+    return [wcf_pb2.Response(func=wcf_pb2.FUNC_ENABLE_RECV_TXT, wxmsg=wcf_pb2.WxMsg(
+        id=i, type=1, ts=int(time.time()), roomid=f"room{i % 50}@chatroom", sender="wxid_a", content="你好" * 20,
+        xml="<msgsource><atuserlist>wxid_b</atuserlist></msgsource>", is_group=True)).SerializeToString()
+        for i in range(n)]
+
+
+def run_queue(msgs: list, consumers: int, batched: bool, max_n: int) -> float:
+    q = MsgQueue(10000)
+    n = len(msgs)
+    lock = Lock()
+    done = [0]
+
+    def consume():
+        while done[0] < n:
+            got = len(q.get_many(max_n, 0.05)) if batched else _get_one(q)
+            if got:
+                with lock:
+                    done[0] += got
+
+    threads = [Thread(target=consume) for _ in range(consumers)]
+    start = time.perf_counter()
+    for t in threads:
+        t.start()
+    if batched:
+        for i in range(0, n, 256):
+            q.put_many(msgs[i:i + 256])
+    else:
+        for msg in msgs:
+            q.put(msg)
+    for t in threads:
+        t.join()
+    return n / (time.perf_counter() - start)
+
+
+def _get_one(q: MsgQueue) -> int:
+    try:
+        q.get(timeout=0.05)
+        return 1
+    except Empty:
+        return 0
+
+
+def push(port: int, n: int, ready) -> None:
+    raw = make_raw(n)
+    with pynng.Pair1(listen=f"tcp://127.0.0.1:{port + 1}") as pusher:
+        ready.wait()
+        for data in raw:
+            pusher.send(data)
+        time.sleep(1)
+
+
+def run(port: int, n: int, consumers: int, batched: bool, max_n: int) -> float:
+    ctx = multiprocessing.get_context("spawn")
+    ready = ctx.Event()
+    pusher = ctx.Process(target=push, args=(port, n, ready))
+    pusher.start()
+    time.sleep(1)  # 等推送进程准备好消息并开始监听
+    with StandInServer(port):
+        wcf = Wcf(host="127.0.0.1", port=port, block=False)
+        lock = Lock()
+        done = [0]
+        start = [0]
+
+        def consume():
+            while done[0] < n:
+                if batched:
+                    got = len(wcf.get_msgs(max_n, timeout=0.2))
+                else:
+                    try:
+                        wcf.msgQ.get(timeout=0.2)
+                        got = 1
+                    except Empty:
+                        got = 0
+                if got:
+                    with lock:
+                        start[0] = start[0] or time.perf_counter()
+                        done[0] += got
+
+        threads = [Thread(target=consume) for _ in range(consumers)]
+        for t in threads:
+            t.start()
+        wcf.enable_receiving_msg(batch=256 if batched else 1)
+        time.sleep(0.2)  # 等接收线程连上
+        ready.set()
+        for t in threads:
+            t.join()
+        elapsed = time.perf_counter() - start[0]
+        wcf.disable_recv_msg()
+        wcf.cleanup()
+    pusher.join()
+    return n / elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("-n", type=int, default=50000, help="消息数")
+    parser.add_argument("--max-n", type=int, default=64, help="get_msgs 每次最多取多少条")
+    parser.add_argument("-p", "--port", type=int, default=19090)
+    args = parser.parse_args()
+
+    msgs = []
+    for data in make_raw(args.n):
+        rsp = wcf_pb2.Response()
+        rsp.ParseFromString(data)
+        msgs.append(WxMsg(rsp.wxmsg))
+    print("消息队列")
+    for consumers in (1, 2, 8):
+        for batched in (False, True):
+            rate = run_queue(msgs, consumers, batched, args.max_n)
+            print(f"  {consumers} 个消费者, {'批量' if batched else '逐条'}: {rate:10.0f} msg/s")
+
+    print("端到端")
+    port = args.port
+    for consumers in (1, 2, 8):
+        for batched in (False, True):
+            rate = run(port, args.n, consumers, batched, args.max_n)
+            port += 2
+            print(f"  {consumers} 个消费者, {'批量' if batched else '逐条'}: {rate:10.0f} msg/s")
+
+
+if __name__ == "__main__":
+    main()
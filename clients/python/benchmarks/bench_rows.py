@@ -0,0 +1,79 @@
+#! /usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""`query_sql` 结果解码的吞吐：原先的 `MessageToDict` + base64 方式与直接解码 `DbRows` 对比
+
+    PYTHONPATH=. python benchmarks/bench_rows.py [-n 100000]
+"""
+
+import argparse
+import base64
+import time
+
+from google.protobuf import json_format
+from wcferry import columnar, rpc, wcf_pb2
+
+
+def make_response(n: int) -> wcf_pb2.Response:
+    """合成一个类似 `MSG` 表的结果集"""
+    rsp = wcf_pb2.Response()
+    rsp.func = wcf_pb2.FUNC_EXEC_DB_QUERY
+    for i in range(n):
+        row = rsp.rows.rows.add()
+        for type, column, content in (
+            (1, "localId", str(i).encode()),
+            (1, "Type", b"1"),
+            (1, "IsSender", str(i % 2).encode()),
+            (1, "CreateTime", str(1700000000 + i).encode()),
+            (3, "StrTalker", f"{i % 500}@chatroom".encode()),
+            (3, "StrContent", f"消息内容 {i} " .encode() * 4),
+            (4, "BytesExtra", bytes(range(64))),
+            (5, "Reserved", b""),
+        ):
+            f = row.fields.add()
+            f.type = type
+            f.column = column
+            f.content = content
+    return rsp
+
+
+def legacy_parse_rows(rsp: wcf_pb2.Response) -> list:
+    result = []
+    rows = json_format.MessageToDict(rsp.rows).get("rows", [])
+    for r in rows:
+        row = {}
+        for f in r["fields"]:
+            c = base64.b64decode(f.get("content", ""))
+            row[f["column"]] = rpc.SQL_TYPES[f["type"]](c)
+        result.append(row)
+    return result
+
+
+def bench(name: str, func, rsp: wcf_pb2.Response, n: int) -> None:
+    start = time.perf_counter()
+    func(rsp)
+    elapsed = time.perf_counter() - start
+    print(f"{name:<24}: {n / elapsed:12.0f} rows/s")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("-n", type=int, default=100000, help="行数")
+    args = parser.parse_args()
+
+    rsp = make_response(args.n)
+    assert legacy_parse_rows(rsp) == rpc.parse_rows(rsp)
+
+    bench("MessageToDict (before)", legacy_parse_rows, rsp, args.n)
+    bench("parse_rows dict", rpc.parse_rows, rsp, args.n)
+    bench("parse_rows tuple", lambda r: rpc.parse_rows(r, "tuple"), rsp, args.n)
+    bench("parse_rows columns", lambda r: rpc.parse_rows(r, "columns"), rsp, args.n)
+    bench("parse_rows tuple+view", lambda r: rpc.parse_rows(r, "tuple", True), rsp, args.n)
+    try:
+        bench("decode_columns (numpy)", columnar.decode_columns, rsp, args.n)
+    except ImportError as e:
+        print(e)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+#! /usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""`WxMsg` 与 `LazyWxMsg` 的构造耗时、每条消息的 Python 内存分配，以及只看 `type`、`roomid` 的消费者的总耗时
+
+    PYTHONPATH=. python benchmarks/bench_wxmsg.py [-n 100000] [--xml 4096]
+
+内存分配用 tracemalloc 统计，只包括 Python 对象；`LazyWxMsg` 引用的 protobuf 由 upb 管理，不在其中，
+长期持有 `LazyWxMsg` 时这部分内存也一直占着。
+"""
+
+import argparse
+import gc
+import time
+import tracemalloc
+
+from wcferry import LazyWxMsg, WxMsg, wcf_pb2
+
+
+def make_raw(n: int, xml: int) -> list:
+    body = "<msgsource>" + "x" * xml + "</msgsource>"
+    return [wcf_pb2.Response(func=wcf_pb2.FUNC_ENABLE_RECV_TXT, wxmsg=wcf_pb2.WxMsg(
+        id=i, type=1 if i % 3 else 49, ts=int(time.time()), roomid=f"room{i % 50}@chatroom", sender="wxid_a",
+        content="内容" * 100, xml=body, is_group=True)).SerializeToString() for i in range(n)]
+
+
+def parse(raw: list) -> list:
+    out = []
+    for data in raw:
+        rsp = wcf_pb2.Response()
+        rsp.ParseFromString(data)
+        out.append(rsp.wxmsg)
+    return out
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("-n", type=int, default=100000, help="消息数")
+    parser.add_argument("--xml", type=int, default=4096, help="xml 字段大小（字节）")
+    args = parser.parse_args()
+
+    raw = make_raw(args.n, args.xml)
+    for cls in (WxMsg, LazyWxMsg):
+        pbs = parse(raw)
+        gc.collect()
+        start = time.perf_counter()
+        msgs = [cls(pb) for pb in pbs]
+        build = (time.perf_counter() - start) / args.n * 1e9
+        del msgs
+
+        gc.collect()
+        tracemalloc.start()
+        msgs = [cls(pb) for pb in pbs]
+        alloc = tracemalloc.get_traced_memory()[0] / args.n
+        tracemalloc.stop()
+        del msgs, pbs
+
+        # 接收线程的真实路径：解析、构造、过滤，持有通过过滤的消息
+        gc.collect()
+        start = time.perf_counter()
+        kept = []
+        for data in raw:
+            rsp = wcf_pb2.Response()
+            rsp.ParseFromString(data)
+            msg = cls(rsp.wxmsg)
+            if msg.type == 1 and msg.roomid == "room7@chatroom":
+                kept.append(msg)
+        e2e = (time.perf_counter() - start) / args.n * 1e9
+        print(f"{cls.__name__:<10} 构造 {build:7.0f} ns/条, 分配 {alloc:7.0f} B/条, "
+              f"解析+构造+过滤 {e2e:7.0f} ns/条")
+        del kept
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,190 @@
+# -*- coding: utf-8 -*-
+
+"""本地替身服务器：模拟 `wcferry` RPC 服务端，供压测脚本使用，无需微信。"""
+
+import os
+import sqlite3
+import time
+from queue import Queue
+from threading import Thread
+from typing import Callable, Dict
+
+import pynng
+from wcferry import wcf_pb2
+
+
+class StandInServer():
+    """在 `port` 上监听命令通道，按请求顺序回包
+
+    Args:
+        port (int): 命令通道端口
+        delays (Dict[int, float]): 按 `Functions` 注入的处理耗时（秒）
+        polyamorous (bool): 是否接受多条连接；每条连接各自串行处理，连接之间并行
+        db (sqlite3.Connection): 设置后 `query_sql` 在这个库上真实执行，否则返回 `rows`；
+            `get_contacts` 返回库中 Contact 表（UserName, Alias, Remark, NickName）
+        attach_latency (Callable[[], float]): 设置后 `download_attach` 之后要过这么久（秒）`decrypt_image` 才能成功
+
+    Attributes:
+        images (Dict[str, bytes]): extra -> 图片内容，`decrypt_image` 时真实写出文件
+        ocr_latency (Callable[[], float]): 设置后某张图片第一次 OCR 请求之后要过这么久（秒）才返回结果
+        ocr_calls (int): 收到的 OCR 请求数
+    """
+
+    def __init__(self, port: int = 10086, delays: Dict[int, float] = None, polyamorous: bool = False,
+                 db: sqlite3.Connection = None, attach_latency: Callable[[], float] = None) -> None:
+        self.port = port
+        self.db = db
+        self.attach_latency = attach_latency
+        self._ready_at = {}  # extra -> 可以解密的时间
+        self.images = {}
+        self.ocr_latency = None
+        self.ocr_calls = 0
+        self._ocr_ready = {}
+        self.delays = delays or {}
+        self.polyamorous = polyamorous
+        self.rows = wcf_pb2.DbRows()
+        self.served = 0
+        self._workers = {}
+        self._sock = pynng.Pair1(polyamorous=polyamorous)
+        self._sock.listen(f"tcp://127.0.0.1:{port}")
+        self._thread = Thread(target=self._serve, name="StandInServer", daemon=True)
+        self._thread.start()
+
+    def close(self) -> None:
+        self._sock.close()
+
+    def __enter__(self) -> "StandInServer":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def respond(self, req: wcf_pb2.Request) -> wcf_pb2.Response:
+        """生成响应；子类可以覆盖，返回 None 表示丢掉这个响应（模拟丢包、服务端重启）"""
+        rsp = wcf_pb2.Response()
+        rsp.func = req.func
+        if req.func == wcf_pb2.FUNC_IS_LOGIN:
+            rsp.status = 1
+        elif req.func == wcf_pb2.FUNC_GET_SELF_WXID:
+            rsp.str = "wxid_standin"
+        elif req.func == wcf_pb2.FUNC_EXEC_DB_QUERY:
+            if self.db is None:
+                rsp.rows.CopyFrom(self.rows)
+            else:
+                self._execute(req.query.sql, rsp.rows)
+        elif req.func == wcf_pb2.FUNC_DOWNLOAD_ATTACH:
+            if self.attach_latency is not None:
+                self._ready_at[req.att.extra] = time.monotonic() + self.attach_latency()
+            rsp.status = 0
+        elif req.func == wcf_pb2.FUNC_DECRYPT_IMAGE:
+            if time.monotonic() >= self._ready_at.get(req.dec.src, 0):
+                image = self.images.get(req.dec.src)
+                if image is None:
+                    rsp.str = f"{req.dec.dst}/standin.jpg"
+                else:
+                    rsp.str = os.path.join(req.dec.dst, os.path.splitext(os.path.basename(req.dec.src))[0] + ".jpg")
+                    with open(rsp.str, "wb") as f:
+                        f.write(image)
+        elif req.func == wcf_pb2.FUNC_EXEC_OCR:
+            self.ocr_calls += 1
+            now = time.monotonic()
+            ready = self._ocr_ready.setdefault(req.str, now + (self.ocr_latency() if self.ocr_latency else 0))
+            rsp.ocr.status = 0 if now >= ready else 1
+            if now >= ready:
+                rsp.ocr.result = f"text of {os.path.basename(req.str)}"
+        elif req.func == wcf_pb2.FUNC_GET_CONTACTS:
+            rsp.contacts.SetInParent()
+            if self.db is not None:
+                for wxid, code, remark, name in self.db.execute(
+                        "SELECT UserName, Alias, Remark, NickName FROM Contact;"):
+                    rsp.contacts.contacts.add(wxid=wxid, code=code or "", remark=remark or "", name=name or "")
+        else:
+            rsp.status = 0
+        return rsp
+
+    def _execute(self, sql: str, rows: wcf_pb2.DbRows) -> None:
+        cur = self.db.execute(sql)
+        columns = [d[0] for d in cur.description or []]
+        for values in cur:
+            row = rows.rows.add()
+            for column, value in zip(columns, values):
+                f = row.fields.add()
+                f.column = column
+                if value is None:
+                    f.type = 5
+                elif isinstance(value, int):
+                    f.type, f.content = 1, str(value).encode()
+                elif isinstance(value, float):
+                    f.type, f.content = 2, repr(value).encode()
+                elif isinstance(value, bytes):
+                    f.type, f.content = 4, value
+                else:
+                    f.type, f.content = 3, value.encode("utf-8")
+
+    def _handle(self, data: bytes) -> bytes:
+        req = wcf_pb2.Request()
+        req.ParseFromString(data)
+        delay = self.delays.get(req.func)
+        if delay:
+            time.sleep(delay)
+        self.served += 1
+        rsp = self.respond(req)
+        return None if rsp is None else rsp.SerializeToString()
+
+    def _serve(self) -> None:
+        while True:
+            try:
+                msg = self._sock.recv_msg()
+            except pynng.Closed:
+                return
+
+            if not self.polyamorous:
+                try:
+                    data = self._handle(msg.bytes)
+                    if data is not None:
+                        self._sock.send(data)
+                except pynng.Closed:  # 处理期间被关闭
+                    return
+                continue
+
+            q = self._workers.get(msg.pipe.id)
+            if q is None:
+                q = self._workers[msg.pipe.id] = Queue()
+                Thread(target=self._work, args=(msg.pipe, q), daemon=True).start()
+            q.put(msg.bytes)
+
+    def _work(self, pipe: pynng.Pipe, q: Queue) -> None:
+        while True:
+            data = q.get()
+            try:
+                data = self._handle(data)
+                if data is not None:
+                    pipe.send(data)
+            except pynng.Closed:
+                return
+
+
+def _serve_forever(port: int, delays: Dict[int, float], polyamorous: bool) -> None:
+    server = StandInServer(port, delays, polyamorous)
+    server._thread.join()
+
+
+class StandInProcess():
+    """在子进程里运行 `StandInServer`，避免和压测客户端争抢 GIL"""
+
+    def __init__(self, port: int = 10086, delays: Dict[int, float] = None, polyamorous: bool = False) -> None:
+        import multiprocessing
+        ctx = multiprocessing.get_context("spawn")  # nng 不支持 fork
+        self._proc = ctx.Process(target=_serve_forever, args=(port, delays or {}, polyamorous), daemon=True)
+        self._proc.start()
+        time.sleep(1)  # 等待监听就绪
+
+    def close(self) -> None:
+        self._proc.terminate()
+        self._proc.join()
+
+    def __enter__(self) -> "StandInProcess":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
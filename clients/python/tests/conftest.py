@@ -0,0 +1,26 @@
+# -*- coding: utf-8 -*-
+
+import os
+import socket
+import sys
+
+import pytest
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(HERE))                                # wcferry
+sys.path.insert(0, os.path.join(os.path.dirname(HERE), "benchmarks"))    # standin
+
+
+@pytest.fixture
+def port() -> int:
+    """一个空闲的本地端口，其后一个端口也空闲（消息通道用 port + 1）"""
+    while True:
+        with socket.socket() as s:
+            s.bind(("127.0.0.1", 0))
+            p = s.getsockname()[1]
+        try:
+            with socket.socket() as s:
+                s.bind(("127.0.0.1", p + 1))
+        except OSError:
+            continue
+        return p
@@ -0,0 +1,94 @@
+# -*- coding: utf-8 -*-
+
+import asyncio
+import time
+
+import pynng
+import pytest
+from standin import StandInServer
+
+from wcferry import AsyncWcf, wcf_pb2
+
+SEND_TXT = wcf_pb2.FUNC_SEND_TXT
+
+
+class EchoServer(StandInServer):
+    """`send_txt` 回 `status = len(msg)`；接收人为 `slow` 的请求处理 0.3 秒，为 `lost` 的请求不回包"""
+
+    def respond(self, req):
+        if req.func == SEND_TXT:
+            if req.txt.receiver == "slow":
+                time.sleep(0.3)
+            if req.txt.receiver == "lost":
+                return None
+            return wcf_pb2.Response(func=SEND_TXT, status=len(req.txt.msg))
+        return super().respond(req)
+
+
+@pytest.fixture
+def server(port):
+    server = EchoServer(port)
+    yield server
+    server.close()
+
+
+def run(port: int, body, **kwargs):
+    async def main():
+        wcf = AsyncWcf(host="127.0.0.1", port=port, timeout=0.2, **kwargs)
+        await wcf.connect(block=False)
+        try:
+            return await body(wcf)
+        finally:
+            await wcf.cleanup()
+    return asyncio.run(main())
+
+
+def test_concurrent_requests_get_their_own_responses(server, port):
+    async def body(wcf):
+        return await asyncio.gather(*(wcf.send_text("x" * n, "r") for n in range(1, 50)))
+    assert run(port, body) == list(range(1, 50))
+
+
+@pytest.mark.parametrize("receiver", ["slow", "lost"])
+def test_timed_out_reply_does_not_shift_later_responses(server, port, receiver):
+    async def body(wcf):
+        first = await wcf.send_text("a", receiver)
+        return first, [await wcf.send_text("x" * n, "r") for n in range(1, 6)]
+    assert run(port, body) == (-1, list(range(1, 6)))
+
+
+def test_listener_survives_malformed_frames(server, port):
+    push = pynng.Pair1()
+    push.listen(f"tcp://127.0.0.1:{port + 1}")
+
+    async def body(wcf):
+        assert await wcf.enable_receiving_msg()
+        await asyncio.sleep(0.2)
+        push.send(b"\xff\xff\xff")
+        for i in range(3):
+            push.send(wcf_pb2.Response(wxmsg=wcf_pb2.WxMsg(id=i, content=str(i))).SerializeToString())
+        return [(await asyncio.wait_for(wcf.get_msg(), 2)).id for _ in range(3)]
+
+    try:
+        assert run(port, body) == [0, 1, 2]
+    finally:
+        push.close()
+
+
+def test_msg_queue_is_bounded(server, port):
+    push = pynng.Pair1()
+    push.listen(f"tcp://127.0.0.1:{port + 1}")
+
+    async def body(wcf):
+        assert await wcf.enable_receiving_msg()
+        await asyncio.sleep(0.2)
+        for i in range(10):
+            push.send(wcf_pb2.Response(wxmsg=wcf_pb2.WxMsg(id=i)).SerializeToString())
+        await asyncio.sleep(0.3)
+        size = wcf.msgQ.qsize()
+        return size, [(await asyncio.wait_for(wcf.get_msg(), 2)).id for _ in range(10)]
+
+    try:
+        assert run(port, body, msg_queue_size=3) == (3, list(range(10)))
+    finally:
+        push.close()
@@ -0,0 +1,81 @@
+# -*- coding: utf-8 -*-
+
+import json
+import time
+
+import pytest
+from standin import StandInServer
+
+from wcferry import CircuitBreaker, RetryPolicy, Wcf, wcf_pb2
+from wcferry.broadcast import summarize
+
+
+class RecordingServer(StandInServer):
+    """记下每个 `send_txt` 的接收人；`slow` 中的接收人处理 0.5 秒，超过客户端的接收超时"""
+
+    def __init__(self, port: int) -> None:
+        self.received = []
+        self.slow = set()
+        super().__init__(port)
+
+    def respond(self, req):
+        if req.func == wcf_pb2.FUNC_SEND_TXT:
+            self.received.append(req.txt.receiver)
+            if req.txt.receiver in self.slow:
+                time.sleep(0.5)
+        return super().respond(req)
+
+
+@pytest.fixture
+def server(port):
+    server = RecordingServer(port)
+    yield server
+    server.close()
+
+
+def connect(port: int, breaker=False) -> Wcf:
+    wcf = Wcf(host="127.0.0.1", port=port, block=False, retry=RetryPolicy(max_attempts=1), breaker=breaker)
+    wcf.cmd_socket.recv_timeout = 300
+    return wcf
+
+
+def checkpointed(path) -> list:
+    with open(path) as f:
+        return [json.loads(line)["receiver"] for line in f.read().splitlines()[1:]]
+
+
+def test_failed_send_is_not_resent_or_checkpointed(server, port, tmp_path):
+    ckpt = str(tmp_path / "ckpt")
+    server.slow.add("b")
+    wcf = connect(port)
+    try:
+        result = wcf.broadcast("text", "hi", ["a", "b", "c"], checkpoint=ckpt)
+        assert server.received == ["a", "b", "c"]
+        assert {r: v["status"] for r, v in result.items()} == {"a": 0, "b": -1, "c": 0}
+        assert summarize(result, "text")["failed"] == 1
+        assert sorted(checkpointed(ckpt)) == ["a", "c"]
+        assert wcf.get_failure_stats()["FUNC_SEND_TXT"]["calls"] == 3
+
+        # 用同一断点文件再发一次，只补发失败的接收人
+        server.slow.clear()
+        time.sleep(0.3)  # 等上一次的迟到响应回来
+        result = wcf.broadcast("text", "hi", ["a", "b", "c"], checkpoint=ckpt)
+        assert server.received == ["a", "b", "c", "b"]
+        assert {r: (v["status"], v["resumed"]) for r, v in result.items()} == \
+            {"a": (0, True), "b": (0, False), "c": (0, True)}
+    finally:
+        wcf.cleanup()
+
+
+def test_open_breaker_rejects_without_sending(server, port):
+    server.slow.update({"a", "b"})
+    wcf = connect(port, CircuitBreaker(failure_threshold=1, reset_timeout=60))
+    try:
+        result = wcf.broadcast("text", "hi", ["a", "b", "c", "d"], window=1)
+        assert server.received == ["a"]
+        assert all(v["status"] == -1 for v in result.values())
+        stats = wcf.get_failure_stats()["FUNC_SEND_TXT"]
+        assert stats["calls"] == 4
+        assert stats["rejected"] == 3
+    finally:
+        wcf.cleanup()
@@ -0,0 +1,73 @@
+# -*- coding: utf-8 -*-
+
+import sqlite3
+
+import pytest
+from standin import StandInServer
+
+from wcferry import Wcf, wcf_pb2
+from wcferry.columnar import BLOB, FLOAT, INT, NULL, TEXT, decode_columns, to_arrow
+
+np = pytest.importorskip("numpy")
+
+
+def make_rsp(columns, rows) -> wcf_pb2.Response:
+    rsp = wcf_pb2.Response(func=wcf_pb2.FUNC_EXEC_DB_QUERY)
+    for values in rows:
+        row = rsp.rows.rows.add()
+        for column, (type, content) in zip(columns, values):
+            row.fields.add(column=column, type=type, content=content)
+    return rsp
+
+
+N = (NULL, b"")
+ROWS = [
+    [N, (INT, b"1"), (TEXT, "a".encode()), (BLOB, b"\x00"), N, (INT, b"7")],
+    [(INT, b"5"), (FLOAT, b"2.5"), N, (BLOB, b"\x01\x02"), N, (TEXT, b"x")],
+    [(INT, b"-3"), N, (TEXT, "名".encode("utf-8")), N, N, N],
+]
+NAMES = ["leading_null", "promoted", "text", "blob", "empty", "mixed"]
+
+
+@pytest.fixture
+def columns():
+    return decode_columns(make_rsp(NAMES, ROWS))
+
+
+def test_types_and_values(columns):
+    assert list(columns) == NAMES
+    assert [columns[n].type for n in NAMES] == [INT, FLOAT, TEXT, BLOB, NULL, TEXT]
+    assert columns["leading_null"].values.dtype == np.int64
+    assert columns["leading_null"].to_pylist() == [None, 5, -3]
+    assert columns["promoted"].to_pylist() == [1.0, 2.5, None]
+    assert columns["text"].to_pylist() == ["a", None, "名"]
+    assert columns["blob"].to_pylist() == [b"\x00", b"\x01\x02", None]
+    assert columns["empty"].to_pylist() == [None] * 3
+    assert columns["mixed"].to_pylist() == ["7", "x", None]  # 数值列遇到文本整列转为文本
+    assert columns["text"].valid.tolist() == [True, False, True]
+
+
+def test_empty_result():
+    assert decode_columns(make_rsp([], [])) == {}
+
+
+def test_to_arrow_matches_pylist(columns):
+    pytest.importorskip("pyarrow")
+    table = to_arrow(columns)
+    assert table.column_names == NAMES
+    for name in NAMES:
+        assert table.column(name).to_pylist() == columns[name].to_pylist()
+
+
+def test_query_sql_columnar_binds_params(port):
+    db = sqlite3.connect(":memory:", check_same_thread=False)
+    db.execute("CREATE TABLE t (id INTEGER, name TEXT);")
+    db.executemany("INSERT INTO t VALUES (?, ?);", [(i, f"n{i}") for i in range(10)])
+    with StandInServer(port, db=db):
+        wcf = Wcf(host="127.0.0.1", port=port, block=False)
+        try:
+            cols = wcf.query_sql_columnar("db", "SELECT id, name FROM t WHERE id >= :lo ORDER BY id", {"lo": 7})
+        finally:
+            wcf.cleanup()
+    assert cols["id"].values.tolist() == [7, 8, 9]
+    assert cols["name"].to_pylist() == ["n7", "n8", "n9"]
@@ -0,0 +1,110 @@
+# -*- coding: utf-8 -*-
+
+import asyncio
+import os
+import time
+from concurrent.futures import CancelledError
+from threading import Event
+
+import pytest
+from standin import StandInServer
+
+from wcferry import Wcf
+from wcferry.completion import CompletionTracker, poll, resolved
+
+
+class Probe():
+    """第 `ready_at` 次探测时返回结果，并记录每次探测的时间"""
+
+    def __init__(self, ready_at: int, result="done") -> None:
+        self.ready_at = ready_at
+        self.result = result
+        self.times = []
+
+    def __call__(self):
+        self.times.append(time.monotonic())
+        return self.result if len(self.times) >= self.ready_at else None
+
+
+@pytest.fixture
+def tracker():
+    tracker = CompletionTracker(initial_delay=0.01, max_delay=0.08, factor=2)
+    yield tracker
+    tracker.close()
+
+
+def test_resolved():
+    assert resolved(1).result() == 1
+    with pytest.raises(KeyError):
+        resolved(error=KeyError()).result()
+
+
+def test_probes_back_off_until_done(tracker):
+    probe = Probe(6)
+    done = Event()
+    future = tracker.track(probe, timeout=5, callback=lambda f: done.set())
+    assert future.result(timeout=5) == "done"
+    assert done.wait(1)
+    gaps = [b - a for a, b in zip(probe.times, probe.times[1:])]
+    assert gaps[-1] > gaps[0] * 2  # 间隔在增长
+    assert max(gaps) < 0.08 + 0.05  # 不超过 max_delay（留出调度误差）
+    assert tracker.stats()["completed"] == 1
+
+
+def test_timeout_and_error(tracker):
+    slow = tracker.track(Probe(10 ** 6), timeout=0.1)
+    with pytest.raises(TimeoutError):
+        slow.result(timeout=2)
+
+    def broken():
+        raise ValueError("bad")
+    with pytest.raises(ValueError):
+        tracker.track(broken, timeout=1).result(timeout=2)
+    stats = tracker.stats()
+    assert (stats["timeouts"], stats["errors"], stats["pending"]) == (1, 1, 0)
+
+
+def test_many_tasks_share_one_thread(tracker):
+    futures = [tracker.track(Probe(i % 4 + 1, i), timeout=5, initial_delay=0) for i in range(200)]
+    assert [f.result(timeout=5) for f in futures] == list(range(200))
+
+
+def test_close_cancels_pending():
+    tracker = CompletionTracker()
+    future = tracker.track(Probe(10 ** 6), timeout=60)
+    tracker.close()
+    with pytest.raises(CancelledError):
+        future.result(timeout=1)
+    with pytest.raises(RuntimeError):
+        tracker.track(Probe(1), timeout=1)
+
+
+def test_async_poll():
+    calls = []
+
+    async def probe():
+        calls.append(1)
+        return "ok" if len(calls) == 3 else None
+
+    assert asyncio.run(poll(probe, timeout=2, initial_delay=0)) == "ok"
+
+    async def never():
+        return None
+
+    with pytest.raises(TimeoutError):
+        asyncio.run(poll(never, timeout=0.1))
+
+
+def test_download_image_waits_for_attachment(port, tmp_path):
+    with StandInServer(port, attach_latency=lambda: 0.2) as server:
+        server.images["/wx/abc.dat"] = b"jpeg bytes"
+        wcf = Wcf(host="127.0.0.1", port=port, block=False)
+        try:
+            start = time.monotonic()
+            path = wcf.download_image(1, "/wx/abc.dat", str(tmp_path), timeout=5)
+            assert 0.2 <= time.monotonic() - start < 2  # 完成后很快返回，不是固定按秒轮询
+            assert os.path.basename(path) == "abc.jpg"
+            with open(path, "rb") as f:
+                assert f.read() == b"jpeg bytes"
+        finally:
+            wcf.cleanup()
@@ -0,0 +1,93 @@
+# -*- coding: utf-8 -*-
+
+import sqlite3
+
+import pytest
+from standin import StandInServer
+
+from wcferry import RetryPolicy, Wcf, wcf_pb2
+from wcferry.contacts import ContactStore
+
+CONTACTS = [
+    ("wxid_a", "alice01", "", "Alice"),
+    ("wxid_b", "", "老板", "Bob"),
+    ("wxid_c", "", "", "Bob"),
+    ("123@chatroom", "", "", "群"),
+    ("gh_news", "", "", "公众号"),
+    ("filehelper", "", "", "文件传输助手"),
+]
+
+
+class ContactServer(StandInServer):
+    """记录拉取通讯录的次数"""
+
+    def __init__(self, port: int, db: sqlite3.Connection) -> None:
+        self.pulls = 0
+        super().__init__(port, db=db)
+
+    def respond(self, req):
+        if req.func == wcf_pb2.FUNC_GET_CONTACTS:
+            self.pulls += 1
+        return super().respond(req)
+
+
+@pytest.fixture
+def server(port):
+    db = sqlite3.connect(":memory:", check_same_thread=False)
+    db.execute("CREATE TABLE Contact (UserName TEXT, Alias TEXT, Remark TEXT, NickName TEXT);")
+    db.executemany("INSERT INTO Contact VALUES (?, ?, ?, ?);", CONTACTS)
+    server = ContactServer(port, db)
+    yield server
+    server.close()
+
+
+@pytest.fixture
+def wcf(server, port):
+    wcf = Wcf(host="127.0.0.1", port=port, block=False, retry=RetryPolicy(max_attempts=1), breaker=False)
+    yield wcf
+    wcf.cleanup()
+
+
+def test_indexes_and_categories(wcf):
+    store = ContactStore(wcf)
+    assert store.refresh()
+    assert len(store) == len(CONTACTS)
+    assert store.get("wxid_a").name == "Alice"
+    assert store.by_code("alice01").wxid == "wxid_a"
+    assert sorted(c.wxid for c in store.find("Bob")) == ["wxid_b", "wxid_c"]
+    assert [c.wxid for c in store.find("老板")] == ["wxid_b"]
+    assert store.friends == {"wxid_a", "wxid_b", "wxid_c"}
+    assert store.chatrooms == {"123@chatroom"}
+    assert store.official == {"gh_news"}
+    assert store.system == {"filehelper"}
+
+
+def test_refresh_only_when_changed(server, wcf):
+    store = ContactStore(wcf)
+    store.refresh()
+    assert not store.refresh()
+    assert server.pulls == 1
+
+    server.db.execute("INSERT INTO Contact VALUES ('wxid_d', '', '', 'Dan');")
+    assert store.refresh()
+    assert "wxid_d" in store
+
+
+def test_same_length_rename_is_picked_up_after_max_age(server, wcf):
+    store = ContactStore(wcf, max_age=60)
+    store.refresh()
+    server.db.execute("UPDATE Contact SET NickName = 'Alici' WHERE UserName = 'wxid_a';")
+    assert not store.refresh()  # 指纹不变
+    store.max_age = 0
+    assert store.refresh()
+    assert store.get("wxid_a").name == "Alici"
+
+
+def test_dicts_are_copies(wcf):
+    contacts = wcf.get_contacts()
+    contacts[0]["name"] = "changed"
+    assert wcf.get_contacts()[0]["name"] != "changed"
+    friends = wcf.get_friends()
+    friends[0]["remark"] = "changed"
+    assert all(f["remark"] != "changed" for f in wcf.get_friends())
+    assert {f["wxid"] for f in friends} == {"wxid_a", "wxid_b", "wxid_c"}
@@ -0,0 +1,65 @@
+# -*- coding: utf-8 -*-
+
+import os
+
+import pytest
+
+from wcferry import datimage
+
+JPG = b"\xff\xd8\xff\xe0" + bytes(range(256)) * 4
+PNG = b"\x89PNG\r\n\x1a\n" + os.urandom(100)
+
+
+def encrypt(data: bytes, key: int) -> bytes:
+    return bytes(b ^ key for b in data)
+
+
+@pytest.mark.parametrize("data, ext", [(JPG, "jpg"), (PNG, "png")])
+def test_decrypt_bytes(data, ext):
+    assert datimage.detect_key(encrypt(data, 0x5a)[:8]) == (0x5a, ext)
+    assert datimage.decrypt_bytes(encrypt(data, 0x5a)) == (data, ext)
+
+
+def test_unknown_format(tmp_path):
+    src = tmp_path / "x.dat"
+    src.write_bytes(b"\x00\x01\x02\x03junk")
+    assert datimage.decrypt_bytes(src.read_bytes()) == (b"", "")
+    assert datimage.decrypt_file(str(src)) == ""
+    assert datimage.decrypt_file(str(tmp_path / "missing.dat")) == ""
+
+
+def test_decrypt_file(tmp_path):
+    src = tmp_path / "abc.dat"
+    src.write_bytes(encrypt(JPG, 0x33))
+    out = tmp_path / "out"
+    out.mkdir()
+    dst = datimage.decrypt_file(str(src), str(out))
+    assert dst == str(out / "abc.jpg")
+    assert open(dst, "rb").read() == JPG
+
+
+def test_large_file_in_chunks(tmp_path, monkeypatch):
+    # 超过 CHUNK 的文件分块异或（装了 numpy 时走 mmap），结果与整块一致
+    monkeypatch.setattr(datimage, "CHUNK", 100)
+    src = tmp_path / "big.dat"
+    src.write_bytes(encrypt(JPG, 0x77))
+    assert open(datimage.decrypt_file(str(src)), "rb").read() == JPG
+
+
+def test_decrypt_dir(tmp_path):
+    src = tmp_path / "src"
+    (src / "2024-01").mkdir(parents=True)
+    (src / "a.dat").write_bytes(encrypt(JPG, 1))
+    (src / "2024-01" / "b.dat").write_bytes(encrypt(PNG, 2))
+    (src / "bad.dat").write_bytes(b"\x00\x00\x00\x00")
+    (src / "note.txt").write_text("不是图片")
+
+    dst = tmp_path / "dst"
+    results = datimage.decrypt_dir(str(src), str(dst), workers=1)
+    assert results == {
+        str(src / "a.dat"): os.path.join(str(dst), ".", "a.jpg"),
+        str(src / "bad.dat"): "",
+        str(src / "2024-01" / "b.dat"): str(dst / "2024-01" / "b.png"),
+    }
+    assert (dst / "2024-01" / "b.png").read_bytes() == PNG
+    assert list(datimage.decrypt_dir(str(src), recursive=False, workers=1)) == [str(src / "a.dat"), str(src / "bad.dat")]
@@ -0,0 +1,89 @@
+# -*- coding: utf-8 -*-
+
+import os
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from threading import Thread
+
+import pytest
+
+from wcferry.dlmanager import DownloadManager
+
+BODY = b"\x89PNG" + b"x" * 200_000
+
+
+class Handler(BaseHTTPRequestHandler):
+    hits = []
+
+    def log_message(self, *args) -> None:
+        pass
+
+    def do_GET(self) -> None:
+        self.hits.append(self.path)
+        if self.path == "/broken.png":  # 声称的长度比实际发送的多，中途断开
+            self.send_response(200)
+            self.send_header("Content-Type", "image/png")
+            self.send_header("Content-Length", str(len(BODY)))
+            self.end_headers()
+            self.wfile.write(BODY[:1000])
+            self.wfile.flush()
+            self.close_connection = True
+            return
+        if self.headers.get("If-None-Match") == '"v1"':
+            self.send_response(304)
+            self.end_headers()
+            return
+        self.send_response(200)
+        self.send_header("Content-Type", "image/png")
+        self.send_header("Content-Length", str(len(BODY)))
+        self.send_header("ETag", '"v1"')
+        self.end_headers()
+        self.wfile.write(BODY)
+
+
+@pytest.fixture
+def http():
+    Handler.hits = []
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    Thread(target=server.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{server.server_port}"
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def manager(tmp_path):
+    dm = DownloadManager(str(tmp_path / "dl"), max_age=300, timeout=5)
+    yield dm
+    dm.close()
+
+
+def test_nothing_on_disk_until_first_fetch(tmp_path, manager, http):
+    assert not os.path.exists(manager.dir)
+    path = manager.fetch(f"{http}/a/pic.png")
+    assert os.path.basename(path) == "pic.png"
+    with open(path, "rb") as f:
+        assert f.read() == BODY
+
+
+def test_cached_then_revalidated(manager, http):
+    url = f"{http}/pic.png"
+    path = manager.fetch(url)
+    assert manager.fetch(url) == path
+    assert len(Handler.hits) == 1  # 有效期内不发请求
+
+    manager.max_age = 0
+    assert manager.fetch(url) == path  # 过期后条件请求，304 复用
+    assert len(Handler.hits) == 2
+
+
+def test_failed_download_leaves_nothing_behind(manager, http):
+    assert manager.fetch(f"{http}/broken.png") is None
+    leftovers = [f for _, _, files in os.walk(manager.dir) for f in files if f != "index.db"]
+    assert leftovers == []
+
+
+def test_evict_oldest_over_budget(manager, http):
+    paths = [manager.fetch(f"{http}/{i}.png") for i in range(3)]
+    manager.max_bytes = len(BODY) * 2
+    manager._evict(min_idle=0)
+    assert [os.path.exists(p) for p in paths] == [False, True, True]
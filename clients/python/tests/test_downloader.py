@@ -0,0 +1,102 @@
+# -*- coding: utf-8 -*-
+
+import os
+import time
+from concurrent.futures import CancelledError, Future
+
+import pytest
+
+from wcferry import ImageDownloader, wcf_pb2
+from wcferry.wxmsg import WxMsg
+
+
+class FakeWcf():
+    """`download_image_future` 返回由测试控制的 Future，按调用顺序记录 (消息 id, 目录)"""
+
+    def __init__(self) -> None:
+        self.calls = []
+
+    def download_image_future(self, id, extra, dir, timeout, store=None, imgdatahash=""):
+        future = Future()
+        self.calls.append((id, dir, future))
+        return future
+
+    def wait_calls(self, n: int) -> None:
+        deadline = time.monotonic() + 2
+        while len(self.calls) < n and time.monotonic() < deadline:
+            time.sleep(0.005)
+        assert len(self.calls) == n
+        time.sleep(0.02)
+        assert len(self.calls) == n  # 没有多发
+
+
+def image(id: int, room: str = "", sender: str = "wxid_a", type: int = 3) -> WxMsg:
+    return WxMsg(wcf_pb2.WxMsg(id=id, type=type, roomid=room, sender=sender, ts=1700000000, extra=f"{id}.dat"))
+
+
+@pytest.fixture
+def wcf():
+    return FakeWcf()
+
+
+@pytest.fixture
+def downloader(wcf, tmp_path):
+    downloader = ImageDownloader(wcf, str(tmp_path), layout="{room}/{date}", concurrency=1)
+    yield downloader
+    downloader.close()
+
+
+def test_layout_and_result(wcf, downloader, tmp_path):
+    future = downloader.submit(image(1, "r@chatroom"))
+    wcf.wait_calls(1)
+    _, dir, download = wcf.calls[0]
+    assert dir == os.path.join(str(tmp_path), "r@chatroom", time.strftime("%Y-%m-%d", time.localtime(1700000000)))
+    assert os.path.isdir(dir)
+    download.set_result(os.path.join(dir, "1.jpg"))
+    assert future.result(timeout=1) == os.path.join(dir, "1.jpg")
+
+
+def test_rejects_non_images(downloader):
+    with pytest.raises(ValueError):
+        downloader.submit(image(1, type=1))
+
+
+def test_duplicates_share_a_future(wcf, downloader):
+    assert downloader.submit(image(1)) is downloader.submit(image(1))
+    wcf.wait_calls(1)
+    assert downloader.stats()["duplicates"] == 1
+
+
+def test_rooms_take_turns(wcf, downloader):
+    for i in range(4):
+        downloader.submit(image(i, "busy@chatroom"))
+    downloader.submit(image(10, "quiet@chatroom"))
+    for n in range(1, 6):
+        wcf.wait_calls(n)  # 一次只下载一张
+        wcf.calls[-1][2].set_result("ok")
+    assert [id for id, _, _ in wcf.calls] == [0, 10, 1, 2, 3]
+
+
+def test_failed_download_can_be_resubmitted(wcf, downloader):
+    future = downloader.submit(image(1))
+    wcf.wait_calls(1)
+    wcf.calls[0][2].set_exception(TimeoutError())
+    with pytest.raises(TimeoutError):
+        future.result(timeout=1)
+    retry = downloader.submit(image(1))
+    assert retry is not future
+    wcf.wait_calls(2)
+    assert downloader.stats()["failed"] == 1
+
+
+def test_close_cancels_queued(wcf, downloader):
+    running = downloader.submit(image(1))
+    queued = downloader.submit(image(2))
+    wcf.wait_calls(1)
+    downloader.close()
+    with pytest.raises(CancelledError):
+        queued.result(timeout=1)
+    wcf.calls[0][2].set_result("ok")
+    assert running.result(timeout=1) == "ok"
+    with pytest.raises(RuntimeError):
+        downloader.submit(image(3))
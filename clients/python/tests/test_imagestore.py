@@ -0,0 +1,89 @@
+# -*- coding: utf-8 -*-
+
+import os
+
+import pytest
+from standin import StandInServer
+
+from wcferry import ImageStore, Wcf
+from wcferry.imagestore import default_cache_dir, imgdatahash_of, sha256_file
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = ImageStore(str(tmp_path / "store"))
+    yield store
+    store.close()
+
+
+def image(dir, name: str, data: bytes) -> str:
+    path = os.path.join(str(dir), name)
+    with open(path, "wb") as f:
+        f.write(data)
+    return path
+
+
+def test_imgdatahash_of():
+    xml = '<msg><img aeskey="k" imgdatahash = "1a2b3c" length="12" /></msg>'
+    assert imgdatahash_of(xml) == "1a2b3c"
+    assert imgdatahash_of("<msg><img /></msg>") == ""
+    assert imgdatahash_of(None) == ""
+
+
+def test_default_cache_dir(tmp_path, monkeypatch):
+    monkeypatch.setenv("WCF_CACHE_DIR", str(tmp_path / "cache"))
+    assert default_cache_dir("ocr") == str(tmp_path / "cache" / "ocr")
+    assert os.path.isdir(tmp_path / "cache" / "ocr")
+
+    monkeypatch.delenv("WCF_CACHE_DIR")
+    monkeypatch.delenv("LOCALAPPDATA", raising=False)
+    monkeypatch.setenv("XDG_CACHE_HOME", str(tmp_path / "xdg"))
+    assert default_cache_dir() == str(tmp_path / "xdg" / "wcferry")
+
+
+def test_same_content_stored_once(store, tmp_path):
+    a = image(tmp_path, "a.jpg", b"same bytes")
+    hash = sha256_file(a)
+    assert store.add_file(a, msgid=1, imgdatahash="h1") == a
+    b = image(tmp_path, "b.jpg", b"same bytes")
+    assert store.add_file(b, msgid=2) == b
+
+    stored = store.path_of(hash, ".jpg")
+    assert os.path.samefile(a, stored) and os.path.samefile(b, stored)  # 都是指向库里同一文件的硬链接
+    assert store.stats() == {"blobs": 1, "bytes": len(b"same bytes"), "refs": 2, "msgs": 2}
+
+    # 同一条消息重复入库不增加引用
+    store.add_file(image(tmp_path, "c.jpg", b"same bytes"), msgid=2)
+    assert store.stats()["refs"] == 2
+
+
+def test_lookup_and_remember(store, tmp_path):
+    stored = store.add_file(image(tmp_path, "a.jpg", b"x"), msgid=1, imgdatahash="h1", alias=False)
+    assert not os.path.exists(tmp_path / "a.jpg")
+    assert store.lookup(msgid=1) == stored
+    assert store.lookup(msgid=99, imgdatahash="h1") == stored
+    assert store.lookup(msgid=99) is None
+
+    store.remember(stored, msgid=2, imgdatahash="h2")
+    assert store.lookup(imgdatahash="h2") == store.lookup(msgid=2) == stored
+    assert store.stats()["refs"] == 2
+
+    os.remove(stored)  # 库里的文件被删掉后视为没有
+    assert store.lookup(msgid=1) is None
+
+
+def test_forwarded_image_not_downloaded_again(port, tmp_path, store):
+    with StandInServer(port) as server:
+        server.images["/wx/a.dat"] = b"jpeg bytes"
+        server.images["/wx/b.dat"] = b"jpeg bytes"
+        wcf = Wcf(host="127.0.0.1", port=port, block=False)
+        try:
+            first = wcf.download_image(1, "/wx/a.dat", str(tmp_path), timeout=5, store=store, imgdatahash="h")
+            served = server.served
+            second = wcf.download_image(2, "/wx/b.dat", str(tmp_path), timeout=5, store=store, imgdatahash="h")
+            assert server.served == served  # 命中图片库，没有请求服务端
+            assert os.path.basename(second) == "b.jpg"
+            assert os.path.samefile(first, second)
+            assert store.stats()["blobs"] == 1
+        finally:
+            wcf.cleanup()
@@ -0,0 +1,96 @@
+# -*- coding: utf-8 -*-
+
+import sqlite3
+
+import pytest
+from standin import StandInServer
+
+from wcferry import RetryPolicy, Wcf, wcf_pb2
+from wcferry.sql import iter_pages
+
+ROWS = 2500
+
+
+def make_db() -> sqlite3.Connection:
+    db = sqlite3.connect(":memory:", check_same_thread=False)
+    db.execute("CREATE TABLE MSG (localId INTEGER PRIMARY KEY, talker TEXT, content TEXT);")
+    db.executemany("INSERT INTO MSG VALUES (?, ?, ?);",
+                   [(i, "room" if i % 2 else "friend", f"m{i}") for i in range(1, ROWS + 1)])
+    return db
+
+
+class FailingServer(StandInServer):
+    """`fail_after` 页之后的查询不回包"""
+
+    fail_after = None
+
+    def respond(self, req):
+        if req.func == wcf_pb2.FUNC_EXEC_DB_QUERY and self.fail_after is not None:
+            if self.fail_after == 0:
+                return None
+            self.fail_after -= 1
+        return super().respond(req)
+
+
+@pytest.fixture
+def server(port):
+    server = FailingServer(port, db=make_db())
+    yield server
+    server.close()
+
+
+@pytest.fixture
+def wcf(server, port):
+    wcf = Wcf(host="127.0.0.1", port=port, block=False, retry=RetryPolicy(max_attempts=1), breaker=False)
+    wcf.cmd_socket.recv_timeout = 300
+    yield wcf
+    wcf.cleanup()
+
+
+@pytest.mark.parametrize("prefetch", [True, False])
+def test_all_rows_in_key_order(wcf, prefetch):
+    rows = list(wcf.iter_sql("MSG", "SELECT localId, content FROM MSG;", page_size=1000, prefetch=prefetch))
+    assert len(rows) == ROWS
+    assert rows[0] == {"localId": 1, "content": "m1"}
+    assert [r["localId"] for r in rows] == list(range(1, ROWS + 1))
+
+
+def test_params_and_tuple_form(wcf):
+    rows = list(wcf.iter_sql("MSG", "SELECT localId, talker FROM MSG WHERE talker = ? -- only rooms", ("room",),
+                             page_size=300, form="tuple"))
+    assert len(rows) == ROWS // 2
+    assert all(talker == "room" for _, talker in rows)
+
+
+def test_failed_page_raises(server, wcf):
+    server.fail_after = 1
+    rows = wcf.iter_sql("MSG", "SELECT localId FROM MSG", page_size=1000)
+    with pytest.raises(RuntimeError):
+        for _ in rows:
+            pass
+
+
+def test_iter_pages_stops_on_short_page():
+    queries = []
+
+    def fetch(sql):
+        queries.append(sql)
+        start = len(queries) * 10
+        return ["id"], [(i,) for i in range(start, start + (10 if len(queries) < 3 else 4))]
+
+    pages = list(iter_pages(fetch, "SELECT id FROM t;", "id", 10, prefetch=False))
+    assert [len(rows) for _, rows in pages] == [10, 10, 4]
+    assert "WHERE" not in queries[0]
+    assert queries[1].endswith(") WHERE id > 19 ORDER BY id LIMIT 10;")
+
+
+def test_iter_pages_prefetch_reraises_fetch_errors():
+    def fetch(sql):
+        if "WHERE" in sql:
+            raise RuntimeError("boom")
+        return ["id"], [(1,), (2,)]
+
+    pages = iter_pages(fetch, "SELECT id FROM t", "id", 2)
+    assert next(pages)[1] == [(1,), (2,)]
+    with pytest.raises(RuntimeError, match="boom"):
+        next(pages)
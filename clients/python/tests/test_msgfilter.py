@@ -0,0 +1,54 @@
+# -*- coding: utf-8 -*-
+
+import pytest
+
+from wcferry import MsgFilter, wcf_pb2
+
+AT_ME = "<msgsource><atuserlist>wxid_me</atuserlist></msgsource>"
+
+
+def msg(**kwargs) -> wcf_pb2.WxMsg:
+    fields = dict(type=1, is_group=True, is_self=False, roomid="r@chatroom", sender="wxid_a", content="hi", xml="")
+    fields.update(kwargs)
+    return wcf_pb2.WxMsg(**fields)
+
+
+@pytest.mark.parametrize("kwargs, keep, drop", [
+    ({"types": {1, 3}}, msg(type=3), msg(type=49)),
+    ({"is_group": False}, msg(is_group=False, roomid=""), msg()),
+    ({"from_self": False}, msg(), msg(is_self=True)),
+    ({"roomids": {"r@chatroom"}}, msg(), msg(roomid="other@chatroom")),
+    ({"senders": {"wxid_a"}}, msg(), msg(sender="wxid_b")),
+    ({"at_me": True}, msg(xml=AT_ME), msg(xml=AT_ME, content="@所有人 开会")),
+    ({"at_me": False}, msg(), msg(xml=AT_ME)),
+])
+def test_each_rule(kwargs, keep, drop):
+    f = MsgFilter(**kwargs)
+    accept = f.compile("wxid_me")
+    assert accept(keep)
+    assert not accept(drop)
+    rule = next(iter(kwargs))
+    assert f.stats() == {"accepted": 1, "rejected": 1, f"rejected.{rule}": 1}
+
+
+def test_rules_checked_in_order():
+    f = MsgFilter(senders={"wxid_a"}, types={1}, roomids={"r@chatroom"})
+    f.compile()
+    assert not f(msg(type=3, sender="wxid_b"))  # 先检查类型，记在 types 上
+    assert not f(msg(roomid="x@chatroom", sender="wxid_b"))
+    assert not f(msg(sender="wxid_b"))
+    assert f(msg())
+    assert f.stats() == {"accepted": 1, "rejected": 3, "rejected.types": 1, "rejected.roomids": 1,
+                         "rejected.senders": 1}
+
+
+def test_empty_filter_accepts_everything():
+    f = MsgFilter()
+    assert f(msg()) and f(msg(type=49, is_self=True))
+    assert f.stats() == {"accepted": 2, "rejected": 0}
+
+
+def test_at_me_needs_wxid():
+    with pytest.raises(ValueError):
+        MsgFilter(at_me=True).compile()
+    assert MsgFilter(types={1}).compile()  # 其他规则不需要
@@ -0,0 +1,82 @@
+# -*- coding: utf-8 -*-
+
+from queue import Full
+
+import pytest
+from standin import StandInServer
+
+from wcferry import Wcf, wcf_pb2
+from wcferry.msgqueue import BLOCK, DROP_NEWEST, DROP_OLDEST, SPILL, MsgQueue
+from wcferry.wxmsg import WxMsg
+
+
+def make_msg(i: int) -> WxMsg:
+    msg = WxMsg(wcf_pb2.WxMsg(id=i, content=str(i)))
+    msg.offset = i
+    return msg
+
+
+def drain(q: MsgQueue) -> list:
+    return [m.id for m in q.get_many(100, 0)]
+
+
+def test_drop_oldest():
+    dropped = []
+    q = MsgQueue(3, DROP_OLDEST, on_drop=lambda m: dropped.append(m.id))
+    for i in range(5):
+        q.put(make_msg(i))
+    assert drain(q) == [2, 3, 4]
+    assert dropped == [0, 1]
+    assert q.stats()["dropped"] == 2
+
+
+def test_drop_newest():
+    dropped = []
+    q = MsgQueue(3, DROP_NEWEST, on_drop=lambda m: dropped.append(m.id))
+    q.put_many([make_msg(i) for i in range(5)])
+    assert drain(q) == [0, 1, 2]
+    assert dropped == [3, 4]
+
+
+def test_block_times_out_when_full():
+    q = MsgQueue(2, BLOCK)
+    q.put(make_msg(0))
+    q.put(make_msg(1))
+    with pytest.raises(Full):
+        q.put(make_msg(2), timeout=0.05)
+    with pytest.raises(Full):
+        q.put_nowait(make_msg(2))
+    assert drain(q) == [0, 1]
+
+
+def test_spill_keeps_order_and_offsets(tmp_path):
+    q = MsgQueue(4, SPILL, spill_path=str(tmp_path / "spill"))
+    for i in range(20):
+        q.put(make_msg(i))
+    assert q.qsize() == 20
+    assert q.stats()["spilled"] == 16
+
+    got = []
+    while not q.empty():
+        msg = q.get(timeout=1)
+        got.append((msg.id, msg.offset))
+    assert got == [(i, i) for i in range(20)]
+    q.close()
+    assert not (tmp_path / "spill").exists()
+
+
+def test_unbounded_queue_never_blocks():
+    q = MsgQueue(0, BLOCK)
+    for i in range(20000):
+        q.put_nowait(make_msg(i))
+    assert q.qsize() == 20000
+    assert not q.full()
+
+
+def test_wcf_queue_is_unbounded_by_default(port):
+    with StandInServer(port):
+        wcf = Wcf(host="127.0.0.1", port=port, block=False)
+        try:
+            assert (wcf.msgQ.maxsize, wcf.msgQ.policy) == (0, BLOCK)
+        finally:
+            wcf.cleanup()
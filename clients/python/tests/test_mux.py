@@ -0,0 +1,79 @@
+# -*- coding: utf-8 -*-
+
+import time
+
+import pynng
+import pytest
+from standin import StandInServer
+
+from wcferry import wcf_pb2
+from wcferry.mux import RequestMux
+
+GET_SELF = wcf_pb2.FUNC_GET_SELF_WXID
+SEND_TXT = wcf_pb2.FUNC_SEND_TXT
+
+
+class EchoServer(StandInServer):
+    """`send_txt` 回 `status = len(msg)`，接收人为 `slow` 的请求处理 0.3 秒，为 `lost` 的请求不回包"""
+
+    def respond(self, req):
+        if req.func == SEND_TXT:
+            if req.txt.receiver == "slow":
+                time.sleep(0.3)
+            if req.txt.receiver == "lost":
+                return None
+            return wcf_pb2.Response(func=SEND_TXT, status=len(req.txt.msg))
+        return super().respond(req)
+
+
+def send_txt(msg: str, receiver: str = "r") -> wcf_pb2.Request:
+    return wcf_pb2.Request(func=SEND_TXT, txt=wcf_pb2.TextMsg(msg=msg, receiver=receiver))
+
+
+@pytest.fixture
+def mux(port):
+    server = EchoServer(port)
+    sock = pynng.Pair1()
+    sock.recv_timeout = 100
+    sock.dial(f"tcp://127.0.0.1:{port}", block=True)
+    mux = RequestMux(sock)
+    yield mux
+    mux.close()
+    sock.close()
+    server.close()
+
+
+def test_responses_match_requests(mux):
+    futures = [mux.submit(send_txt("x" * n)) for n in range(1, 30)]
+    assert [f.result().status for f in futures] == list(range(1, 30))
+    assert mux.pending == 0
+
+
+def test_late_reply_is_not_handed_to_next_request(mux):
+    with pytest.raises(pynng.Timeout):
+        mux.call(send_txt("a", "slow"))
+    # 同类请求的迟到响应被丢掉，不会让后面的请求错位
+    mux._socket.recv_timeout = 1000
+    assert mux.call(send_txt("bb")).status == 2
+    assert mux.call(send_txt("ccc")).status == 3
+    assert mux.stats()["FUNC_SEND_TXT"]["errors"] == 1
+
+
+def test_lost_reply_does_not_block_later_requests(mux):
+    with pytest.raises(pynng.Timeout):
+        mux.call(send_txt("a", "lost"))
+    # 迟到的响应等不到，视为丢失，之后的请求照常发出
+    assert [mux.call(send_txt("x" * n)).status for n in range(1, 6)] == list(range(1, 6))
+    assert mux._stale == 0
+
+
+def test_mixed_functions_keep_order(mux):
+    futures = [mux.submit(send_txt("x" * n) if n % 2 else wcf_pb2.Request(func=GET_SELF)) for n in range(10)]
+    for n, f in enumerate(futures):
+        assert f.result().func == (SEND_TXT if n % 2 else GET_SELF)
+
+
+def test_submit_after_close_fails(mux):
+    mux.close()
+    with pytest.raises(pynng.Closed):
+        mux.submit(send_txt("a")).result(timeout=1)
@@ -0,0 +1,113 @@
+# -*- coding: utf-8 -*-
+
+from concurrent.futures import Future
+
+import pytest
+
+from wcferry.ocr import OcrService
+
+
+class FakeWcf():
+    """`get_ocr_result_future` 返回由测试控制的 Future；`failing` 中的图片立即失败"""
+
+    def __init__(self) -> None:
+        self.calls = []
+        self.failing = set()
+
+    def get_ocr_result_future(self, extra: str, timeout: float) -> Future:
+        future = Future()
+        self.calls.append((extra, future))
+        if extra in self.failing:
+            future.set_exception(TimeoutError())
+        return future
+
+    def finish(self, i: int, result: str = None, error: Exception = None) -> None:
+        future = self.calls[i][1]
+        if error is None:
+            future.set_result(result)
+        else:
+            future.set_exception(error)
+
+
+@pytest.fixture
+def image(tmp_path):
+    def write(name: str, data: bytes) -> str:
+        path = tmp_path / name
+        path.write_bytes(data)
+        return str(path)
+    return write
+
+
+@pytest.fixture
+def wcf():
+    return FakeWcf()
+
+
+def test_same_content_is_recognised_once(tmp_path, wcf, image):
+    service = OcrService(wcf, str(tmp_path / "ocr.db"))
+    a, b = image("a.jpg", b"same"), image("b.jpg", b"same")
+    fa, fb = service.submit(a), service.submit(b)
+    assert fa is fb and len(wcf.calls) == 1
+    wcf.finish(0, "hello")
+    assert fa.result() == "hello"
+    service.close()
+
+    service = OcrService(wcf, str(tmp_path / "ocr.db"))  # 缓存持久化
+    assert service.ocr(a) == "hello"
+    assert len(wcf.calls) == 1
+    assert service.stats()["hits"] == 1
+    service.close()
+
+
+@pytest.mark.parametrize("result, error", [("", None), (None, TimeoutError())])
+def test_failed_or_empty_results_are_not_cached(tmp_path, wcf, image, result, error):
+    service = OcrService(wcf, ":memory:")
+    path = image("a.jpg", b"x")
+    future = service.submit(path)
+    wcf.finish(0, result, error)
+    with pytest.raises(Exception):
+        future.result()
+    assert service.stats()["cached"] == 0
+
+    future = service.submit(path)
+    assert len(wcf.calls) == 2  # 重新识别
+    wcf.finish(1, "ok")
+    assert future.result() == "ok"
+    assert service.stats() == {"queued": 0, "in_flight": 0, "hits": 0, "misses": 2, "failed": 1, "cached": 1}
+
+
+def test_concurrency_limit_and_cancelled_queue_entries(wcf, image):
+    service = OcrService(wcf, ":memory:", concurrency=1)
+    paths = [image(f"{i}.jpg", bytes([i])) for i in range(3)]
+    futures = [service.submit(p) for p in paths]
+    assert len(wcf.calls) == 1
+    assert futures[1].cancel()  # 排队中的可以取消
+
+    wcf.finish(0, "r0")
+    assert [extra for extra, _ in wcf.calls] == [paths[0], paths[2]]
+    wcf.finish(1, "r2")
+    assert futures[2].result() == "r2"
+
+
+def test_ocr_many_tolerates_cancelled_futures(wcf, image):
+    service = OcrService(wcf, ":memory:", concurrency=1)
+    paths = [image(f"{i}.jpg", bytes([i])) for i in range(3)]
+    wcf.failing.add(paths[0])
+    results = service.ocr_many(paths)
+    assert next(results) == (paths[0], "")  # 第一张立即失败；第二张在识别，第三张在排队
+    assert service.submit(paths[2]).cancel()
+    wcf.finish(1, "r1")
+    assert sorted(results) == [(paths[1], "r1"), (paths[2], "")]
+
+
+def test_result_after_close_is_returned_but_not_cached(wcf, image):
+    service = OcrService(wcf, ":memory:", concurrency=1)
+    running = service.submit(image("a.jpg", b"a"))
+    queued = service.submit(image("b.jpg", b"b"))
+    service.close()
+    with pytest.raises(RuntimeError):
+        queued.result()
+    wcf.finish(0, "late")
+    assert running.result() == "late"
+    with pytest.raises(RuntimeError):
+        service.submit(image("c.jpg", b"c")).result()
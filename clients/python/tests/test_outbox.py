@@ -0,0 +1,120 @@
+# -*- coding: utf-8 -*-
+
+import time
+from concurrent.futures import CancelledError, wait
+
+import pytest
+
+from wcferry.outbox import Outbox, TokenBucket
+
+
+class FakeWcf():
+    """记录发送内容；`status` 为各接口的返回值，`error` 设置后发送时抛出"""
+
+    def __init__(self, status: int = 0, error: Exception = None) -> None:
+        self.status = status
+        self.error = error
+        self.sent = []
+
+    def send_text(self, msg, receiver, aters=""):
+        if self.error:
+            raise self.error
+        self.sent.append(("text", receiver, (msg, aters)))
+        return self.status
+
+    def send_image(self, path, receiver):
+        self.sent.append(("image", receiver, (path,)))
+        return self.status
+
+
+def test_rates_must_be_positive():
+    with pytest.raises(ValueError):
+        TokenBucket(0, 1)
+    with pytest.raises(ValueError):
+        Outbox(FakeWcf(), rate=0)
+    with pytest.raises(ValueError):
+        Outbox(FakeWcf(), receiver_rate=-1)
+
+
+def test_global_rate_limit():
+    outbox = Outbox(None, rate=50, burst=1, receiver_rate=1000, receiver_burst=1000, coalesce=0, dry_run=True)
+    start = time.monotonic()
+    futures = [outbox.send_text(f"m{i}", "r") for i in range(10)]
+    wait(futures, timeout=5)
+    assert time.monotonic() - start >= 9 / 50 * 0.9  # 第一条立即发出，其余每 20ms 一条
+    assert [f.result() for f in futures] == [0] * 10
+    outbox.close()
+
+
+def test_receivers_take_turns_and_priority_first():
+    outbox = Outbox(None, rate=20, burst=1, receiver_rate=1000, receiver_burst=1000, coalesce=0, dry_run=True)
+    outbox.send_text("warmup", "w").result(timeout=2)  # 用掉唯一的令牌，下面的任务都排上队后才开始发
+    futures = [outbox.send_text(f"a{i}", "a") for i in range(3)]
+    futures.append(outbox.send_text("b0", "b"))
+    futures.append(outbox.send_text("urgent", "c", priority=1))
+    wait(futures, timeout=5)
+    # 优先级高的先发，同优先级在接收人之间轮流
+    assert [args[0] for _, _, args in outbox.sent] == ["warmup", "urgent", "a0", "b0", "a1", "a2"]
+    outbox.close()
+
+
+def test_per_receiver_rate_limit():
+    outbox = Outbox(None, rate=1000, burst=1000, receiver_rate=20, receiver_burst=1, coalesce=0, dry_run=True)
+    slow = [outbox.send_text(f"a{i}", "a") for i in range(3)]
+    fast = [outbox.send_text(f"b{i}", f"b{i}") for i in range(5)]
+    wait(fast, timeout=5)
+    assert not all(f.done() for f in slow)  # 其他接收人不必等 a 的令牌
+    wait(slow, timeout=5)
+    outbox.close()
+
+
+def test_coalesce_texts():
+    wcf = FakeWcf()
+    outbox = Outbox(wcf, rate=10, burst=1, receiver_rate=1000, receiver_burst=1000)
+    outbox.send_text("first", "r").result(timeout=2)  # 用掉令牌，下面的消息都排上队后才发
+    futures = [outbox.send_text(line, "r") for line in ("a", "b", "c")]
+    at = outbox.send_text("hi @x", "r", aters="wxid_x")
+    image = outbox.send_image("/tmp/x.jpg", "r")
+    wait([at, image, *futures], timeout=5)
+    assert [f.result() for f in futures] == [0, 0, 0]
+    assert wcf.sent == [
+        ("text", "r", ("first", "")),
+        ("text", "r", ("a\nb\nc", "")),
+        ("text", "r", ("hi @x", "wxid_x")),  # @ 人的不合并
+        ("image", "r", ("/tmp/x.jpg",)),
+    ]
+    assert outbox.stats()["coalesced"] == 2
+    outbox.close()
+
+
+def test_failures_reach_futures():
+    outbox = Outbox(FakeWcf(status=-1))
+    assert outbox.send_text("x", "r").result(timeout=2) == -1  # 接口返回的失败状态原样给出
+    outbox.close()
+
+    outbox = Outbox(FakeWcf(error=RuntimeError("boom")))
+    with pytest.raises(RuntimeError):
+        outbox.send_text("x", "r").result(timeout=2)
+    assert outbox.stats()["failed"] == 1
+    outbox.close()
+
+
+def test_dry_run_keeps_recent_records():
+    outbox = Outbox(None, rate=1e6, burst=1e6, receiver_rate=1e6, receiver_burst=1e6, coalesce=0, dry_run=True,
+                    sent_maxlen=5)
+    wait([outbox.send_text(f"m{i}", f"r{i}") for i in range(20)], timeout=5)
+    assert [args[0] for _, _, args in outbox.sent] == [f"m{i}" for i in range(15, 20)]
+    assert outbox.stats()["sent"] == 20
+    outbox.close()
+
+
+def test_close_without_drain_cancels_queued():
+    outbox = Outbox(None, rate=1, burst=1, dry_run=True, coalesce=0)
+    first = outbox.send_text("now", "a")
+    first.result(timeout=2)
+    queued = outbox.send_text("later", "b")
+    outbox.close(drain=False)
+    with pytest.raises(CancelledError):
+        queued.result(timeout=1)
+    with pytest.raises(RuntimeError):
+        outbox.send_text("x", "a")
@@ -0,0 +1,84 @@
+# -*- coding: utf-8 -*-
+
+import random
+
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from wcferry.phash import HashIndex, ahash, dhash, hamming, phash  # noqa: E402
+
+
+def picture(seed: int, size: int = 64):
+    """平滑的随机灰度图：低频内容明显，缩放、加噪后哈希基本不变"""
+    rng = np.random.default_rng(seed)
+    coarse = rng.uniform(0, 255, (8, 8))
+    return np.kron(coarse, np.ones((size // 8, size // 8)))
+
+
+def random_hash(rng: random.Random) -> int:
+    return rng.getrandbits(64)
+
+
+def flip(h: int, bits) -> int:
+    for b in bits:
+        h ^= 1 << b
+    return h
+
+
+@pytest.mark.parametrize("hash", [ahash, dhash, phash])
+def test_near_duplicates_are_close(hash):
+    original = picture(1)
+    noisy = original + np.random.default_rng(2).normal(0, 4, original.shape)
+    assert hamming(hash(original), hash(original)) == 0
+    assert hamming(hash(original), hash(noisy)) <= 6
+    assert hamming(hash(original), hash(picture(3))) > 10
+
+
+def test_reads_image_files(tmp_path):
+    Image = pytest.importorskip("PIL.Image")
+    path = str(tmp_path / "a.png")
+    Image.fromarray(picture(1, 128).astype(np.uint8)).save(path)
+    assert hamming(phash(path), phash(picture(1))) <= 4
+
+
+def test_index_matches_linear_scan():
+    rng = random.Random(0)
+    index = HashIndex(buffer=64)  # 小缓冲区，插入过程中会多次合并
+    hashes = {}
+    for i in range(500):
+        h = random_hash(rng)
+        if i % 10 == 0:  # 一部分是已有哈希的近似
+            h = flip(rng.choice(list(hashes.values())) if hashes else h, rng.sample(range(64), rng.randint(0, 6)))
+        hashes[f"img{i}"] = h
+        index.add(f"img{i}", h)
+    assert len(index) == 500
+
+    for q in list(hashes.values())[::25]:
+        expected = sorted((hamming(q, h), k) for k, h in hashes.items() if hamming(q, h) <= 8)
+        found = index.find_similar(q, max_distance=8)
+        assert sorted((d, k) for k, d in found) == expected
+        assert [d for _, d in found] == sorted(d for _, d in found)
+    assert len(index.find_similar(hashes["img0"], max_distance=64, limit=3)) == 3
+
+
+def test_save_and_load(tmp_path):
+    rng = random.Random(1)
+    index = HashIndex("dhash", buffer=16)
+    for i in range(40):
+        index.add(f"路径/{i}.jpg", random_hash(rng))
+    q = random_hash(rng)
+    index.add("target.jpg", flip(q, [3, 40]))
+
+    path = str(tmp_path / "hashes.npz")
+    index.save(path)
+    loaded = HashIndex.load(path)
+    assert (loaded.kind, len(loaded)) == ("dhash", 41)
+    assert loaded.find_similar(q, max_distance=4) == [("target.jpg", 2)]
+    loaded.add("new.jpg", q)
+    assert loaded.find_similar(q, max_distance=4) == [("new.jpg", 0), ("target.jpg", 2)]
+
+
+def test_unknown_kind():
+    with pytest.raises(ValueError):
+        HashIndex("md5")
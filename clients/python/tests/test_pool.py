@@ -0,0 +1,65 @@
+# -*- coding: utf-8 -*-
+
+import time
+
+import pytest
+from standin import StandInServer
+
+from wcferry import WcfPool, wcf_pb2
+from wcferry.pool import dial
+
+QUERY = wcf_pb2.FUNC_EXEC_DB_QUERY
+SEND_TXT = wcf_pb2.FUNC_SEND_TXT
+
+
+def request(func: int) -> wcf_pb2.Request:
+    return wcf_pb2.Request(func=func)
+
+
+@pytest.fixture
+def server(port):
+    server = StandInServer(port, delays={QUERY: 0.3, SEND_TXT: 0.1}, polyamorous=True)
+    yield server
+    server.close()
+
+
+@pytest.fixture
+def url(server, port):
+    return f"tcp://127.0.0.1:{port}"
+
+
+def test_requests_run_in_parallel(url):
+    pool = WcfPool(url, size=4, slow_lane=False)
+    try:
+        start = time.perf_counter()
+        futures = [pool.submit(request(SEND_TXT)) for _ in range(8)]
+        assert all(f.result().func == SEND_TXT for f in futures)
+        assert time.perf_counter() - start < 0.5  # 串行需要 0.8 秒
+        assert pool.stats()["FUNC_SEND_TXT"]["count"] == 8
+        assert sum(s["FUNC_SEND_TXT"]["count"] for s in pool.lane_stats() if s) == 8
+    finally:
+        pool.close()
+
+
+def test_slow_lane_keeps_fast_requests_moving(url):
+    pool = WcfPool(url, size=2, slow_lane=True)
+    try:
+        queries = [pool.submit(request(QUERY)) for _ in range(3)]
+        start = time.perf_counter()
+        assert pool.call(request(SEND_TXT)).func == SEND_TXT
+        assert time.perf_counter() - start < 0.25  # 没有排在查询后面
+        assert all(q.result().func == QUERY for q in queries)
+        assert "FUNC_EXEC_DB_QUERY" not in pool.lane_stats()[0]
+    finally:
+        pool.close()
+
+
+def test_primary_socket_is_not_closed(url):
+    primary = dial(url)
+    pool = WcfPool(url, size=2, primary=primary)
+    pool.close()
+    primary.send(request(SEND_TXT).SerializeToString())
+    rsp = wcf_pb2.Response()
+    rsp.ParseFromString(primary.recv())
+    assert rsp.func == SEND_TXT
+    primary.close()
@@ -0,0 +1,84 @@
+# -*- coding: utf-8 -*-
+
+import time
+
+import pynng
+import pytest
+from standin import StandInServer
+
+from wcferry import CircuitBreaker, RetryPolicy, Wcf, wcf_pb2
+from wcferry.retry import CircuitOpenError, RpcGuard
+
+
+class FlakyChannel():
+    """依次抛出 `errors` 中的异常，之后返回成功的响应"""
+
+    def __init__(self, *errors) -> None:
+        self.errors = list(errors)
+        self.calls = 0
+
+    def __call__(self, req):
+        self.calls += 1
+        if self.errors:
+            raise self.errors.pop(0)
+        return wcf_pb2.Response(func=req.func, status=0)
+
+
+def policy(attempts: int = 3) -> RetryPolicy:
+    return RetryPolicy(max_attempts=attempts, base_delay=0, jitter=False)
+
+
+def test_idempotent_call_is_retried():
+    send = FlakyChannel(pynng.Timeout("t", 5), pynng.Timeout("t", 5))
+    guard = RpcGuard(policy(), False)
+    rsp = guard.call(wcf_pb2.Request(func=wcf_pb2.FUNC_GET_CONTACTS), send)
+    assert (rsp.func, rsp.status, send.calls) == (wcf_pb2.FUNC_GET_CONTACTS, 0, 3)
+    assert guard.stats()["FUNC_GET_CONTACTS"]["retries"] == 2
+
+
+def test_send_is_not_retried_and_fails_with_minus_one():
+    send = FlakyChannel(pynng.Timeout("t", 5))
+    guard = RpcGuard(policy(), False)
+    rsp = guard.call(wcf_pb2.Request(func=wcf_pb2.FUNC_SEND_TXT), send)
+    assert (rsp.func, rsp.status, send.calls) == (0, -1, 1)
+    assert guard.stats()["FUNC_SEND_TXT"]["failed"] == 1
+
+
+def test_exhausted_retries_fail_with_minus_one():
+    send = FlakyChannel(*[pynng.Timeout("t", 5)] * 3)
+    rsp = RpcGuard(policy(), False).call(wcf_pb2.Request(func=wcf_pb2.FUNC_GET_CONTACTS), send)
+    assert (rsp.func, rsp.status) == (0, -1)
+
+
+def test_breaker_opens_and_half_opens():
+    breaker = CircuitBreaker(failure_threshold=2, reset_timeout=0.05)
+    guard = RpcGuard(policy(1), breaker)
+    req = wcf_pb2.Request(func=wcf_pb2.FUNC_GET_CONTACTS)
+    send = FlakyChannel(pynng.Timeout("t", 5), pynng.Timeout("t", 5))
+    guard.call(req, send)
+    guard.call(req, send)
+    assert breaker.state == CircuitBreaker.OPEN
+
+    assert guard.call(req, send).status == -1
+    assert send.calls == 2
+    assert guard.stats()["FUNC_GET_CONTACTS"]["rejected"] == 1
+    with pytest.raises(CircuitOpenError):
+        guard.submit(req, lambda r: None).result()
+
+    time.sleep(0.06)
+    assert guard.call(req, send).status == 0  # 探测成功，关闭熔断
+    assert breaker.state == CircuitBreaker.CLOSED
+
+
+def test_send_text_with_open_breaker_reports_failure(port):
+    server = StandInServer(port)
+    wcf = Wcf(host="127.0.0.1", port=port, block=False, retry=policy(1),
+              breaker=CircuitBreaker(failure_threshold=1, reset_timeout=60))
+    try:
+        wcf._guard.breaker.record_failure()
+        served = server.served
+        assert wcf.send_text("hi", "wxid_a") == -1
+        assert server.served == served
+    finally:
+        wcf.cleanup()
+        server.close()
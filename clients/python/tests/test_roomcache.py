@@ -0,0 +1,99 @@
+# -*- coding: utf-8 -*-
+
+import sqlite3
+
+import pytest
+from standin import StandInServer
+
+from wcferry import RetryPolicy, Wcf, wcf_pb2
+from wcferry.roomcache import RoomCache
+
+ROOM = "123@chatroom"
+
+
+def room_data(*members) -> bytes:
+    rd = wcf_pb2.RoomData()
+    for wxid, name in members:
+        m = rd.members.add(wxid=wxid)
+        if name:
+            m.name = name
+    return rd.SerializeToString()
+
+
+def make_db() -> sqlite3.Connection:
+    db = sqlite3.connect(":memory:", check_same_thread=False)
+    db.execute("CREATE TABLE Contact (UserName TEXT, Alias TEXT, Remark TEXT, NickName TEXT);")
+    db.execute("CREATE TABLE ChatRoom (ChatRoomName TEXT, RoomData BLOB);")
+    db.executemany("INSERT INTO Contact VALUES (?, '', '', ?);", [("wxid_a", "Alice"), ("wxid_b", "Bob")])
+    db.execute("INSERT INTO ChatRoom VALUES (?, ?);", (ROOM, room_data(("wxid_a", "A in room"), ("wxid_b", ""))))
+    return db
+
+
+class QueryServer(StandInServer):
+    """记录查询条数；`down` 时查询不回包"""
+
+    def __init__(self, port: int, db: sqlite3.Connection) -> None:
+        self.down = False
+        self.queries = 0
+        super().__init__(port, db=db)
+
+    def respond(self, req):
+        if req.func == wcf_pb2.FUNC_EXEC_DB_QUERY:
+            if self.down:
+                return None
+            self.queries += 1
+        return super().respond(req)
+
+
+@pytest.fixture
+def server(port):
+    server = QueryServer(port, make_db())
+    yield server
+    server.close()
+
+
+@pytest.fixture
+def wcf(server, port):
+    wcf = Wcf(host="127.0.0.1", port=port, block=False, retry=RetryPolicy(max_attempts=1), breaker=False)
+    wcf.cmd_socket.recv_timeout = 300
+    yield wcf
+    wcf.cleanup()
+
+
+def test_members_are_cached(server, wcf):
+    cache = RoomCache(wcf)
+    assert cache.members(ROOM) == {"wxid_a": "A in room", "wxid_b": "Bob"}
+    queries = server.queries
+    assert cache.alias("wxid_b", ROOM) == "Bob"
+    assert cache.alias("wxid_x", ROOM) == ""
+    assert server.queries == queries
+
+
+def test_member_change_message_invalidates(server, wcf):
+    cache = RoomCache(wcf)
+    cache.members(ROOM)
+    server.db.execute("INSERT INTO Contact VALUES ('wxid_c', '', '', 'Carol');")
+    server.db.execute("UPDATE ChatRoom SET RoomData = ?;", (room_data(("wxid_a", ""), ("wxid_c", "")),))
+
+    cache.on_msg(wcf_pb2.WxMsg(type=1, roomid=ROOM, content="加入了群聊"))  # 不是系统消息
+    cache.on_msg(wcf_pb2.WxMsg(type=10000, roomid=ROOM, content="你好"))
+    assert "wxid_c" not in cache.members(ROOM)
+
+    cache.on_msg(wcf_pb2.WxMsg(type=10000, roomid=ROOM, content='"Alice"邀请"Carol"加入了群聊'))
+    assert cache.members(ROOM) == {"wxid_a": "Alice", "wxid_c": "Carol"}
+
+
+def test_failed_load_is_not_cached(server, wcf):
+    cache = RoomCache(wcf)
+    server.down = True
+    assert cache.members(ROOM) == {}
+    assert cache.alias("wxid_a", ROOM) == ""
+    server.down = False
+    assert cache.members(ROOM) == {"wxid_a": "A in room", "wxid_b": "Bob"}
+
+
+def test_nicknames_expire(server, wcf):
+    cache = RoomCache(wcf, ttl=0)
+    assert cache.alias("wxid_b", ROOM) == "Bob"
+    server.db.execute("UPDATE Contact SET NickName = 'Bobby' WHERE UserName = 'wxid_b';")
+    assert cache.alias("wxid_b", ROOM) == "Bobby"
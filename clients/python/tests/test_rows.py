@@ -0,0 +1,50 @@
+# -*- coding: utf-8 -*-
+
+from wcferry import wcf_pb2
+from wcferry.rpc import parse_rows
+
+BLOB = b"\x00\x01\xff"
+
+
+def make_rsp(*rows) -> wcf_pb2.Response:
+    rsp = wcf_pb2.Response(func=wcf_pb2.FUNC_EXEC_DB_QUERY)
+    for fields in rows:
+        row = rsp.rows.rows.add()
+        for column, type, content in fields:
+            row.fields.add(column=column, type=type, content=content)
+    return rsp
+
+
+def typed_row(i: int) -> list:
+    return [("n", 1, str(i).encode()), ("f", 2, b"1.5"), ("s", 3, "名字".encode("utf-8")), ("b", 4, BLOB),
+            ("z", 5, b"")]
+
+
+def test_types_in_every_form():
+    rsp = make_rsp(typed_row(1), typed_row(-2))
+    assert parse_rows(rsp) == [
+        {"n": 1, "f": 1.5, "s": "名字", "b": BLOB, "z": None},
+        {"n": -2, "f": 1.5, "s": "名字", "b": BLOB, "z": None},
+    ]
+    assert parse_rows(rsp, "tuple") == (["n", "f", "s", "b", "z"],
+                                        [(1, 1.5, "名字", BLOB, None), (-2, 1.5, "名字", BLOB, None)])
+    assert parse_rows(rsp, "columns") == {"n": [1, -2], "f": [1.5, 1.5], "s": ["名字"] * 2, "b": [BLOB] * 2,
+                                          "z": [None, None]}
+
+
+def test_blob_view():
+    (row,) = parse_rows(make_rsp(typed_row(1)), blob_view=True)
+    assert isinstance(row["b"], memoryview)
+    assert bytes(row["b"]) == BLOB
+
+
+def test_empty_result():
+    rsp = make_rsp()
+    assert parse_rows(rsp) == []
+    assert parse_rows(rsp, "tuple") == ([], [])
+    assert parse_rows(rsp, "columns") == {}
+
+
+def test_mismatched_row_is_aligned_by_column():
+    rsp = make_rsp([("a", 1, b"1"), ("b", 3, b"x")], [("b", 3, b"y")], [("b", 3, b"z"), ("a", 1, b"3"), ("c", 1, b"9")])
+    assert parse_rows(rsp, "tuple") == (["a", "b"], [(1, "x"), (None, "y"), (3, "z")])
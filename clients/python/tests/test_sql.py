@@ -0,0 +1,56 @@
+# -*- coding: utf-8 -*-
+
+import pytest
+
+from wcferry.sql import bind, keyset_page, literal, normalize
+
+
+@pytest.mark.parametrize("value, expected", [
+    (None, "NULL"),
+    (True, "1"),
+    (False, "0"),
+    (42, "42"),
+    (1.5, "1.5"),
+    (float("nan"), "NULL"),
+    (float("inf"), "9e999"),
+    (float("-inf"), "-9e999"),
+    (b"\x00\xff", "X'00ff'"),
+    ("it's", "'it''s'"),
+])
+def test_literal(value, expected):
+    assert literal(value) == expected
+
+
+def test_bind_positional_and_named():
+    assert bind("SELECT * FROM t WHERE a = ? AND b = ?", (1, "x")) == "SELECT * FROM t WHERE a = 1 AND b = 'x'"
+    assert bind("SELECT * FROM t WHERE a = :a OR b = :a", {"a": "o'k"}) == \
+        "SELECT * FROM t WHERE a = 'o''k' OR b = 'o''k'"
+
+
+def test_bind_skips_quotes_and_comments():
+    sql = "SELECT '?', \":x\" -- why? :y\nFROM t /* ? :z */ WHERE a = ?"
+    assert bind(sql, (1,)) == "SELECT '?', \":x\" -- why? :y\nFROM t /* ? :z */ WHERE a = 1"
+
+
+def test_bind_rejects_mismatched_params():
+    with pytest.raises(ValueError):
+        bind("SELECT ?, ?", (1,))
+    with pytest.raises(ValueError):
+        bind("SELECT ?", (1, 2))
+    with pytest.raises(ValueError):
+        bind("SELECT :a", {"b": 1})
+    with pytest.raises(ValueError):
+        bind("SELECT ?", {"a": 1})
+    with pytest.raises(ValueError):
+        bind("SELECT :a", (1,))
+
+
+def test_normalize_keeps_comment_lines_apart():
+    assert normalize("SELECT  a\n FROM t;") == normalize("SELECT a FROM t")
+    assert normalize("SELECT a -- x\nFROM t") != normalize("SELECT a -- x FROM t")
+
+
+def test_keyset_page_survives_trailing_comment():
+    page = keyset_page("SELECT * FROM t -- all", "id", 5, 10)
+    assert page.endswith(") WHERE id > 5 ORDER BY id LIMIT 10;")
+    assert "-- all\n)" in page
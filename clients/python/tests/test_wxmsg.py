@@ -0,0 +1,81 @@
+# -*- coding: utf-8 -*-
+
+import pytest
+
+from wcferry import LazyWxMsg, WxMsg, wcf_pb2
+from wcferry.wxmsg import _LAZY_FIELDS, parse_atuserlist
+
+
+def pb(**kwargs) -> wcf_pb2.WxMsg:
+    fields = dict(is_self=False, is_group=True, id=42, type=1, ts=1700000000, sign="s", roomid="r@chatroom",
+                  sender="wxid_a", content="你好", thumb="", extra="", xml="<msgsource />")
+    fields.update(kwargs)
+    return wcf_pb2.WxMsg(**fields)
+
+
+def materialized(msg: LazyWxMsg) -> set:
+    names = set()
+    for name in _LAZY_FIELDS:
+        try:
+            object.__getattribute__(msg, name)
+        except AttributeError:
+            continue
+        names.add(name)
+    return names
+
+
+def test_lazy_fields_read_on_demand():
+    msg = LazyWxMsg(pb())
+    assert materialized(msg) == set()
+    assert msg.type == 1 and msg.roomid == "r@chatroom"
+    assert materialized(msg) == {"type", "roomid"}  # 没访问的大字段不取出
+    assert not hasattr(msg, "__dict__")
+    with pytest.raises(AttributeError):
+        msg.nonexistent
+
+
+def test_lazy_matches_wxmsg():
+    raw = pb(thumb="/t.jpg", extra="/e.dat")
+    eager, lazy = WxMsg(raw), LazyWxMsg(raw)
+    for name in _LAZY_FIELDS:
+        assert getattr(lazy, name) == getattr(eager, name)
+    assert str(lazy) == str(eager)
+    assert (lazy.from_self(), lazy.from_group(), lazy.is_text()) == (eager.from_self(), eager.from_group(), True)
+    assert lazy.to_pb() == eager.to_pb() == raw
+
+
+def test_lazy_to_pb_keeps_changes():
+    raw = pb()
+    msg = LazyWxMsg(raw)
+    msg.content = "改过的"
+    out = msg.to_pb()
+    assert out.content == "改过的" and out.sender == "wxid_a"
+    assert raw.content == "你好"  # 不改动原来的 protobuf
+
+
+AT_XML = "<msgsource><atuserlist><![CDATA[wxid_me, wxid_b,]]></atuserlist></msgsource>"
+
+
+@pytest.mark.parametrize("cls", [WxMsg, LazyWxMsg])
+def test_is_at(cls):
+    assert cls(pb(xml=AT_XML, content="@我 看看")).is_at("wxid_me")
+    assert cls(pb(xml=AT_XML, content="@我 看看")).is_at("wxid_b")
+    assert not cls(pb(xml=AT_XML, content="@我 看看")).is_at("wxid_c")
+    assert not cls(pb(xml=AT_XML, content="@所有人 开会")).is_at("wxid_me")
+    assert not cls(pb(xml=AT_XML, is_group=False)).is_at("wxid_me")  # 只有群消息才能 @
+    assert not cls(pb(xml="<msgsource />")).is_at("wxid_me")
+
+
+def test_parse_atuserlist():
+    assert parse_atuserlist(AT_XML) == {"wxid_me", "wxid_b"}
+    assert parse_atuserlist("<atuserlist>wxid_a</atuserlist>") == {"wxid_a"}
+    assert parse_atuserlist("<atuserlist></atuserlist>") == frozenset()
+    assert parse_atuserlist("<atuserlist>wxid_a") == frozenset()  # 不完整的 xml
+    assert parse_atuserlist("") == frozenset()
+
+
+def test_at_users_parsed_once():
+    msg = WxMsg(pb(xml=AT_XML))
+    users = msg.at_users()
+    msg.xml = "<msgsource />"
+    assert msg.at_users() is users
@@ -1,4 +1,14 @@
 # -*- coding: utf-8 -*-
 
 from wcferry.client import Wcf, __version__
-from wcferry.wxmsg import WxMsg
+from wcferry.aclient import AsyncWcf
+from wcferry.downloader import ImageDownloader
+from wcferry.imagestore import ImageStore
+from wcferry.msgfilter import MsgFilter
+from wcferry.msgqueue import MsgQueue
+from wcferry.ocr import OcrService
+from wcferry.outbox import Outbox
+from wcferry.pool import WcfPool
+from wcferry.retry import CircuitBreaker, RetryPolicy
+from wcferry.spool import MsgSpool
+from wcferry.wxmsg import LazyWxMsg, WxMsg
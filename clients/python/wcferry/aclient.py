@@ -0,0 +1,504 @@
+# -*- coding: utf-8 -*-
+
+import asyncio
+import ctypes
+import logging
+import os
+from collections import deque
+from functools import partial
+from threading import Thread
+from typing import Dict, List, Optional
+
+import pynng
+from wcferry import completion, rpc, wcf_pb2
+from wcferry import sql as sql_util
+from wcferry.client import Wcf, __version__
+from wcferry.dlmanager import DownloadManager
+from wcferry.retry import failed_response
+from wcferry.wxmsg import WxMsg
+
+
+class AsyncWcf():
+    """WeChatFerry 的 asyncio 版本，接口与 `Wcf` 一一对应，所有方法都需要 `await`。
+
+    请求以流水线方式发出：多个协程可以同时调用，请求按顺序写入 `cmd_socket`，
+    由一个后台任务按先进先出的顺序把响应分发给对应的协程，不会阻塞事件循环。
+    与 `RequestMux` 一样，超时的请求移出队列，之后的请求先等它的迟到响应回来并丢掉再发出，
+    等满 `timeout` 还没等到就认为响应已经丢失。
+
+    Args:
+        host (str): `wcferry` RPC 服务器地址，默认本地启动；也可以指定地址连接远程服务
+        port (int): `wcferry` RPC 服务器端口，默认为 10086，接收消息会占用 `port+1` 端口
+        debug (bool): 是否开启调试模式（仅本地启动有效）
+        timeout (float): 单个请求的超时时间（秒）
+        msg_queue_size (int): 接收消息队列的容量，满了以后接收任务等待消费者取走消息，0 为不限
+        download_dir (str): 网络资源下载缓存目录，参见 `Wcf`
+
+    Example:
+        async with AsyncWcf(host="127.0.0.1") as wcf:
+            await wcf.send_text("Hello world.", "filehelper")
+    """
+
+    def __init__(self, host: str = None, port: int = 10086, debug: bool = True, timeout: float = 5,
+                 msg_queue_size: int = 10000, download_dir: str = None) -> None:
+        self._local_mode = False
+        self._is_running = False
+        self._is_receiving_msg = False
+        self._wcf_root = os.path.abspath(os.path.dirname(__file__))
+        self.downloads = DownloadManager(download_dir)
+        self.LOG = logging.getLogger("WCF")
+        self.LOG.info(f"wcferry version: {__version__}")
+        self.port = port
+        self.host = host
+        self.timeout = timeout
+        self.msg_queue_size = msg_queue_size
+        self.sdk = None
+        if host is None:
+            self._local_mode = True
+            self.host = "127.0.0.1"
+            self.sdk = ctypes.cdll.LoadLibrary(f"{self._wcf_root}/sdk.dll")
+            if self.sdk.WxInitSDK(debug, port) != 0:
+                self.LOG.error("初始化失败！")
+                os._exit(-1)
+
+        self.cmd_url = f"tcp://{self.host}:{self.port}"
+        self.msg_url = self.cmd_url.replace(str(self.port), str(self.port + 1))
+        self.cmd_socket = None
+        self.msg_socket = None
+        self.msgQ = None
+        self.contacts = []
+        self.self_wxid = ""
+        self._pending = deque()  # (func, future)，与发送顺序一致
+        self._stale = 0          # 已超时、响应还没回来的请求数
+        self._drained = None     # `_stale` 归零时置位
+        self._send_lock = None
+        self._reader = None
+        self._listener = None
+
+    async def __aenter__(self) -> "AsyncWcf":
+        await self.connect()
+        return self
+
+    async def __aexit__(self, *exc) -> None:
+        await self.cleanup()
+
+    async def connect(self, block: bool = True) -> None:
+        """连接 RPC 服务器
+
+        Args:
+            block (bool): 是否等待微信登录
+        """
+        if self._is_running:
+            return
+
+        self.cmd_socket = pynng.Pair1()
+        self.cmd_socket.send_timeout = int(self.timeout * 1000)
+        await self._run_blocking(partial(self.cmd_socket.dial, self.cmd_url, block=True))
+        self.msgQ = asyncio.Queue(self.msg_queue_size)
+        self._send_lock = asyncio.Lock()
+        self._drained = asyncio.Event()
+        self._drained.set()
+        self._reader = Thread(target=self._read_responses, args=(asyncio.get_running_loop(),),
+                              name="AsyncWcfReader", daemon=True)
+        self._reader.start()
+        self._is_running = True
+
+        if block:
+            self.LOG.info("等待微信登录...")
+            while not await self.is_login():
+                await asyncio.sleep(1)
+            self.self_wxid = await self.get_self_wxid()
+
+    async def cleanup(self) -> None:
+        """关闭连接，回收资源"""
+        if not self._is_running:
+            return
+
+        await self.disable_recv_msg()
+        self.cmd_socket.close()
+        self.downloads.close()
+        while self._pending:
+            _, fut = self._pending.popleft()
+            if not fut.done():
+                fut.cancel()
+
+        if self._local_mode and self.sdk and self.sdk.WxDestroySDK() != 0:
+            self.LOG.error("退出失败！")
+
+        self._is_running = False
+
+    def _read_responses(self, loop: asyncio.AbstractEventLoop) -> None:
+        # 阻塞接收放在独立线程里，比逐条 `arecv` 开销小得多；响应交回事件循环分发
+        while True:
+            try:
+                data = self.cmd_socket.recv()
+            except pynng.Closed:
+                return
+            except Exception as e:
+                self.LOG.error(f"接收响应失败: {e}")
+                continue
+
+            rsp = wcf_pb2.Response()
+            rsp.ParseFromString(data)
+            loop.call_soon_threadsafe(self._dispatch, rsp)
+
+    def _dispatch(self, rsp: wcf_pb2.Response) -> None:
+        # 超时的请求已经移出 `_pending`，服务端仍会按顺序回包，且排在所有还在等待的请求前面
+        if self._stale:
+            self._stale -= 1
+            if not self._stale:
+                self._drained.set()
+            self.LOG.warning(f"丢弃超时请求的迟到响应: {wcf_pb2.Functions.Name(rsp.func)}")
+            return
+
+        if not self._pending or self._pending[0][0] != rsp.func:
+            self.LOG.warning(f"丢弃无法匹配的响应: {rsp.func}")
+            return
+
+        _, fut = self._pending.popleft()
+        if not fut.done():
+            fut.set_result(rsp)
+
+    def _abandon(self, func: int, fut: asyncio.Future) -> None:
+        # 超时或被取消的请求移出 `_pending`，它的响应到达时直接丢掉
+        try:
+            self._pending.remove((func, fut))
+        except ValueError:  # 响应已经到了
+            return
+        self._stale += 1
+        self._drained.clear()
+
+    async def _wait_stale(self) -> None:
+        # 持有 `_send_lock` 时调用：等迟到的响应收完再发新请求，等不到就认为已经丢失
+        if not self._stale:
+            return
+        try:
+            await asyncio.wait_for(self._drained.wait(), self.timeout)
+        except asyncio.TimeoutError:
+            self.LOG.warning(f"{self._stale} 个超时请求的响应没有等到，视为丢失")
+            self._stale = 0
+            self._drained.set()
+
+    async def _send_request(self, req: wcf_pb2.Request) -> wcf_pb2.Response:
+        data = req.SerializeToString()
+        fut = asyncio.get_running_loop().create_future()
+        async with self._send_lock:
+            await self._wait_stale()
+            self._pending.append((req.func, fut))
+            try:
+                try:
+                    self.cmd_socket.send(data, block=False)  # 大多数情况下发送缓冲区有空间，不必切换协程
+                except pynng.TryAgain:
+                    await self.cmd_socket.asend(data)
+            except Exception as e:
+                self._pending.remove((req.func, fut))
+                self.LOG.error(f"Call {wcf_pb2.Functions.Name(req.func)} failed: {e}")
+                return failed_response()
+
+        try:
+            return await asyncio.wait_for(fut, self.timeout)
+        except asyncio.TimeoutError:
+            self._abandon(req.func, fut)
+            self.LOG.error(f"Call {wcf_pb2.Functions.Name(req.func)} failed: timeout")
+            return failed_response()
+        except asyncio.CancelledError:
+            self._abandon(req.func, fut)
+            raise
+
+    # 与 `Wcf` 共用网络资源下载、路径处理逻辑
+    _download_file = Wcf._download_file
+    _process_path = Wcf._process_path
+
+    async def _run_blocking(self, func, *args):
+        return await asyncio.get_running_loop().run_in_executor(None, func, *args)
+
+    def is_receiving_msg(self) -> bool:
+        """是否已启动接收消息功能"""
+        return self._is_receiving_msg
+
+    async def get_qrcode(self) -> str:
+        """获取登录二维码，已经登录则返回空字符串"""
+        raise Exception("Not implemented, yet")
+        rsp = await self._send_request(rpc.get_qrcode())
+        return rsp.str
+
+    async def is_login(self) -> bool:
+        """是否已经登录"""
+        rsp = await self._send_request(rpc.is_login())
+        return rsp.status == 1
+
+    async def get_self_wxid(self) -> str:
+        """获取登录账户的 wxid"""
+        rsp = await self._send_request(rpc.get_self_wxid())
+        return rsp.str
+
+    async def get_msg_types(self) -> Dict:
+        """获取所有消息类型"""
+        rsp = await self._send_request(rpc.get_msg_types())
+        return rpc.parse_msg_types(rsp)
+
+    async def get_contacts(self) -> List[Dict]:
+        """获取完整通讯录"""
+        rsp = await self._send_request(rpc.get_contacts())
+        self.contacts = rpc.parse_contacts(rsp)
+        return self.contacts
+
+    async def get_dbs(self) -> List[str]:
+        """获取所有数据库"""
+        rsp = await self._send_request(rpc.get_dbs())
+        return rpc.parse_dbs(rsp)
+
+    async def get_tables(self, db: str) -> List[Dict]:
+        """获取 db 中所有表，参见 `Wcf.get_tables`"""
+        rsp = await self._send_request(rpc.get_tables(db))
+        return rpc.parse_tables(rsp)
+
+    async def get_user_info(self) -> Dict:
+        """获取登录账号个人信息"""
+        rsp = await self._send_request(rpc.get_user_info())
+        return rpc.parse_user_info(rsp)
+
+    async def get_audio_msg(self, id: int, dir: str, timeout: int = 3) -> str:
+        """获取语音消息并转成 MP3，参见 `Wcf.get_audio_msg`"""
+        if timeout == 0:
+            return (await self._send_request(rpc.get_audio_msg(id, dir))).str
+
+        async def probe():
+            return (await self._send_request(rpc.get_audio_msg(id, dir))).str or None
+
+        try:
+            return await completion.poll(probe, timeout, initial_delay=0)
+        except TimeoutError:
+            self.LOG.error(f"获取超时")
+            return ""
+
+    async def send_text(self, msg: str, receiver: str, aters: Optional[str] = "") -> int:
+        """发送文本消息，参见 `Wcf.send_text`"""
+        rsp = await self._send_request(rpc.send_text(msg, receiver, aters))
+        return rsp.status
+
+    async def send_image(self, path: str, receiver: str) -> int:
+        """发送图片，参见 `Wcf.send_image`"""
+        path = await self._run_blocking(self._process_path, path)
+        if isinstance(path, int):
+            return path
+
+        rsp = await self._send_request(rpc.send_image(path, receiver))
+        return rsp.status
+
+    async def send_file(self, path: str, receiver: str) -> int:
+        """发送文件，参见 `Wcf.send_file`"""
+        path = await self._run_blocking(self._process_path, path)
+        if isinstance(path, int):
+            return path
+
+        rsp = await self._send_request(rpc.send_file(path, receiver))
+        return rsp.status
+
+    async def send_xml(self, receiver: str, xml: str, type: int, path: str = None) -> int:
+        """发送 XML，参见 `Wcf.send_xml`"""
+        raise Exception("Not implemented, yet")
+        rsp = await self._send_request(rpc.send_xml(receiver, xml, type, path))
+        return rsp.status
+
+    async def send_emotion(self, path: str, receiver: str) -> int:
+        """发送表情，参见 `Wcf.send_emotion`"""
+        rsp = await self._send_request(rpc.send_emotion(path, receiver))
+        return rsp.status
+
+    async def send_rich_text(
+            self, name: str, account: str, title: str, digest: str, url: str, thumburl: str, receiver: str) -> int:
+        """发送富文本消息，参见 `Wcf.send_rich_text`"""
+        rsp = await self._send_request(rpc.send_rich_text(name, account, title, digest, url, thumburl, receiver))
+        return rsp.status
+
+    async def send_pat_msg(self, roomid: str, wxid: str) -> int:
+        """拍一拍群友，参见 `Wcf.send_pat_msg`"""
+        rsp = await self._send_request(rpc.send_pat_msg(roomid, wxid))
+        return rsp.status
+
+    async def forward_msg(self, id: int, receiver: str) -> int:
+        """转发消息，参见 `Wcf.forward_msg`"""
+        rsp = await self._send_request(rpc.forward_msg(id, receiver))
+        return rsp.status
+
+    async def get_msg(self) -> WxMsg:
+        """从消息队列中获取消息，没有消息时挂起等待；队列容量见 `msg_queue_size`"""
+        return await self.msgQ.get()
+
+    async def enable_receiving_msg(self, pyq=False) -> bool:
+        """允许接收消息，成功后通过 `get_msg` 读取消息"""
+        async def listening_msg():
+            try:
+                # 阻塞的 dial 放到线程池里，不占用事件循环
+                await self._run_blocking(partial(self.msg_socket.dial, self.msg_url, block=True))
+                while self._is_receiving_msg:
+                    try:
+                        msg = await self.msg_socket.arecv_msg()
+                    except pynng.Closed:
+                        break
+                    except asyncio.CancelledError:
+                        raise
+                    except Exception as e:
+                        continue
+
+                    rsp = wcf_pb2.Response()
+                    try:
+                        rsp.ParseFromString(msg.bytes)
+                    except Exception as e:
+                        self.LOG.error(f"解析消息失败: {e}")
+                        continue
+                    await self.msgQ.put(WxMsg(rsp.wxmsg))  # 队列满时等待，不再继续接收
+            except asyncio.CancelledError:
+                pass
+            finally:
+                # 退出前关闭通信通道
+                self.msg_socket.close()
+
+        if self._is_receiving_msg:
+            return True
+
+        rsp = await self._send_request(rpc.enable_receiving_msg(pyq))
+        if rsp.status != 0:
+            return False
+
+        self.msg_socket = pynng.Pair1()
+        self._is_receiving_msg = True
+        self._listener = asyncio.ensure_future(listening_msg())
+
+        return True
+
+    async def disable_recv_msg(self) -> int:
+        """停止接收消息"""
+        if not self._is_receiving_msg:
+            return 0
+
+        rsp = await self._send_request(rpc.disable_recv_msg())
+        self._is_receiving_msg = False
+        self._listener.cancel()
+
+        return rsp.status
+
+    async def query_sql(self, db: str, sql: str, params: sql_util.Params = None, form: str = "dict",
+                        blob_view: bool = False) -> List[Dict]:
+        """执行 SQL，参见 `Wcf.query_sql`"""
+        rsp = await self._send_request(rpc.query_sql(db, sql_util.bind(sql, params)))
+        return rpc.parse_rows(rsp, form, blob_view)
+
+    async def accept_new_friend(self, v3: str, v4: str, scene: int = 30) -> int:
+        """通过好友申请，参见 `Wcf.accept_new_friend`"""
+        raise Exception("Not implemented, yet")
+        rsp = await self._send_request(rpc.accept_new_friend(v3, v4, scene))
+        return rsp.status
+
+    async def get_friends(self) -> List[Dict]:
+        """获取好友列表"""
+        not_friends = {"fmessage", "medianote", "floatbottle", "filehelper", "newsapp"}
+        friends = []
+        for cnt in await self.get_contacts():
+            if (cnt["wxid"].endswith("@chatroom") or    # 群聊
+                    cnt["wxid"].startswith("gh_") or    # 公众号
+                    cnt["wxid"] in not_friends          # 其他杂号
+                ):
+                continue
+            friends.append(cnt)
+
+        return friends
+
+    async def receive_transfer(self, wxid: str, transferid: str, transactionid: str) -> int:
+        """接收转账，参见 `Wcf.receive_transfer`"""
+        rsp = await self._send_request(rpc.receive_transfer(wxid, transferid, transactionid))
+        return rsp.status
+
+    async def refresh_pyq(self, id: int = 0) -> int:
+        """刷新朋友圈，参见 `Wcf.refresh_pyq`"""
+        rsp = await self._send_request(rpc.refresh_pyq(id))
+        return rsp.status
+
+    async def download_attach(self, id: int, thumb: str, extra: str) -> int:
+        """下载附件，参见 `Wcf.download_attach`"""
+        rsp = await self._send_request(rpc.download_attach(id, thumb, extra))
+        return rsp.status
+
+    async def get_info_by_wxid(self, wxid: str) -> dict:
+        """通过 wxid 查询微信号昵称等信息，参见 `Wcf.get_info_by_wxid`"""
+        raise Exception("Not implemented, yet")
+        rsp = await self._send_request(rpc.get_info_by_wxid(wxid))
+        contacts = rpc.parse_contacts(rsp)
+        return contacts[-1] if contacts else {}
+
+    async def revoke_msg(self, id: int = 0) -> int:
+        """撤回消息，参见 `Wcf.revoke_msg`"""
+        rsp = await self._send_request(rpc.revoke_msg(id))
+        return rsp.status
+
+    async def decrypt_image(self, src: str, dir: str) -> str:
+        """解密图片，参见 `Wcf.decrypt_image`"""
+        rsp = await self._send_request(rpc.decrypt_image(src, dir))
+        return rsp.str
+
+    async def get_ocr_result(self, extra: str, timeout: int = 2) -> str:
+        """获取 OCR 结果，参见 `Wcf.get_ocr_result`"""
+        async def probe():
+            status, result = rpc.parse_ocr(await self._send_request(rpc.get_ocr_result(extra)))
+            return result if status == 0 else None
+
+        try:
+            return await completion.poll(probe, timeout, initial_delay=0)
+        except TimeoutError:
+            self.LOG.error(f"OCR failed, timeout")
+            return ""
+
+    async def download_image(self, id: int, extra: str, dir: str, timeout: int = 30) -> str:
+        """下载图片，参见 `Wcf.download_image`"""
+        if await self.download_attach(id, "", extra) != 0:
+            self.LOG.error(f"下载失败")
+            return ""
+        async def probe():
+            return await self.decrypt_image(extra, dir) or None
+
+        try:
+            return await completion.poll(probe, timeout)
+        except TimeoutError:
+            self.LOG.error(f"下载超时")
+            return ""
+
+    async def add_chatroom_members(self, roomid: str, wxids: str) -> int:
+        """添加群成员，参见 `Wcf.add_chatroom_members`"""
+        rsp = await self._send_request(rpc.add_chatroom_members(roomid, wxids))
+        return rsp.status
+
+    async def del_chatroom_members(self, roomid: str, wxids: str) -> int:
+        """删除群成员，参见 `Wcf.del_chatroom_members`"""
+        rsp = await self._send_request(rpc.del_chatroom_members(roomid, wxids))
+        return rsp.status
+
+    async def invite_chatroom_members(self, roomid: str, wxids: str) -> int:
+        """邀请群成员，参见 `Wcf.invite_chatroom_members`"""
+        rsp = await self._send_request(rpc.invite_chatroom_members(roomid, wxids))
+        return rsp.status
+
+    async def get_chatroom_members(self, roomid: str) -> Dict:
+        """获取群成员，参见 `Wcf.get_chatroom_members`"""
+        contacts = await self.query_sql("MicroMsg.db", "SELECT UserName, NickName FROM Contact;")
+        contacts = {contact["UserName"]: contact["NickName"] for contact in contacts}
+        crs = await self.query_sql("MicroMsg.db", "SELECT RoomData FROM ChatRoom WHERE ChatRoomName = ?;", (roomid,))
+        if not crs:
+            return {}
+
+        return rpc.parse_room_members(crs[0].get("RoomData"), contacts)
+
+    async def get_alias_in_chatroom(self, wxid: str, roomid: str) -> str:
+        """获取群名片，参见 `Wcf.get_alias_in_chatroom`"""
+        nickname = await self.query_sql("MicroMsg.db", "SELECT NickName FROM Contact WHERE UserName = ?;", (wxid,))
+        if not nickname:
+            return ""
+
+        nickname = nickname[0].get("NickName", "")
+
+        crs = await self.query_sql("MicroMsg.db", "SELECT RoomData FROM ChatRoom WHERE ChatRoomName = ?;", (roomid,))
+        if not crs:
+            return ""
+
+        members = rpc.parse_room_members(crs[0].get("RoomData"), {wxid: nickname})
+        return members.get(wxid, "")
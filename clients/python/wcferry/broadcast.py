@@ -0,0 +1,129 @@
+# -*- coding: utf-8 -*-
+
+import json
+import logging
+import os
+from collections import deque
+from time import perf_counter
+from typing import Callable, Dict, Iterable
+
+from wcferry import rpc
+
+LOG = logging.getLogger("WCF")
+
+# 群发支持的类型：kind -> (以 payload、receiver 构造请求, 成功时的 status)
+KINDS: Dict[str, tuple] = {
+    "text": (lambda payload, receiver: rpc.send_text(payload, receiver), 0),
+    "image": (lambda payload, receiver: rpc.send_image(payload, receiver), 0),
+    "file": (lambda payload, receiver: rpc.send_file(payload, receiver), 0),
+    "emotion": (lambda payload, receiver: rpc.send_emotion(payload, receiver), 0),
+    "rich_text": (lambda payload, receiver: rpc.send_rich_text(receiver=receiver, **payload), 0),
+    "forward": (lambda payload, receiver: rpc.forward_msg(payload, receiver), 1),
+}
+
+
+def _load_checkpoint(path: str, header: dict) -> Dict[str, Dict]:
+    # 读出已经发送成功的接收人；文件末尾可能是写了一半的行，忽略
+    done = {}
+    with open(path, "r", encoding="utf-8") as f:
+        lines = f.read().splitlines()
+    if not lines:
+        return done
+    if json.loads(lines[0]) != header:
+        raise ValueError(f"断点文件 {path} 不是这次群发的，请换一个文件或删除它")
+    for line in lines[1:]:
+        try:
+            entry = json.loads(line)
+        except ValueError:
+            continue
+        if entry.pop("ok"):
+            done[entry.pop("receiver")] = entry
+    return done
+
+
+def broadcast(wcf, kind: str, payload, receivers: Iterable[str], checkpoint: str = None, window: int = 32,
+              callback: Callable[[str, Dict], None] = None) -> Dict[str, Dict]:
+    """把同一份内容发给多个接收人，见 `Wcf.broadcast`"""
+    if kind not in KINDS:
+        raise ValueError(f"不支持的群发类型: {kind}")
+    build, ok_status = KINDS[kind]
+    receivers = list(dict.fromkeys(receivers))
+    report = {}
+
+    # 图片、文件只处理一次路径：网络路径只下载一次，本地路径只检查一次
+    if kind in ("image", "file"):
+        path = wcf._process_path(payload)
+        if isinstance(path, int):
+            return {r: {"status": path, "ms": 0.0, "resumed": False} for r in receivers}
+        payload = path
+
+    out = None
+    if checkpoint:
+        header = {"kind": kind, "payload": payload}
+        if os.path.exists(checkpoint) and os.path.getsize(checkpoint):
+            for receiver, entry in _load_checkpoint(checkpoint, header).items():
+                report[receiver] = {**entry, "resumed": True}
+            with open(checkpoint, "rb+") as f:
+                f.seek(-1, os.SEEK_END)
+                if f.read(1) != b"\n":  # 上次写了一半的行，补上换行，不和新记录连在一起
+                    f.write(b"\n")
+        else:
+            with open(checkpoint, "w", encoding="utf-8") as f:
+                f.write(json.dumps(header, ensure_ascii=False) + "\n")
+        out = open(checkpoint, "a", encoding="utf-8")
+
+    def record(receiver: str, status: int, ms: float, persist: bool = True) -> None:
+        entry = {"status": status, "ms": ms, "resumed": False}
+        report[receiver] = entry
+        if out and persist:
+            out.write(json.dumps({"receiver": receiver, "status": status, "ms": ms, "ok": status == ok_status},
+                                 ensure_ascii=False) + "\n")
+            out.flush()  # 进程退出时已经写进去的行都是完整的
+        if callback:
+            callback(receiver, entry)
+
+    # 最多 `window` 个请求同时在命令通道里排队，I/O 线程收到一个响应就立刻发下一个，不等调用方往返
+    pending = deque()
+    todo = [r for r in receivers if r not in report]
+    try:
+        for receiver in todo:
+            req = build(payload, receiver)
+            pending.append((receiver, perf_counter(), wcf._guard.submit(req, wcf._mux.submit)))
+            while len(pending) >= window:
+                _collect(wcf, pending.popleft(), record)
+        while pending:
+            _collect(wcf, pending.popleft(), record)
+    finally:
+        for item in pending:  # 中途出错时撤回还没发出的请求
+            item[2].cancel()
+        if out:
+            out.close()
+
+    return {r: report[r] for r in receivers}
+
+
+def _collect(wcf, item: tuple, record: Callable[..., None]) -> None:
+    receiver, start, future = item
+    try:
+        rsp = future.result()
+    except Exception as e:
+        # 超时的请求可能已经送达，重发会让对方收到两次；记为失败、不写断点，下次用同一断点文件续发时再处理
+        LOG.warning(f"群发给 {receiver} 失败: {e!r}")
+        record(receiver, -1, (perf_counter() - start) * 1000, persist=False)
+        return
+    record(receiver, rsp.status, (perf_counter() - start) * 1000)
+
+
+def summarize(report: Dict[str, Dict], kind: str) -> Dict[str, float]:
+    """群发结果汇总：{total, ok, failed, resumed, ms_p50, ms_max}"""
+    ok_status = KINDS[kind][1]
+    ms = sorted(e["ms"] for e in report.values() if not e["resumed"])
+    ok = sum(1 for e in report.values() if e["status"] == ok_status)
+    return {
+        "total": len(report),
+        "ok": ok,
+        "failed": len(report) - ok,
+        "resumed": sum(1 for e in report.values() if e["resumed"]),
+        "ms_p50": ms[len(ms) // 2] if ms else 0.0,
+        "ms_max": ms[-1] if ms else 0.0,
+    }
@@ -4,49 +4,31 @@
 __version__ = "39.3.2.0"
 
 import atexit
-import base64
 import ctypes
 import logging
-import mimetypes
 import os
-import re
-import sys
-from queue import Queue
+import select
+from concurrent.futures import Future
 from threading import Thread
 from time import sleep
-from typing import Callable, Dict, List, Optional
+from typing import Callable, Dict, Iterable, Iterator, List, Optional
 
 import pynng
-import requests
-from google.protobuf import json_format
-from wcferry import wcf_pb2
-from wcferry.wcf_pb2 import RoomData
-from wcferry.wxmsg import WxMsg
-
-
-def _retry():
-    def decorator(func):
-        """ Retry the function """
-        def wrapper(*args, **kwargs):
-            def logerror(e):
-                func_name = re.findall(r"func: (.*?)\n", str(args[1]))[-1]
-                logging.getLogger("WCF").error(f"Call {func_name} failed: {e}")
-
-            try:
-                ret = func(*args, **kwargs)
-            except pynng.Timeout as _:  # 如果超时，重试
-                try:
-                    ret = func(*args, **kwargs)
-                except Exception as e:
-                    logerror(e)
-                    ret = wcf_pb2.Response()
-            except Exception as e:  # 其他异常，退出
-                logerror(f"Exiting... {e}")
-                sys.exit(-1)
-
-            return ret
-        return wrapper
-    return decorator
+from wcferry import broadcast, columnar, rpc, wcf_pb2
+from wcferry import sql as sql_util
+from wcferry.completion import CompletionTracker, resolved
+from wcferry.contacts import ContactStore
+from wcferry.dlmanager import DownloadManager
+from wcferry.imagestore import ImageStore
+from wcferry.msgfilter import MsgFilter
+from wcferry.msgqueue import MsgQueue
+from wcferry.sql import StatementCache
+from wcferry.mux import RequestMux
+from wcferry.pool import WcfPool
+from wcferry.retry import CircuitBreaker, RetryPolicy, RpcGuard
+from wcferry.roomcache import RoomCache
+from wcferry.spool import MsgSpool
+from wcferry.wxmsg import LazyWxMsg, WxMsg
 
 
 class Wcf():
@@ -57,18 +39,37 @@ class Wcf():
         port (int): `wcferry` RPC 服务器端口，默认为 10086，接收消息会占用 `port+1` 端口
         debug (bool): 是否开启调试模式（仅本地启动有效）
         block (bool): 是否阻塞等待微信登录，不阻塞的话可以手动获取登录二维码主动登录
+        pool_size (int): 命令通道连接数，大于 1 时使用 `WcfPool`，需要服务端支持多连接
+        retry (RetryPolicy): 请求失败的重试策略，默认只重试幂等的功能
+        breaker (CircuitBreaker): RPC 服务持续失败时的熔断器，传入 `False` 关闭熔断
+        msg_queue_size (int): 消息队列在内存中最多存放的消息数，默认 0 为不限（与原先的 `Queue()` 一致）；
+            设置上限后 `msg_overflow` 才起作用
+        msg_overflow (str): 消息队列满时的策略：`block` 阻塞接收、`drop_oldest`、`drop_newest` 或 `spill` 溢出到磁盘
+        lazy_msg (bool): 收到的消息使用 `LazyWxMsg`，字段在第一次访问时才取出
+        spool_dir (str): 消息日志目录；设置后收到的消息先写入日志再入队，处理完用 `ack_msg` 确认，重启后重放没确认的消息；
+            队列满时按 `drop_oldest`、`drop_newest` 丢弃的消息自动确认
+        download_dir (str): 网络资源下载缓存目录，默认在用户缓存目录下，第一次下载时才创建
 
     Attributes:
         contacts (list): 联系人缓存，调用 `get_contacts` 后更新
+        msgQ (MsgQueue): 接收到的消息，`stats()` 查看入队、丢弃、溢出条数与最高水位
+        spool (MsgSpool): 消息日志，未设置 `spool_dir` 时为 None
+        contact_store (ContactStore): 带索引的通讯录，按 wxid、微信号、备注/昵称查找
+        sql_cache (StatementCache): `query_sql` 结果缓存，可调整 `maxsize`、`ttl`，`stats()` 查看命中情况
+        room_cache (RoomCache): 群成员缓存，接收消息时自动感知成员变动
+        completions (CompletionTracker): 下载图片、获取语音、OCR 的完成跟踪器，可调整探测间隔
+        downloads (DownloadManager): 网络图片、文件的下载缓存，可调整 `max_bytes`，`prefetch` 预取
     """
 
-    def __init__(self, host: str = None, port: int = 10086, debug: bool = True, block: bool = True) -> None:
+    def __init__(self, host: str = None, port: int = 10086, debug: bool = True, block: bool = True,
+                 pool_size: int = 1, retry: RetryPolicy = None, breaker: CircuitBreaker = None,
+                 msg_queue_size: int = 0, msg_overflow: str = "block", lazy_msg: bool = False,
+                 spool_dir: str = None, download_dir: str = None) -> None:
         self._local_mode = False
         self._is_running = False
         self._is_receiving_msg = False
         self._wcf_root = os.path.abspath(os.path.dirname(__file__))
-        self._dl_path = f"{self._wcf_root}/.dl"
-        os.makedirs(self._dl_path, exist_ok=True)
+        self.downloads = DownloadManager(download_dir)
         self.LOG = logging.getLogger("WCF")
         self.LOG.info(f"wcferry version: {__version__}")
         self.port = port
@@ -93,6 +94,16 @@ class Wcf():
         except Exception as e:
             self.LOG.error(f"连接失败: {e}")
             os._exit(-2)
+        # 所有请求都经由它收发，多线程调用安全
+        if pool_size > 1:
+            try:
+                self._mux = WcfPool(self.cmd_url, pool_size, primary=self.cmd_socket)
+            except Exception as e:
+                self.LOG.error(f"连接失败: {e}")
+                os._exit(-2)
+        else:
+            self._mux = RequestMux(self.cmd_socket)
+        self._guard = RpcGuard(retry, breaker)
 
         self.msg_socket = pynng.Pair1()  # Server --> Client，接收消息
         self.msg_socket.send_timeout = 5000  # 发送 5 秒超时
@@ -103,9 +114,19 @@ class Wcf():
 
         self._is_running = True
         self.contacts = []
-        self.msgQ = Queue()
-        self._SQL_TYPES = {1: int, 2: float, 3: lambda x: x.decode("utf-8"), 4: bytes, 5: lambda x: None}
+        self.contact_store = ContactStore(self)
+        self._msg_type = LazyWxMsg if lazy_msg else WxMsg
+        self.spool = MsgSpool(spool_dir) if spool_dir else None
+        # 被丢弃的消息不会再交给消费者，直接确认，否则已确认位置停在那里，日志永远无法清理
+        self.msgQ = MsgQueue(msg_queue_size, msg_overflow, msg_type=self._msg_type, on_drop=self.ack_msg)
+        self._recv_thread = None
+        self._spool_replayed = False
+        self._SQL_TYPES = rpc.SQL_TYPES
+        self.sql_cache = StatementCache()  # `query_sql(..., cache=True)` 的结果缓存
+        self.room_cache = RoomCache(self)
+        self.completions = CompletionTracker()
         self.self_wxid = ""
+        self.msg_filter = None  # `enable_receiving_msg(filter=...)` 设置的过滤条件，`msg_filter.stats()` 查看计数
         if block:
             self.LOG.info("等待微信登录...")
             while not self.is_login():     # 等待微信登录成功
@@ -121,6 +142,14 @@ class Wcf():
             return
 
         self.disable_recv_msg()
+        if self._recv_thread:  # 等接收线程退出，之后不会再写消息日志
+            self._recv_thread.join(self.msg_socket.recv_timeout / 1000 + 1)
+        self.msgQ.close()
+        if self.spool:
+            self.spool.close()
+        self.completions.close()
+        self.downloads.close()
+        self._mux.close()
         self.cmd_socket.close()
 
         if self._local_mode and self.sdk and self.sdk.WxDestroySDK() != 0:
@@ -136,13 +165,24 @@ class Wcf():
         except Exception as e:
             self.cleanup()
 
-    @_retry()
     def _send_request(self, req: wcf_pb2.Request) -> wcf_pb2.Response:
-        data = req.SerializeToString()
-        self.cmd_socket.send(data)
-        rsp = wcf_pb2.Response()
-        rsp.ParseFromString(self.cmd_socket.recv_msg().bytes)
-        return rsp
+        return self._guard.call(req, self._mux.call)
+
+    def get_rpc_stats(self) -> Dict[str, Dict]:
+        """获取各功能的调用统计
+
+        Returns:
+            Dict[str, Dict]: {函数名: {count, errors, queue_avg, queue_max, rtt_avg, rtt_max}}，耗时单位为毫秒
+        """
+        return self._mux.stats()
+
+    def get_failure_stats(self) -> Dict[str, Dict]:
+        """获取各功能的失败计数
+
+        Returns:
+            Dict[str, Dict]: {函数名: {calls, retries, timeouts, errors, rejected, failed, last_error}}
+        """
+        return self._guard.stats()
 
     def is_receiving_msg(self) -> bool:
         """是否已启动接收消息功能"""
@@ -151,74 +191,37 @@ class Wcf():
     def get_qrcode(self) -> str:
         """获取登录二维码，已经登录则返回空字符串"""
         raise Exception("Not implemented, yet")
-        req = wcf_pb2.Request()
-        req.func = wcf_pb2.FUNC_REFRESH_QRCODE  # FUNC_REFRESH_QRCODE
-        rsp = self._send_request(req)
+        rsp = self._send_request(rpc.get_qrcode())
 
         return rsp.str
 
     def is_login(self) -> bool:
         """是否已经登录"""
-        req = wcf_pb2.Request()
-        req.func = wcf_pb2.FUNC_IS_LOGIN  # FUNC_IS_LOGIN
-        rsp = self._send_request(req)
+        rsp = self._send_request(rpc.is_login())
 
         return rsp.status == 1
 
     def get_self_wxid(self) -> str:
         """获取登录账户的 wxid"""
-        req = wcf_pb2.Request()
-        req.func = wcf_pb2.FUNC_GET_SELF_WXID  # FUNC_GET_SELF_WXID
-        rsp = self._send_request(req)
+        rsp = self._send_request(rpc.get_self_wxid())
 
         return rsp.str
 
     def get_msg_types(self) -> Dict:
         """获取所有消息类型"""
-        req = wcf_pb2.Request()
-        req.func = wcf_pb2.FUNC_GET_MSG_TYPES  # FUNC_GET_MSG_TYPES
-        rsp = self._send_request(req)
-        types = json_format.MessageToDict(rsp.types).get("types", {})
-        types = {int(k): v for k, v in types.items()}
-
-        return dict(sorted(dict(types).items()))
+        rsp = self._send_request(rpc.get_msg_types())
+        return rpc.parse_msg_types(rsp)
 
     def get_contacts(self) -> List[Dict]:
-        """获取完整通讯录"""
-        req = wcf_pb2.Request()
-        req.func = wcf_pb2.FUNC_GET_CONTACTS  # FUNC_GET_CONTACTS
-        rsp = self._send_request(req)
-        contacts = json_format.MessageToDict(rsp.contacts).get("contacts", [])
-
-        self.contacts.clear()
-        for cnt in contacts:
-            gender = cnt.get("gender", "")
-            if gender == 1:
-                gender = "男"
-            elif gender == 2:
-                gender = "女"
-            else:
-                gender = ""
-            contact = {
-                "wxid": cnt.get("wxid", ""),
-                "code": cnt.get("code", ""),
-                "remark": cnt.get("remark", ""),
-                "name": cnt.get("name", ""),
-                "country": cnt.get("country", ""),
-                "province": cnt.get("province", ""),
-                "city": cnt.get("city", ""),
-                "gender": gender}
-            self.contacts.append(contact)
+        """获取完整通讯录，通讯录没有改动时不重新拉取"""
+        self.contact_store.refresh()
+        self.contacts[:] = self.contact_store.dicts()
         return self.contacts
 
     def get_dbs(self) -> List[str]:
         """获取所有数据库"""
-        req = wcf_pb2.Request()
-        req.func = wcf_pb2.FUNC_GET_DB_NAMES  # FUNC_GET_DB_NAMES
-        rsp = self._send_request(req)
-        dbs = json_format.MessageToDict(rsp.dbs).get("names", [])
-
-        return dbs
+        rsp = self._send_request(rpc.get_dbs())
+        return rpc.parse_dbs(rsp)
 
     def get_tables(self, db: str) -> List[Dict]:
         """获取 db 中所有表
@@ -229,22 +232,13 @@ class Wcf():
         Returns:
             List[Dict]: `db` 下的所有表名及对应建表语句
         """
-        req = wcf_pb2.Request()
-        req.func = wcf_pb2.FUNC_GET_DB_TABLES  # FUNC_GET_DB_TABLES
-        req.str = db
-        rsp = self._send_request(req)
-        tables = json_format.MessageToDict(rsp.tables).get("tables", [])
-
-        return tables
+        rsp = self._send_request(rpc.get_tables(db))
+        return rpc.parse_tables(rsp)
 
     def get_user_info(self) -> Dict:
         """获取登录账号个人信息"""
-        req = wcf_pb2.Request()
-        req.func = wcf_pb2.FUNC_GET_USER_INFO  # FUNC_GET_USER_INFO
-        rsp = self._send_request(req)
-        ui = json_format.MessageToDict(rsp.ui)
-
-        return ui
+        rsp = self._send_request(rpc.get_user_info())
+        return rpc.parse_user_info(rsp)
 
     def get_audio_msg(self, id: int, dir: str, timeout: int = 3) -> str:
         """获取语音消息并转成 MP3
@@ -256,28 +250,32 @@ class Wcf():
         Returns:
             str: 成功返回存储路径；空字符串为失败，原因见日志。
         """
-        def _get_audio_msg(id, dir):
-            req = wcf_pb2.Request()
-            req.func = wcf_pb2.FUNC_GET_AUDIO_MSG  # FUNC_GET_AUDIO_MSG
-            req.am.id = id
-            req.am.dir = dir
-            rsp = self._send_request(req)
+        if timeout == 0:
+            return self._send_request(rpc.get_audio_msg(id, dir)).str
+
+        try:
+            return self.get_audio_msg_future(id, dir, timeout).result()
+        except TimeoutError:
+            self.LOG.error(f"获取超时")
+            return ""
 
-            return rsp.str
+    def get_audio_msg_future(self, id: int, dir: str, timeout: float = 3,
+                             callback: Callable[[Future], None] = None) -> Future:
+        """异步获取语音消息，立即返回 `Future`，由 `completions` 跟踪完成情况
 
-        if timeout == 0:
-            return _get_audio_msg(id, dir)
+        Args:
+            id (int): 语音消息 id
+            dir (str): MP3 保存目录（目录不存在会出错）
+            timeout (float): 超时时间（秒），超时后 `Future` 抛出 `TimeoutError`
+            callback (Callable): 完成时以 `Future` 为参数调用
 
-        cnt = 0
-        while cnt < timeout:
-            path = _get_audio_msg(id, dir)
-            if path:
-                return path
-            sleep(1)
-            cnt += 1
+        Returns:
+            Future: 结果为存储路径
+        """
+        def probe():
+            return self._send_request(rpc.get_audio_msg(id, dir)).str or None
 
-        self.LOG.error(f"获取超时")
-        return ""
+        return self.completions.track(probe, timeout, initial_delay=0, callback=callback)
 
     def send_text(self, msg: str, receiver: str, aters: Optional[str] = "") -> int:
         """发送文本消息
@@ -290,46 +288,15 @@ class Wcf():
         Returns:
             int: 0 为成功，其他失败
         """
-        req = wcf_pb2.Request()
-        req.func = wcf_pb2.FUNC_SEND_TXT  # FUNC_SEND_TXT
-        req.txt.msg = msg
-        req.txt.receiver = receiver
-        if aters:
-            req.txt.aters = aters
-        rsp = self._send_request(req)
+        rsp = self._send_request(rpc.send_text(msg, receiver, aters))
         return rsp.status
 
     def _download_file(self, url: str) -> str:
-        path = None
         if not self._local_mode:
             self.LOG.error(f"只有本地模式才支持网络路径！")
-            return path
-
-        try:
-            headers = {
-                'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/100.0.4896.127 Safari/537.36', }
-            rsp = requests.get(url, headers=headers, stream=True, timeout=60)
-            rsp.raw.decode_content = True
-
-            # 提取文件名
-            fname = os.path.basename(url)
-            ct = rsp.headers["content-type"]
-            ext = mimetypes.guess_extension(ct)
-            if ext:
-                if ext not in fname:
-                    fname = fname + ext
-                else:
-                    fname = fname.split(ext)[0] + ext
+            return None
 
-            # 保存文件，用完后删除
-            with open(f"{self._dl_path}/{fname}", "wb") as of:
-                of.write(rsp.content)
-
-            path = os.path.normpath(f"{self._dl_path}/{fname}")
-        except Exception as e:
-            self.LOG.error(f"网络资源下载失败: {e}")
-
-        return path
+        return self.downloads.fetch(url)
 
     def _process_path(self, path) -> str:
         """处理路径，如果是网络路径则下载文件
@@ -345,7 +312,7 @@ class Wcf():
         return path
 
     def send_image(self, path: str, receiver: str) -> int:
-        """发送图片，非线程安全
+        """发送图片
 
         Args:
             path (str): 图片路径，如：`C:/Projs/WeChatRobot/TEQuant.jpeg` 或 `https://raw.githubusercontent.com/lich0821/WeChatFerry/master/assets/TEQuant.jpg`
@@ -358,15 +325,11 @@ class Wcf():
         if isinstance(path, int):
             return path
 
-        req = wcf_pb2.Request()
-        req.func = wcf_pb2.FUNC_SEND_IMG  # FUNC_SEND_IMG
-        req.file.path = path
-        req.file.receiver = receiver
-        rsp = self._send_request(req)
+        rsp = self._send_request(rpc.send_image(path, receiver))
         return rsp.status
 
     def send_file(self, path: str, receiver: str) -> int:
-        """发送文件，非线程安全
+        """发送文件
 
         Args:
             path (str): 本地文件路径，如：`C:/Projs/WeChatRobot/README.MD` 或 `https://raw.githubusercontent.com/lich0821/WeChatFerry/master/README.MD`
@@ -379,11 +342,7 @@ class Wcf():
         if isinstance(path, int):
             return path
 
-        req = wcf_pb2.Request()
-        req.func = wcf_pb2.FUNC_SEND_FILE  # FUNC_SEND_FILE
-        req.file.path = path
-        req.file.receiver = receiver
-        rsp = self._send_request(req)
+        rsp = self._send_request(rpc.send_file(path, receiver))
         return rsp.status
 
     def send_xml(self, receiver: str, xml: str, type: int, path: str = None) -> int:
@@ -399,14 +358,7 @@ class Wcf():
             int: 0 为成功，其他失败
         """
         raise Exception("Not implemented, yet")
-        req = wcf_pb2.Request()
-        req.func = wcf_pb2.FUNC_SEND_XML  # FUNC_SEND_XML
-        req.xml.receiver = receiver
-        req.xml.content = xml
-        req.xml.type = type
-        if path:
-            req.xml.path = path
-        rsp = self._send_request(req)
+        rsp = self._send_request(rpc.send_xml(receiver, xml, type, path))
         return rsp.status
 
     def send_emotion(self, path: str, receiver: str) -> int:
@@ -419,11 +371,7 @@ class Wcf():
         Returns:
             int: 0 为成功，其他失败
         """
-        req = wcf_pb2.Request()
-        req.func = wcf_pb2.FUNC_SEND_EMOTION  # FUNC_SEND_EMOTION
-        req.file.path = path
-        req.file.receiver = receiver
-        rsp = self._send_request(req)
+        rsp = self._send_request(rpc.send_emotion(path, receiver))
         return rsp.status
 
     def send_rich_text(
@@ -450,17 +398,7 @@ class Wcf():
         Returns:
             int: 0 为成功，其他失败
         """
-        req = wcf_pb2.Request()
-        req.func = wcf_pb2.FUNC_SEND_RICH_TXT  # FUNC_SEND_RICH_TXT
-        req.rt.name = name
-        req.rt.account = account
-        req.rt.title = title
-        req.rt.digest = digest
-        req.rt.url = url
-        req.rt.thumburl = thumburl
-        req.rt.receiver = receiver
-
-        rsp = self._send_request(req)
+        rsp = self._send_request(rpc.send_rich_text(name, account, title, digest, url, thumburl, receiver))
         return rsp.status
 
     def send_pat_msg(self, roomid: str, wxid: str) -> int:
@@ -473,12 +411,7 @@ class Wcf():
         Returns:
             int: 1 为成功，其他失败
         """
-        req = wcf_pb2.Request()
-        req.func = wcf_pb2.FUNC_SEND_PAT_MSG  # FUNC_SEND_PAT_MSG
-        req.pm.roomid = roomid
-        req.pm.wxid = wxid
-
-        rsp = self._send_request(req)
+        rsp = self._send_request(rpc.send_pat_msg(roomid, wxid))
         return rsp.status
 
     def forward_msg(self, id: int, receiver: str) -> int:
@@ -492,14 +425,33 @@ class Wcf():
         Returns:
             int: 1 为成功，其他失败
         """
-        req = wcf_pb2.Request()
-        req.func = wcf_pb2.FUNC_FORWARD_MSG  # FUNC_FORWARD_MSG
-        req.fm.id = id
-        req.fm.receiver = receiver
-
-        rsp = self._send_request(req)
+        rsp = self._send_request(rpc.forward_msg(id, receiver))
         return rsp.status
 
+    def broadcast(self, kind: str, payload, receivers: Iterable[str], checkpoint: str = None, window: int = 32,
+                  callback: Callable[[str, Dict], None] = None) -> Dict[str, Dict]:
+        """把同一份内容发给多个接收人
+
+        图片、文件的路径只处理一次（网络路径只下载一次）；请求连续提交到命令通道，不逐个等待往返。
+        指定 `checkpoint` 时每发完一个接收人就记一行，进程中途退出后用同样的参数再调用一次，
+        只会发给还没成功的接收人；退出时已发出但没收到响应的请求（最多 `window` 个）可能会重复发送。
+        请求经过熔断器并计入 `get_failure_stats`；超时或熔断的接收人 `status` 为 -1，不会自动重发
+        （请求可能已经送达），也不写入断点文件，需要时用同一断点文件再调用一次。
+
+        Args:
+            kind (str): `text`、`image`、`file`、`emotion`、`rich_text` 或 `forward`
+            payload: 文本、图片/文件/表情路径、`send_rich_text` 除 `receiver` 外的参数（dict）或待转发消息的 id
+            receivers (Iterable[str]): 接收人，wxid 或者 roomid，重复的只发一次
+            checkpoint (str): 断点文件路径
+            window (int): 同时在命令通道里排队的请求数
+            callback (Callable): 每发完一个接收人以 (receiver, 结果) 调用
+
+        Returns:
+            Dict[str, Dict]: {receiver: {status, ms, resumed}}，`ms` 为该接收人从提交到响应的耗时（毫秒），
+            `resumed` 为真表示上次已经发送成功、本次跳过；`broadcast.summarize` 可汇总
+        """
+        return broadcast.broadcast(self, kind, payload, receivers, checkpoint, window, callback)
+
     def get_msg(self, block=True) -> WxMsg:
         """从消息队列中获取消息
 
@@ -514,18 +466,100 @@ class Wcf():
         """
         return self.msgQ.get(block, timeout=1)
 
-    def enable_receiving_msg(self, pyq=False) -> bool:
-        """允许接收消息，成功后通过 `get_msg` 读取消息"""
+    def get_msgs(self, max_n: int = 100, timeout: float = 1) -> List[WxMsg]:
+        """从消息队列中一次取出多条消息，消息量大时比逐条 `get_msg` 少很多锁竞争
+
+        Args:
+            max_n (int): 最多取多少条
+            timeout (float): 没有消息时最多等待多久（秒），0 为不等
+
+        Returns:
+            List[WxMsg]: 微信消息，超时返回空列表
+        """
+        return self.msgQ.get_many(max_n, timeout)
+
+    def ack_msg(self, msg: WxMsg) -> None:
+        """确认消息已经处理完，重启后不再重放；未设置 `spool_dir` 时什么也不做"""
+        if self.spool and msg.offset is not None:
+            self.spool.ack(msg.offset)
+
+    def _wrap_msg(self, pb: wcf_pb2.WxMsg) -> WxMsg:
+        # 设置了消息日志时先落盘，再交给消费者
+        msg = self._msg_type(pb)
+        if self.spool:
+            msg.offset = self.spool.append(pb)
+        return msg
+
+    def _compile_filter(self, filter: Optional[MsgFilter]) -> Optional[Callable[[wcf_pb2.WxMsg], bool]]:
+        self.msg_filter = filter
+        if filter is None:
+            return None
+        if filter.at_me is not None and not self.self_wxid:
+            self.self_wxid = self.get_self_wxid()
+        return filter.compile(self.self_wxid)
+
+    def _replay_spool(self, deliver: Callable[[WxMsg], None]) -> None:
+        # 每个进程只重放一次：上次退出时还没确认的消息
+        if not self.spool or self._spool_replayed:
+            return
+        self._spool_replayed = True
+        start, end = self.spool.committed(), self.spool.next_offset
+        if start < end:
+            self.LOG.info(f"重放消息日志中没有确认的 {end - start} 条消息")
+        for offset, pb in self.spool.read(start, end - start):
+            msg = self._msg_type(pb)
+            msg.offset = offset
+            deliver(msg)
+
+    def _recv_batch(self, max_n: int, accept: Callable[[wcf_pb2.WxMsg], bool] = None) -> List[wcf_pb2.WxMsg]:
+        # 阻塞等到一条消息，再不阻塞地取走已经到达的，最多 `max_n` 条；
+        # 用 `recv_fd` 判断有没有消息，比不阻塞地 `recv` 再捕获 `TryAgain` 便宜得多。
+        # `accept` 不通过的消息在这里丢掉，不落盘、不构造 `WxMsg`；群成员变动仍要通知群缓存
+        datas = [self.msg_socket.recv()]
+        if max_n > 1:
+            fd = self.msg_socket.recv_fd
+            while len(datas) < max_n and select.select([fd], [], [], 0)[0]:
+                try:
+                    datas.append(self.msg_socket.recv(block=False))
+                except pynng.TryAgain:
+                    break
+
+        msgs = []
+        for data in datas:
+            rsp = wcf_pb2.Response()  # 每条消息单独一个，`LazyWxMsg` 会一直引用它
+            try:
+                rsp.ParseFromString(data)
+            except Exception as e:
+                continue
+            pb = rsp.wxmsg
+            self.room_cache.on_msg(pb)
+            if accept is None or accept(pb):
+                msgs.append(pb)
+        return msgs
+
+    def enable_receiving_msg(self, pyq=False, batch: int = 1, filter: MsgFilter = None) -> bool:
+        """允许接收消息，成功后通过 `get_msg` 或 `get_msgs` 读取消息
+
+        Args:
+            pyq (bool): 是否接收朋友圈消息
+            batch (int): 接收线程每次醒来最多取走多少条已到达的消息，整批放入队列、只通知一次；1 为逐条放入。
+                消息成批到达（如重连后涌入大量群消息）时可设为 256 左右，平时每次只能取到一两条，逐条更快
+            filter (MsgFilter): 只接收符合条件的消息，在接收线程里直接检查解析出的 protobuf，
+                不符合的不入队、不写消息日志；各规则的计数见 `self.msg_filter.stats()`
+        """
         def listening_msg():
-            rsp = wcf_pb2.Response()
+            self._replay_spool(self.msgQ.put)
             self.msg_socket.dial(self.msg_url, block=True)
             while self._is_receiving_msg:
                 try:
-                    rsp.ParseFromString(self.msg_socket.recv_msg().bytes)
+                    pbs = self._recv_batch(batch, accept)
                 except Exception as e:
-                    pass
+                    continue
+                if batch == 1:
+                    for pb in pbs:
+                        self.msgQ.put(self._wrap_msg(pb))
                 else:
-                    self.msgQ.put(WxMsg(rsp.wxmsg))
+                    self.msgQ.put_many([self._wrap_msg(pb) for pb in pbs])
 
             # 退出前关闭通信通道
             self.msg_socket.close()
@@ -533,10 +567,8 @@ class Wcf():
         if self._is_receiving_msg:
             return True
 
-        req = wcf_pb2.Request()
-        req.func = wcf_pb2.FUNC_ENABLE_RECV_TXT  # FUNC_ENABLE_RECV_TXT
-        req.flag = pyq
-        rsp = self._send_request(req)
+        accept = self._compile_filter(filter)
+        rsp = self._send_request(rpc.enable_receiving_msg(pyq))
         if rsp.status != 0:
             return False
 
@@ -545,25 +577,30 @@ class Wcf():
         # self.listening_msg(callback)
 
         # 不阻塞，启动一个新的线程来接收消息
-        Thread(target=listening_msg, name="GetMessage", daemon=True).start()
+        self._recv_thread = Thread(target=listening_msg, name="GetMessage", daemon=True)
+        self._recv_thread.start()
 
         return True
 
-    def enable_recv_msg(self, callback: Callable[[WxMsg], None] = None) -> bool:
-        """（不建议使用）设置接收消息回调，消息量大时可能会丢失消息
+    def enable_recv_msg(self, callback: Callable[[WxMsg], None] = None, filter: MsgFilter = None) -> bool:
+        """（不建议使用）设置接收消息回调，消息量大时可能会丢失消息；`filter` 同 `enable_receiving_msg`
 
         .. deprecated:: 3.7.0.30.13
         """
+        def deliver(msg: WxMsg) -> None:
+            callback(msg)
+            self.ack_msg(msg)
+
         def listening_msg():
-            rsp = wcf_pb2.Response()
+            self._replay_spool(deliver)
             self.msg_socket.dial(self.msg_url, block=True)
             while self._is_receiving_msg:
                 try:
-                    rsp.ParseFromString(self.msg_socket.recv_msg().bytes)
+                    pbs = self._recv_batch(256, accept)
                 except Exception as e:
-                    pass
-                else:
-                    callback(WxMsg(rsp.wxmsg))
+                    continue
+                for msg in [self._wrap_msg(pb) for pb in pbs]:  # 整批先落盘，停止接收后不再写日志
+                    deliver(msg)
             # 退出前关闭通信通道
             self.msg_socket.close()
 
@@ -573,9 +610,8 @@ class Wcf():
         if callback is None:
             return False
 
-        req = wcf_pb2.Request()
-        req.func = wcf_pb2.FUNC_ENABLE_RECV_TXT  # FUNC_ENABLE_RECV_TXT
-        rsp = self._send_request(req)
+        accept = self._compile_filter(filter)
+        rsp = self._send_request(rpc.enable_receiving_msg())
         if rsp.status != 0:
             return False
 
@@ -584,7 +620,8 @@ class Wcf():
         # listening_msg()
 
         # 不阻塞，启动一个新的线程来接收消息
-        Thread(target=listening_msg, name="GetMessage", daemon=True).start()
+        self._recv_thread = Thread(target=listening_msg, name="GetMessage", daemon=True)
+        self._recv_thread.start()
 
         return True
 
@@ -593,37 +630,87 @@ class Wcf():
         if not self._is_receiving_msg:
             return 0
 
-        req = wcf_pb2.Request()
-        req.func = wcf_pb2.FUNC_DISABLE_RECV_TXT  # FUNC_DISABLE_RECV_TXT
-        rsp = self._send_request(req)
+        rsp = self._send_request(rpc.disable_recv_msg())
         self._is_receiving_msg = False
 
         return rsp.status
 
-    def query_sql(self, db: str, sql: str) -> List[Dict]:
+    def query_sql(self, db: str, sql: str, params: sql_util.Params = None, form: str = "dict",
+                  blob_view: bool = False, cache: bool = False) -> List[Dict]:
         """执行 SQL，如果数据量大注意分页，以免 OOM
 
         Args:
             db (str): 要查询的数据库
-            sql (str): 要执行的 SQL
+            sql (str): 要执行的 SQL，可以用 `?`（配合序列参数）或 `:name`（配合字典参数）做占位符
+            params (tuple | list | Mapping): SQL 参数，在客户端安全转义后代入
+            form (str): 返回形式，`dict` 为每行一个字典；`tuple` 返回 (列名, 元组列表)；`columns` 返回按列存放的字典
+            blob_view (bool): BLOB 字段是否以 `memoryview` 返回
+            cache (bool): 是否使用 `sql_cache` 缓存结果；相同的 (db, SQL, 参数) 在有效期内不再请求服务端
 
         Returns:
             List[Dict]: 查询结果
         """
-        result = []
-        req = wcf_pb2.Request()
-        req.func = wcf_pb2.FUNC_EXEC_DB_QUERY  # FUNC_EXEC_DB_QUERY
-        req.query.db = db
-        req.query.sql = sql
-        rsp = self._send_request(req)
-        rows = json_format.MessageToDict(rsp.rows).get("rows", [])
-        for r in rows:
-            row = {}
-            for f in r["fields"]:
-                c = base64.b64decode(f.get("content", ""))
-                row[f["column"]] = self._SQL_TYPES[f["type"]](c)
-            result.append(row)
-        return result
+        if cache:
+            key = (db, sql_util.normalize(sql), sql_util.params_key(params))
+            rsp = self.sql_cache.get(key)
+            if rsp is None:
+                rsp = self._send_request(rpc.query_sql(db, sql_util.bind(sql, params)))
+                if rsp.func == wcf_pb2.FUNC_EXEC_DB_QUERY:  # 失败的空响应不缓存
+                    self.sql_cache.put(key, rsp)
+        else:
+            rsp = self._send_request(rpc.query_sql(db, sql_util.bind(sql, params)))
+
+        return rpc.parse_rows(rsp, form, blob_view)
+
+    def query_sql_columnar(self, db: str, sql: str, params: sql_util.Params = None, arrow: bool = False):
+        """执行 SQL，按列返回结果，适合分析用途（需要 numpy，`arrow=True` 时需要 pyarrow）
+
+        Args:
+            db (str): 要查询的数据库
+            sql (str): 要执行的 SQL，占位符同 `query_sql`
+            params (tuple | list | Mapping): SQL 参数
+            arrow (bool): 是否返回 `pyarrow.Table`
+
+        Returns:
+            Dict[str, Column] 或 pyarrow.Table: 整数、浮点列为 NumPy 数组，文本、BLOB 列为 offsets + data 缓冲区
+        """
+        rsp = self._send_request(rpc.query_sql(db, sql_util.bind(sql, params)))
+        columns = columnar.decode_columns(rsp)
+        return columnar.to_arrow(columns) if arrow else columns
+
+    def iter_sql(self, db: str, sql: str, params: sql_util.Params = None, page_size: int = 1000,
+                 key: str = "localId", prefetch: bool = True, form: str = "dict") -> Iterator:
+        """分页执行 SQL，逐行产出结果，内存占用与结果总量无关
+
+        按 `key` 做键集分页（`key > 上一页最后一个值`），而不是 OFFSET，越往后翻也不会变慢。
+
+        Args:
+            db (str): 要查询的数据库
+            sql (str): 要执行的 SQL，结果里必须包含 `key` 列，不要自带 ORDER BY/LIMIT；占位符同 `query_sql`
+            params (tuple | list | Mapping): SQL 参数
+            page_size (int): 每页行数
+            key (str): 分页键，需唯一且有索引，如 `MSG` 表的 `localId`；需要按 rowid 分页时在 SQL 里 `SELECT rowid, ...`
+            prefetch (bool): 是否在后台线程预取下一页
+            form (str): 每行的形式，`dict` 或 `tuple`
+
+        Returns:
+            Iterator: 逐行产出查询结果
+
+        Raises:
+            RuntimeError: 某一页查询失败（超时、熔断等）；不会当成数据已经取完而静默结束
+        """
+        def fetch(q):
+            rsp = self._send_request(rpc.query_sql(db, q))
+            if rsp.func != wcf_pb2.FUNC_EXEC_DB_QUERY:  # 失败时是空响应，与“没有更多数据”区分开
+                raise RuntimeError(f"分页查询失败: {q}")
+            return rpc.parse_rows(rsp, "tuple")
+
+        for columns, rows in sql_util.iter_pages(fetch, sql_util.bind(sql, params), key, page_size, prefetch):
+            if form == "tuple":
+                yield from rows
+            else:
+                for row in rows:
+                    yield dict(zip(columns, row))
 
     def accept_new_friend(self, v3: str, v4: str, scene: int = 30) -> int:
         """通过好友申请
@@ -637,33 +724,14 @@ class Wcf():
             int: 1 为成功，其他失败
         """
         raise Exception("Not implemented, yet")
-        req = wcf_pb2.Request()
-        req.func = wcf_pb2.FUNC_ACCEPT_FRIEND  # FUNC_ACCEPT_FRIEND
-        req.v.v3 = v3
-        req.v.v4 = v4
-        req.v.scene = scene
-        rsp = self._send_request(req)
+        rsp = self._send_request(rpc.accept_new_friend(v3, v4, scene))
         return rsp.status
 
     def get_friends(self) -> List[Dict]:
-        """获取好友列表"""
-        not_friends = {
-            "fmessage": "朋友推荐消息",
-            "medianote": "语音记事本",
-            "floatbottle": "漂流瓶",
-            "filehelper": "文件传输助手",
-            "newsapp": "新闻",
-        }
-        friends = []
-        for cnt in self.get_contacts():
-            if (cnt["wxid"].endswith("@chatroom") or    # 群聊
-                    cnt["wxid"].startswith("gh_") or    # 公众号
-                    cnt["wxid"] in not_friends.keys()   # 其他杂号
-                ):
-                continue
-            friends.append(cnt)
-
-        return friends
+        """获取好友列表，使用 `contact_store` 里的通讯录，需要最新数据时先调用 `get_contacts`"""
+        store = self.contact_store
+        store.ensure_loaded()
+        return store.dicts(store.friends)
 
     def receive_transfer(self, wxid: str, transferid: str, transactionid: str) -> int:
         """接收转账
@@ -676,12 +744,7 @@ class Wcf():
         Returns:
             int: 1 为成功，其他失败
         """
-        req = wcf_pb2.Request()
-        req.func = wcf_pb2.FUNC_RECV_TRANSFER  # FUNC_RECV_TRANSFER
-        req.tf.wxid = wxid
-        req.tf.tfid = transferid
-        req.tf.taid = transactionid
-        rsp = self._send_request(req)
+        rsp = self._send_request(rpc.receive_transfer(wxid, transferid, transactionid))
         return rsp.status
 
     def refresh_pyq(self, id: int = 0) -> int:
@@ -693,10 +756,7 @@ class Wcf():
         Returns:
             int: 1 为成功，其他失败
         """
-        req = wcf_pb2.Request()
-        req.func = wcf_pb2.FUNC_REFRESH_PYQ  # FUNC_REFRESH_PYQ
-        req.ui64 = id
-        rsp = self._send_request(req)
+        rsp = self._send_request(rpc.refresh_pyq(id))
         return rsp.status
 
     def download_attach(self, id: int, thumb: str, extra: str) -> int:
@@ -710,12 +770,7 @@ class Wcf():
         Returns:
             int: 0 为成功, 其他失败。
         """
-        req = wcf_pb2.Request()
-        req.func = wcf_pb2.FUNC_DOWNLOAD_ATTACH  # FUNC_DOWNLOAD_ATTACH
-        req.att.id = id
-        req.att.thumb = thumb
-        req.att.extra = extra
-        rsp = self._send_request(req)
+        rsp = self._send_request(rpc.download_attach(id, thumb, extra))
         return rsp.status
 
     def get_info_by_wxid(self, wxid: str) -> dict:
@@ -728,32 +783,10 @@ class Wcf():
             dict: {wxid, code, name, gender}
         """
         raise Exception("Not implemented, yet")
-        req = wcf_pb2.Request()
-        req.func = wcf_pb2.FUNC_GET_CONTACT_INFO  # FUNC_GET_CONTACT_INFO
-        req.str = wxid
-        rsp = self._send_request(req)
-        contacts = json_format.MessageToDict(rsp.contacts).get("contacts", [])
-
-        contact = {}
-        for cnt in contacts:
-            gender = cnt.get("gender", "")
-            if gender == 1:
-                gender = "男"
-            elif gender == 2:
-                gender = "女"
-            else:
-                gender = ""
-            contact = {
-                "wxid": cnt.get("wxid", ""),
-                "code": cnt.get("code", ""),
-                "remark": cnt.get("remark", ""),
-                "name": cnt.get("name", ""),
-                "country": cnt.get("country", ""),
-                "province": cnt.get("province", ""),
-                "city": cnt.get("city", ""),
-                "gender": gender}
-
-        return contact
+        rsp = self._send_request(rpc.get_info_by_wxid(wxid))
+        contacts = rpc.parse_contacts(rsp)
+
+        return contacts[-1] if contacts else {}
 
     def revoke_msg(self, id: int = 0) -> int:
         """撤回消息
@@ -764,10 +797,7 @@ class Wcf():
         Returns:
             int: 1 为成功，其他失败
         """
-        req = wcf_pb2.Request()
-        req.func = wcf_pb2.FUNC_REVOKE_MSG  # FUNC_REVOKE_MSG
-        req.ui64 = id
-        rsp = self._send_request(req)
+        rsp = self._send_request(rpc.revoke_msg(id))
         return rsp.status
 
     def decrypt_image(self, src: str, dir: str) -> str:
@@ -780,11 +810,7 @@ class Wcf():
         Returns:
             str: 解密图片的保存路径
         """
-        req = wcf_pb2.Request()
-        req.func = wcf_pb2.FUNC_DECRYPT_IMAGE  # FUNC_DECRYPT_IMAGE
-        req.dec.src = src
-        req.dec.dst = dir
-        rsp = self._send_request(req)
+        rsp = self._send_request(rpc.decrypt_image(src, dir))
         return rsp.str
 
     def get_ocr_result(self, extra: str, timeout: int = 2) -> str:
@@ -796,32 +822,32 @@ class Wcf():
         Returns:
             str: OCR 结果
         """
-        def _inner(extra):
-            req = wcf_pb2.Request()
-            req.func = wcf_pb2.FUNC_EXEC_OCR  # FUNC_EXEC_OCR
-            req.str = extra
-            rsp = self._send_request(req)
-            ocr = json_format.MessageToDict(rsp.ocr)
-            return ocr.get("status", 0), ocr.get("result", "")
-
-        cnt = 0
-        while True:
-            status, result = _inner(extra)
-            if status == 0:
-                break
+        try:
+            return self.get_ocr_result_future(extra, timeout).result()
+        except TimeoutError:
+            self.LOG.error(f"OCR failed, timeout")
+            return ""
 
-            cnt += 1
-            if cnt > timeout:
-                break
+    def get_ocr_result_future(self, extra: str, timeout: float = 2,
+                              callback: Callable[[Future], None] = None) -> Future:
+        """异步获取 OCR 结果，立即返回 `Future`，由 `completions` 跟踪完成情况
 
-            sleep(1)
+        Args:
+            extra (str): 待识别的图片路径，消息里的 extra
+            timeout (float): 超时时间（秒），超时后 `Future` 抛出 `TimeoutError`
+            callback (Callable): 完成时以 `Future` 为参数调用
 
-        if status != 0:
-            self.LOG.error(f"OCR failed, status: {status}")
+        Returns:
+            Future: 结果为 OCR 结果
+        """
+        def probe():
+            status, result = rpc.parse_ocr(self._send_request(rpc.get_ocr_result(extra)))
+            return result if status == 0 else None
 
-        return result
+        return self.completions.track(probe, timeout, initial_delay=0, callback=callback)
 
-    def download_image(self, id: int, extra: str, dir: str, timeout: int = 30) -> str:
+    def download_image(self, id: int, extra: str, dir: str, timeout: int = 30, store: ImageStore = None,
+                       imgdatahash: str = "") -> str:
         """下载图片
 
         Args:
@@ -829,23 +855,58 @@ class Wcf():
             extra (str): 消息中的 extra
             dir (str): 存放图片的目录（目录不存在会出错）
             timeout (int): 超时时间（秒）
+            store (ImageStore): 图片库，见 `download_image_future`
+            imgdatahash (str): 消息 XML 里的 `imgdatahash`，配合 `store` 去重
 
         Returns:
             str: 成功返回存储路径；空字符串为失败，原因见日志。
         """
+        try:
+            return self.download_image_future(id, extra, dir, timeout, store=store, imgdatahash=imgdatahash).result()
+        except TimeoutError:
+            self.LOG.error(f"下载超时")
+        except RuntimeError as e:
+            self.LOG.error(e)
+        return ""
+
+    def download_image_future(self, id: int, extra: str, dir: str, timeout: float = 30,
+                              callback: Callable[[Future], None] = None, store: ImageStore = None,
+                              imgdatahash: str = "") -> Future:
+        """异步下载图片，立即返回 `Future`，由 `completions` 跟踪解密完成情况
+
+        先请求下载，随后很快探测一次是否可以解密，之后探测间隔逐渐加长（见 `CompletionTracker`），
+        大量图片同时下载时也只占用一个调度线程。
+
+        Args:
+            id (int): 消息中 id
+            extra (str): 消息中的 extra
+            dir (str): 存放图片的目录（目录不存在会出错）
+            timeout (float): 超时时间（秒），超时后 `Future` 抛出 `TimeoutError`
+            callback (Callable): 完成时以 `Future` 为参数调用
+            store (ImageStore): 图片库；消息 id 或 `imgdatahash` 已经存过时不再下载，
+                新下载的图片移入图片库，`dir` 中只留硬链接
+            imgdatahash (str): 消息 XML 里的 `imgdatahash`，可用 `imagestore.imgdatahash_of` 取出
+
+        Returns:
+            Future: 结果为存储路径；请求下载失败时抛出 `RuntimeError`
+        """
+        if store is not None:
+            stored = store.lookup(id, imgdatahash)
+            if stored:
+                store.remember(stored, id, imgdatahash)
+                name = os.path.splitext(os.path.basename(extra))[0] + os.path.splitext(stored)[1]
+                return resolved(store.link(stored, os.path.join(dir, name)), callback=callback)
+
         if self.download_attach(id, "", extra) != 0:
-            self.LOG.error(f"下载失败")
-            return ""
-        cnt = 0
-        while cnt < timeout:
+            return resolved(error=RuntimeError("下载失败"), callback=callback)
+
+        def probe():
             path = self.decrypt_image(extra, dir)
-            if path:
-                return path
-            sleep(1)
-            cnt += 1
+            if not path:
+                return None
+            return store.add_file(path, id, imgdatahash) if store is not None else path
 
-        self.LOG.error(f"下载超时")
-        return ""
+        return self.completions.track(probe, timeout, callback=callback)
 
     def add_chatroom_members(self, roomid: str, wxids: str) -> int:
         """添加群成员
@@ -857,11 +918,9 @@ class Wcf():
         Returns:
             int: 1 为成功，其他失败
         """
-        req = wcf_pb2.Request()
-        req.func = wcf_pb2.FUNC_ADD_ROOM_MEMBERS  # FUNC_ADD_ROOM_MEMBERS
-        req.m.roomid = roomid
-        req.m.wxids = wxids
-        rsp = self._send_request(req)
+        rsp = self._send_request(rpc.add_chatroom_members(roomid, wxids))
+        if rsp.status == 1:
+            self.room_cache.invalidate(roomid)
         return rsp.status
 
     def del_chatroom_members(self, roomid: str, wxids: str) -> int:
@@ -874,11 +933,9 @@ class Wcf():
         Returns:
             int: 1 为成功，其他失败
         """
-        req = wcf_pb2.Request()
-        req.func = wcf_pb2.FUNC_DEL_ROOM_MEMBERS  # FUNC_DEL_ROOM_MEMBERS
-        req.m.roomid = roomid
-        req.m.wxids = wxids.replace(" ", "")
-        rsp = self._send_request(req)
+        rsp = self._send_request(rpc.del_chatroom_members(roomid, wxids))
+        if rsp.status == 1:
+            self.room_cache.invalidate(roomid)
         return rsp.status
 
     def invite_chatroom_members(self, roomid: str, wxids: str) -> int:
@@ -891,11 +948,9 @@ class Wcf():
         Returns:
             int: 1 为成功，其他失败
         """
-        req = wcf_pb2.Request()
-        req.func = wcf_pb2.FUNC_INV_ROOM_MEMBERS  # FUNC_INV_ROOM_MEMBERS
-        req.m.roomid = roomid
-        req.m.wxids = wxids.replace(" ", "")
-        rsp = self._send_request(req)
+        rsp = self._send_request(rpc.invite_chatroom_members(roomid, wxids))
+        if rsp.status == 1:
+            self.room_cache.invalidate(roomid)
         return rsp.status
 
     def get_chatroom_members(self, roomid: str) -> Dict:
@@ -907,26 +962,7 @@ class Wcf():
         Returns:
             Dict: 群成员列表: {wxid1: 昵称1, wxid2: 昵称2, ...}
         """
-        members = {}
-        contacts = self.query_sql("MicroMsg.db", "SELECT UserName, NickName FROM Contact;")
-        contacts = {contact["UserName"]: contact["NickName"]for contact in contacts}
-        crs = self.query_sql("MicroMsg.db", f"SELECT RoomData FROM ChatRoom WHERE ChatRoomName = '{roomid}';")
-        if not crs:
-            return members
-
-        bs = crs[0].get("RoomData")
-        if not bs:
-            return members
-
-        crd = RoomData()
-        crd.ParseFromString(bs)
-        if not bs:
-            return members
-
-        for member in crd.members:
-            members[member.wxid] = member.name if member.name else contacts.get(member.wxid, "")
-
-        return members
+        return self.room_cache.members(roomid)
 
     def get_alias_in_chatroom(self, wxid: str, roomid: str) -> str:
         """获取群名片
@@ -938,24 +974,4 @@ class Wcf():
         Returns:
             str: 群名片
         """
-        nickname = self.query_sql("MicroMsg.db", f"SELECT NickName FROM Contact WHERE UserName = '{wxid}';")
-        if not nickname:
-            return ""
-
-        nickname = nickname[0].get("NickName", "")
-
-        crs = self.query_sql("MicroMsg.db", f"SELECT RoomData FROM ChatRoom WHERE ChatRoomName = '{roomid}';")
-        if not crs:
-            return ""
-
-        bs = crs[0].get("RoomData")
-        if not bs:
-            return ""
-
-        crd = RoomData()
-        crd.ParseFromString(bs)
-        for member in crd.members:
-            if member.wxid == wxid:
-                return member.name if member.name else nickname
-
-        return ""
+        return self.room_cache.alias(wxid, roomid)
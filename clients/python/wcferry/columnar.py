@@ -0,0 +1,193 @@
+# -*- coding: utf-8 -*-
+
+"""把 `query_sql` 的结果按列解码成 NumPy 数组（可选转为 pyarrow Table）
+
+整数、浮点列解码为 int64/float64 数组；文本、BLOB 列解码为 offsets + data 两块连续缓冲区，
+与 Arrow 的 large_string/large_binary 布局一致。每列另有 `valid` 布尔数组标记非 NULL。
+只遍历一次 `DbRows`，不生成逐行字典。需要安装 numpy；转 Arrow 需要安装 pyarrow。
+"""
+
+from array import array
+from typing import Dict, List
+
+from wcferry import wcf_pb2
+
+INT, FLOAT, TEXT, BLOB, NULL = 1, 2, 3, 4, 5
+
+
+def _numpy():
+    try:
+        import numpy
+    except ImportError:
+        raise ImportError("按列解码需要 numpy: pip install numpy")
+    return numpy
+
+
+class Column():
+    """一列查询结果
+
+    Attributes:
+        name (str): 列名
+        type (int): 列类型，`INT`/`FLOAT`/`TEXT`/`BLOB`/`NULL`
+        values (numpy.ndarray): 数值列的值，NULL 处为 0
+        offsets (numpy.ndarray): 文本、BLOB 列第 i 行为 `data[offsets[i]:offsets[i+1]]`
+        data (numpy.ndarray): 文本、BLOB 列的内容（uint8）
+        valid (numpy.ndarray): 是否非 NULL
+    """
+
+    __slots__ = ("name", "type", "values", "offsets", "data", "valid")
+
+    def __init__(self, name: str, type: int, valid, values=None, offsets=None, data=None) -> None:
+        self.name = name
+        self.type = type
+        self.valid = valid
+        self.values = values
+        self.offsets = offsets
+        self.data = data
+
+    def __len__(self) -> int:
+        return len(self.valid)
+
+    def __repr__(self) -> str:
+        return f"Column({self.name!r}, type={self.type}, len={len(self)})"
+
+    def to_pylist(self) -> List:
+        """转成 Python 列表，NULL 为 None"""
+        valid = self.valid.tolist()
+        if self.type in (INT, FLOAT):
+            return [v if ok else None for v, ok in zip(self.values.tolist(), valid)]
+        if self.type in (TEXT, BLOB):
+            buf = self.data.tobytes()
+            off = self.offsets.tolist()
+            if self.type == TEXT:
+                return [buf[off[i]:off[i + 1]].decode("utf-8") if ok else None for i, ok in enumerate(valid)]
+            return [buf[off[i]:off[i + 1]] if ok else None for i, ok in enumerate(valid)]
+        return [None] * len(valid)
+
+
+class _Builder():
+    """单列的增量构造器；类型以第一个非 NULL 值为准，遇到不一致时按 SQLite 的规则放宽"""
+
+    __slots__ = ("type", "nums", "offsets", "data", "valid", "leading")
+
+    def __init__(self) -> None:
+        self.type = 0
+        self.nums = None
+        self.offsets = None
+        self.data = None
+        self.valid = bytearray()
+        self.leading = 0  # 确定类型之前出现的 NULL 个数
+
+    def _start(self, t: int) -> None:
+        self.type = t
+        if t in (INT, FLOAT):
+            self.nums = array("q" if t == INT else "d", bytes(8 * self.leading))
+        else:
+            self.offsets = array("q", bytes(8 * (self.leading + 1)))
+            self.data = bytearray()
+
+    def _to_bytes(self) -> None:
+        # 数值列里出现了文本/BLOB：整列转成文本，数值按服务端的文本形式保存
+        nums, valid = self.nums, self.valid
+        self.nums = None
+        self.type = TEXT
+        self.offsets = array("q", [0])
+        self.data = bytearray()
+        for v, ok in zip(nums, valid):
+            if ok:
+                self.data += repr(v).encode()
+            self.offsets.append(len(self.data))
+
+    def append(self, t: int, c: bytes) -> None:
+        if t == NULL:
+            self.valid.append(0)
+            if self.type == 0:
+                self.leading += 1
+            elif self.nums is not None:
+                self.nums.append(0)
+            else:
+                self.offsets.append(len(self.data))
+            return
+
+        if self.type == 0:
+            self._start(t)
+
+        self.valid.append(1)
+        if self.nums is not None:
+            if t == INT:
+                self.nums.append(int(c) if self.type == INT else float(int(c)))
+                return
+            if t == FLOAT:
+                if self.type == INT:  # 整数列里出现浮点，整列提升为 float64
+                    self.nums = array("d", self.nums)
+                    self.type = FLOAT
+                self.nums.append(float(c))
+                return
+            self._to_bytes()
+
+        if t == BLOB:
+            self.type = BLOB
+        self.data += c
+        self.offsets.append(len(self.data))
+
+    def finish(self, name: str, np) -> Column:
+        valid = np.frombuffer(self.valid, dtype=np.bool_)
+        if self.type == 0:
+            return Column(name, NULL, valid)
+        if self.nums is not None:
+            dtype = np.int64 if self.type == INT else np.float64
+            return Column(name, self.type, valid, values=np.frombuffer(self.nums, dtype=dtype))
+        return Column(name, self.type, valid,
+                      offsets=np.frombuffer(self.offsets, dtype=np.int64),
+                      data=np.frombuffer(self.data, dtype=np.uint8))
+
+
+def decode_columns(rsp: wcf_pb2.Response) -> Dict[str, Column]:
+    """一次遍历 `DbRows`，按列解码
+
+    Args:
+        rsp (wcf_pb2.Response): `FUNC_EXEC_DB_QUERY` 的响应
+
+    Returns:
+        Dict[str, Column]: {列名: 列}，保持查询结果的列顺序
+    """
+    np = _numpy()
+    rows = rsp.rows.rows
+    if not rows:
+        return {}
+
+    names = [f.column for f in rows[0].fields]
+    builders = [_Builder() for _ in names]
+    appends = [b.append for b in builders]
+    for r in rows:
+        for append, f in zip(appends, r.fields):
+            append(f.type, f.content)
+
+    return {name: b.finish(name, np) for name, b in zip(names, builders)}
+
+
+def to_arrow(columns: Dict[str, Column]):
+    """把 `decode_columns` 的结果转成 `pyarrow.Table`，数值列与文本列缓冲区直接复用，不逐行复制"""
+    try:
+        import pyarrow as pa
+    except ImportError:
+        raise ImportError("转为 Arrow 需要 pyarrow: pip install pyarrow")
+    np = _numpy()
+
+    arrays = []
+    for col in columns.values():
+        n = len(col)
+        if col.type == NULL:
+            arrays.append(pa.nulls(n))
+            continue
+
+        bitmap = pa.py_buffer(np.packbits(col.valid, bitorder="little"))
+        if col.type in (INT, FLOAT):
+            dtype = pa.int64() if col.type == INT else pa.float64()
+            arrays.append(pa.Array.from_buffers(dtype, n, [bitmap, pa.py_buffer(col.values)]))
+        else:
+            dtype = pa.large_string() if col.type == TEXT else pa.large_binary()
+            arrays.append(pa.Array.from_buffers(
+                dtype, n, [bitmap, pa.py_buffer(col.offsets), pa.py_buffer(col.data)]))
+
+    return pa.Table.from_arrays(arrays, names=list(columns.keys()))
@@ -0,0 +1,196 @@
+# -*- coding: utf-8 -*-
+
+import asyncio
+import heapq
+import itertools
+import logging
+from concurrent.futures import Future, InvalidStateError
+from threading import Condition, Thread
+from time import monotonic
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+
+def resolved(result: Any = None, error: BaseException = None,
+             callback: Optional[Callable[[Future], None]] = None) -> Future:
+    """已经完成的 `Future`，供不需要等待的分支返回"""
+    future = Future()
+    if callback is not None:
+        future.add_done_callback(callback)
+    if error is None:
+        future.set_result(result)
+    else:
+        future.set_exception(error)
+    return future
+
+
+class _Task():
+    __slots__ = ("probe", "future", "deadline", "delay", "probes")
+
+    def __init__(self, probe: Callable[[], Any], future: Future, deadline: float, delay: float) -> None:
+        self.probe = probe
+        self.future = future
+        self.deadline = deadline
+        self.delay = delay
+        self.probes = 0
+
+
+class CompletionTracker():
+    """等待服务端异步完成的操作（下载图片、语音转换、OCR）：一个调度线程轮询所有未完成的任务
+
+    每个任务先在 `initial_delay` 后探测一次，之后等待时间按 `factor` 倍增长，最长 `max_delay`；
+    完成得快的任务很快返回，完成得慢的任务也不会每秒都发请求。
+
+    Args:
+        initial_delay (float): 第一次探测前的等待时间（秒）
+        max_delay (float): 两次探测之间最长等待时间（秒）
+        factor (float): 每次探测失败后等待时间的增长倍数
+    """
+
+    def __init__(self, initial_delay: float = 0.05, max_delay: float = 1.0, factor: float = 1.5) -> None:
+        self.LOG = logging.getLogger("WCF")
+        self.initial_delay = initial_delay
+        self.max_delay = max_delay
+        self.factor = factor
+        self._heap = []
+        self._seq = itertools.count()
+        self._cond = Condition()
+        self._thread = None
+        self._closed = False
+        self._stats = {"completed": 0, "timeouts": 0, "errors": 0, "probes": 0}
+
+    def track(self, probe: Callable[[], Any], timeout: float, initial_delay: float = None,
+              callback: Optional[Callable[[Future], None]] = None) -> Future:
+        """开始跟踪一个任务
+
+        Args:
+            probe (Callable): 探测函数，完成时返回结果，未完成返回 `None`
+            timeout (float): 超时时间（秒），超时后 `Future` 抛出 `TimeoutError`
+            initial_delay (float): 第一次探测前的等待时间，默认为 `self.initial_delay`；0 为立即探测
+            callback (Callable): 完成（包括超时、出错）时以 `Future` 为参数调用
+
+        Returns:
+            Future: 结果为 `probe` 返回的值
+        """
+        future = Future()
+        if callback is not None:
+            future.add_done_callback(callback)
+
+        delay = self.initial_delay if initial_delay is None else initial_delay
+        now = monotonic()
+        task = _Task(probe, future, now + timeout, max(delay, self.initial_delay))
+        with self._cond:
+            if self._closed:
+                raise RuntimeError("CompletionTracker 已关闭")
+            heapq.heappush(self._heap, (min(now + delay, task.deadline), next(self._seq), task))
+            if self._thread is None:
+                self._thread = Thread(target=self._run, name="CompletionTracker", daemon=True)
+                self._thread.start()
+            self._cond.notify()
+        return future
+
+    @property
+    def pending(self) -> int:
+        """等待探测的任务数"""
+        with self._cond:
+            return len(self._heap)
+
+    def stats(self) -> Dict[str, int]:
+        """统计：{pending, completed, timeouts, errors, probes}"""
+        with self._cond:
+            return {"pending": len(self._heap), **self._stats}
+
+    def close(self) -> None:
+        """停止调度，取消所有未完成的任务"""
+        with self._cond:
+            self._closed = True
+            tasks = [t for _, _, t in self._heap]
+            self._heap.clear()
+            self._cond.notify()
+        for task in tasks:
+            task.future.cancel()
+
+    def _next_due(self) -> Optional[_Task]:
+        # 取下一个到期的任务，没有到期的就等待
+        with self._cond:
+            while not self._closed:
+                if not self._heap:
+                    self._cond.wait()
+                    continue
+                due = self._heap[0][0] - monotonic()
+                if due > 0:
+                    self._cond.wait(due)
+                    continue
+                return heapq.heappop(self._heap)[2]
+        return None
+
+    def _finish(self, task: _Task, key: str, result: Any = None, error: BaseException = None) -> None:
+        with self._cond:
+            self._stats[key] += 1
+        try:
+            if error is None:
+                task.future.set_result(result)
+            else:
+                task.future.set_exception(error)
+        except InvalidStateError:  # 调用方已取消
+            pass
+
+    def _run(self) -> None:
+        while True:
+            task = self._next_due()
+            if task is None:
+                return
+            if task.future.cancelled():
+                continue
+
+            task.probes += 1
+            with self._cond:
+                self._stats["probes"] += 1
+            try:
+                result = task.probe()
+            except Exception as e:
+                self._finish(task, "errors", error=e)
+                continue
+
+            if result is not None:
+                self._finish(task, "completed", result)
+                continue
+
+            now = monotonic()
+            if now >= task.deadline:
+                self._finish(task, "timeouts", error=TimeoutError(f"{task.probes} 次探测后仍未完成"))
+                continue
+
+            with self._cond:
+                if self._closed:
+                    task.future.cancel()
+                    return
+                heapq.heappush(self._heap, (min(now + task.delay, task.deadline), next(self._seq), task))
+            task.delay = min(task.delay * self.factor, self.max_delay)
+
+
+async def poll(probe: Callable[[], Awaitable[Any]], timeout: float, initial_delay: float = 0.05,
+               max_delay: float = 1.0, factor: float = 1.5) -> Any:
+    """协程版本：按与 `CompletionTracker` 相同的节奏探测，直到 `probe` 返回非 `None`
+
+    Args:
+        probe (Callable): 探测协程函数，完成时返回结果，未完成返回 `None`
+        timeout (float): 超时时间（秒）
+        initial_delay (float): 第一次探测前的等待时间；0 为立即探测
+
+    Raises:
+        TimeoutError: 超时仍未完成
+    """
+    deadline = asyncio.get_running_loop().time() + timeout
+    delay = max(initial_delay, 0)
+    step = max(initial_delay, 0.05)
+    probes = 0
+    while True:
+        if delay:
+            await asyncio.sleep(min(delay, max(0, deadline - asyncio.get_running_loop().time())))
+        probes += 1
+        result = await probe()
+        if result is not None:
+            return result
+        if asyncio.get_running_loop().time() >= deadline:
+            raise TimeoutError(f"{probes} 次探测后仍未完成")
+        delay, step = step, min(step * factor, max_delay)
@@ -0,0 +1,181 @@
+# -*- coding: utf-8 -*-
+
+import logging
+from threading import Lock
+from time import monotonic
+from typing import Dict, FrozenSet, Iterator, List, Optional
+
+from wcferry import rpc, wcf_pb2
+
+# 不是好友的系统账号
+NOT_FRIENDS = {
+    "fmessage": "朋友推荐消息",
+    "medianote": "语音记事本",
+    "floatbottle": "漂流瓶",
+    "filehelper": "文件传输助手",
+    "newsapp": "新闻",
+}
+
+_GENDER = {1: "男", 2: "女"}
+
+# Contact 表的廉价指纹：行数、最大 rowid 及备注、昵称总长度，任一变化即认为通讯录有改动；
+# 长度不变的改名发现不了，由 `ContactStore.max_age` 定期强制拉取兜底
+_FINGERPRINT_SQL = "SELECT COUNT(*), MAX(rowid), TOTAL(LENGTH(Remark)), TOTAL(LENGTH(NickName)) FROM Contact;"
+
+
+class Contact():
+    """联系人，字段同 `get_contacts` 返回的字典，也支持 `cnt["wxid"]` 的写法"""
+
+    __slots__ = ("wxid", "code", "remark", "name", "country", "province", "city", "gender")
+
+    def __init__(self, wxid: str, code: str = "", remark: str = "", name: str = "", country: str = "",
+                 province: str = "", city: str = "", gender: str = "") -> None:
+        self.wxid = wxid
+        self.code = code
+        self.remark = remark
+        self.name = name
+        self.country = country
+        self.province = province
+        self.city = city
+        self.gender = gender
+
+    @classmethod
+    def from_pb(cls, cnt: wcf_pb2.RpcContact) -> "Contact":
+        return cls(cnt.wxid, cnt.code, cnt.remark, cnt.name, cnt.country, cnt.province, cnt.city,
+                   _GENDER.get(cnt.gender, ""))
+
+    def __getitem__(self, key: str) -> str:
+        if key not in self.__slots__:
+            raise KeyError(key)
+        return getattr(self, key)
+
+    def __repr__(self) -> str:
+        return f"Contact({self.wxid!r}, name={self.name!r}, remark={self.remark!r})"
+
+    def to_dict(self) -> Dict:
+        return {k: getattr(self, k) for k in self.__slots__}
+
+
+class ContactStore():
+    """内存中的通讯录，按 wxid、微信号、备注/昵称建索引，并预先分好类（群聊、公众号、好友、系统账号）
+
+    `refresh` 先查询 Contact 表的指纹，只有通讯录有改动（或 `force=True`）时才重新拉取。
+    指纹只反映行数与长度，改成等长的备注、昵称时不变，因此距上次拉取超过 `max_age` 秒时总是重新拉取。
+
+    Args:
+        wcf (Wcf): 用于拉取通讯录的 `Wcf` 实例
+        max_age (float): 指纹没变时，最多多久（秒）强制重新拉取一次
+    """
+
+    def __init__(self, wcf, max_age: float = 600) -> None:
+        self.LOG = logging.getLogger("WCF")
+        self._wcf = wcf
+        self.max_age = max_age
+        self._lock = Lock()
+        self._fingerprint = None
+        self._loaded_at = 0.0
+        self.loaded = False
+        self._load([])
+
+    def _load(self, contacts: List[Contact]) -> None:
+        by_wxid, by_code, by_name = {}, {}, {}
+        chatrooms, official, system, friends = set(), set(), set(), set()
+        for cnt in contacts:
+            wxid = cnt.wxid
+            by_wxid[wxid] = cnt
+            if cnt.code:
+                by_code[cnt.code] = cnt
+            for name in {cnt.remark, cnt.name}:
+                if name:
+                    by_name.setdefault(name, []).append(cnt)
+
+            if wxid.endswith("@chatroom"):
+                chatrooms.add(wxid)
+            elif wxid.startswith("gh_"):
+                official.add(wxid)
+            elif wxid in NOT_FRIENDS:
+                system.add(wxid)
+            else:
+                friends.add(wxid)
+
+        # 整体替换，读者不加锁也只会看到完整的某一版
+        self._contacts = contacts
+        self._by_wxid = by_wxid
+        self._by_code = by_code
+        self._by_name = by_name
+        self.chatrooms: FrozenSet[str] = frozenset(chatrooms)
+        self.official: FrozenSet[str] = frozenset(official)
+        self.system: FrozenSet[str] = frozenset(system)
+        self.friends: FrozenSet[str] = frozenset(friends)
+        self._dicts = None
+
+    def _query_fingerprint(self) -> Optional[tuple]:
+        _, rows = self._wcf.query_sql("MicroMsg.db", _FINGERPRINT_SQL, form="tuple")
+        return rows[0] if rows else None
+
+    def refresh(self, force: bool = False) -> bool:
+        """通讯录有改动时重新拉取
+
+        Args:
+            force (bool): 不比较指纹，直接拉取
+
+        Returns:
+            bool: 是否重新拉取了
+        """
+        with self._lock:
+            fingerprint = self._query_fingerprint()
+            fresh = monotonic() - self._loaded_at < self.max_age
+            if not force and self.loaded and fresh and fingerprint is not None and fingerprint == self._fingerprint:
+                return False
+
+            rsp = self._wcf._send_request(rpc.get_contacts())
+            if rsp.WhichOneof("msg") != "contacts":
+                self.LOG.error("拉取通讯录失败")
+                return False
+
+            self._load([Contact.from_pb(cnt) for cnt in rsp.contacts.contacts])
+            self._fingerprint = fingerprint
+            self._loaded_at = monotonic()
+            self.loaded = True
+            return True
+
+    def ensure_loaded(self) -> None:
+        """还没有拉取过时拉取一次"""
+        if not self.loaded:
+            self.refresh()
+
+    def __len__(self) -> int:
+        return len(self._contacts)
+
+    def __iter__(self) -> Iterator[Contact]:
+        return iter(self._contacts)
+
+    def __contains__(self, wxid: str) -> bool:
+        return wxid in self._by_wxid
+
+    def get(self, wxid: str) -> Optional[Contact]:
+        """按 wxid 查找"""
+        return self._by_wxid.get(wxid)
+
+    def by_code(self, code: str) -> Optional[Contact]:
+        """按微信号查找"""
+        return self._by_code.get(code)
+
+    def find(self, name: str) -> List[Contact]:
+        """按备注或昵称查找（完全匹配），可能有多个"""
+        return list(self._by_name.get(name, ()))
+
+    def contacts(self, wxids: FrozenSet[str] = None) -> List[Contact]:
+        """全部联系人，或 `wxids`（如 `store.friends`）中的联系人，保持通讯录顺序"""
+        if wxids is None:
+            return list(self._contacts)
+        return [cnt for cnt in self._contacts if cnt.wxid in wxids]
+
+    def dicts(self, wxids: FrozenSet[str] = None) -> List[Dict]:
+        """全部联系人，或 `wxids` 中的联系人的字典形式；返回副本，调用方可以随意修改"""
+        dicts = self._dicts
+        if dicts is None:
+            dicts = self._dicts = [cnt.to_dict() for cnt in self._contacts]  # 同一版通讯录只生成一次
+        if wxids is None:
+            return [dict(d) for d in dicts]
+        return [dict(d) for d in dicts if d["wxid"] in wxids]
@@ -0,0 +1,166 @@
+# -*- coding: utf-8 -*-
+
+"""本地解密微信图片（.dat）
+
+微信把图片按字节与同一个密钥异或后保存为 .dat，用常见图片格式的文件头即可反推出密钥。
+这里在本地完成解密，不需要注入的 RPC 服务，也可以在没有微信的机器上处理归档的 .dat 文件。
+安装了 numpy 时做向量化异或（大文件通过 mmap 分块处理），否则用 `bytes.translate`。
+"""
+
+import logging
+import os
+from typing import Dict, Iterable, Optional, Tuple
+
+LOG = logging.getLogger("WCF")
+
+# 扩展名 -> 文件头
+MAGICS = (
+    ("jpg", b"\xff\xd8\xff"),
+    ("png", b"\x89PNG"),
+    ("gif", b"GIF8"),
+    ("bmp", b"BM"),
+    ("tif", b"II*\x00"),
+    ("webp", b"RIFF"),
+)
+
+CHUNK = 1 << 22  # 每次异或 4 MB，大文件也不会一次占满内存
+
+
+def detect_key(head: bytes) -> Optional[Tuple[int, str]]:
+    """根据文件头推出密钥
+
+    Args:
+        head (bytes): .dat 文件开头的若干字节（至少 4 个）
+
+    Returns:
+        Tuple[int, str]: (密钥, 扩展名)；无法识别返回 None
+    """
+    for ext, magic in MAGICS:
+        if len(head) < len(magic):
+            continue
+        key = head[0] ^ magic[0]
+        if all(h ^ key == m for h, m in zip(head, magic)):
+            return key, ext
+    return None
+
+
+def decrypt_bytes(data: bytes) -> Tuple[bytes, str]:
+    """解密内存中的 .dat 内容
+
+    Returns:
+        Tuple[bytes, str]: (图片内容, 扩展名)；无法识别返回 (b"", "")
+    """
+    found = detect_key(data[:8])
+    if found is None:
+        return b"", ""
+    key, ext = found
+    return bytes(data).translate(bytes(b ^ key for b in range(256))), ext
+
+
+def _xor_file(src: str, dst: str, key: int, size: int) -> None:
+    try:
+        import numpy as np
+    except ImportError:
+        table = bytes(b ^ key for b in range(256))
+        with open(src, "rb") as fi, open(dst, "wb") as fo:
+            for chunk in iter(lambda: fi.read(CHUNK), b""):
+                fo.write(chunk.translate(table))
+        return
+
+    if size <= CHUNK:  # 常见的图片都很小，整块读入比建立映射快
+        data = np.fromfile(src, dtype=np.uint8)
+        np.bitwise_xor(data, key, out=data)
+        data.tofile(dst)
+        return
+
+    data = np.memmap(src, dtype=np.uint8, mode="r")
+    buf = np.empty(CHUNK, dtype=np.uint8)
+    with open(dst, "wb") as fo:
+        for start in range(0, size, CHUNK):
+            n = min(CHUNK, size - start)
+            np.bitwise_xor(data[start:start + n], key, out=buf[:n])
+            fo.write(buf[:n])
+    del data  # 关闭映射
+
+
+def decrypt_file(src: str, dir: str = None) -> str:
+    """解密一个 .dat 文件
+
+    Args:
+        src (str): .dat 文件路径
+        dir (str): 保存图片的目录，默认与 `src` 相同；文件名为 `src` 去掉 .dat 后加上识别出的扩展名
+
+    Returns:
+        str: 解密图片的保存路径；失败返回空字符串，原因见日志
+    """
+    try:
+        size = os.path.getsize(src)
+        with open(src, "rb") as f:
+            head = f.read(8)
+    except OSError as e:
+        LOG.error(f"读取 {src} 失败: {e}")
+        return ""
+
+    found = detect_key(head)
+    if found is None:
+        LOG.error(f"无法识别图片格式: {src}")
+        return ""
+
+    key, ext = found
+    name = os.path.splitext(os.path.basename(src))[0]
+    dst = os.path.join(dir or os.path.dirname(src), f"{name}.{ext}")
+    try:
+        _xor_file(src, dst, key, size)
+    except OSError as e:
+        LOG.error(f"解密 {src} 失败: {e}")
+        return ""
+    return dst
+
+
+def _decrypt_one(args: Tuple[str, Optional[str]]) -> str:
+    return decrypt_file(*args)
+
+
+def _walk(src_dir: str, recursive: bool) -> Iterable[str]:
+    if not recursive:
+        for name in sorted(os.listdir(src_dir)):
+            if name.lower().endswith(".dat"):
+                yield os.path.join(src_dir, name)
+        return
+    for root, _, files in os.walk(src_dir):
+        for name in sorted(files):
+            if name.lower().endswith(".dat"):
+                yield os.path.join(root, name)
+
+
+def decrypt_dir(src_dir: str, dir: str = None, workers: int = None, recursive: bool = True) -> Dict[str, str]:
+    """用进程池批量解密目录下的 .dat 文件
+
+    Args:
+        src_dir (str): .dat 所在目录
+        dir (str): 保存图片的目录，保持与 `src_dir` 相同的子目录结构；默认保存在 .dat 旁边
+        workers (int): 进程数，默认为 CPU 个数；1 为在当前进程里逐个解密
+        recursive (bool): 是否包含子目录
+
+    Returns:
+        Dict[str, str]: {.dat 路径: 图片路径}，失败的为空字符串
+    """
+    jobs = []
+    for src in _walk(src_dir, recursive):
+        out = None
+        if dir:
+            out = os.path.join(dir, os.path.relpath(os.path.dirname(src), src_dir))
+            os.makedirs(out, exist_ok=True)
+        jobs.append((src, out))
+
+    if workers == 1 or len(jobs) < 2:
+        return {src: _decrypt_one((src, out)) for src, out in jobs}
+
+    import multiprocessing
+    from concurrent.futures import ProcessPoolExecutor
+
+    # 主进程里可能有 nng 的线程，fork 不安全
+    ctx = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=workers, mp_context=ctx) as pool:
+        results = pool.map(_decrypt_one, jobs, chunksize=max(1, len(jobs) // (4 * (workers or os.cpu_count() or 1))))
+        return {src: path for (src, _), path in zip(jobs, results)}
@@ -0,0 +1,215 @@
+# -*- coding: utf-8 -*-
+
+import hashlib
+import logging
+import mimetypes
+import os
+import shutil
+import sqlite3
+from concurrent.futures import Future, ThreadPoolExecutor
+from threading import Lock
+from time import time
+from typing import Dict, Iterable, Optional
+from urllib.parse import unquote, urlparse
+
+import requests
+from requests.adapters import HTTPAdapter
+from wcferry.imagestore import default_cache_dir
+
+HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/100.0.4896.127 Safari/537.36', }
+
+
+class DownloadManager():
+    """网络资源下载：共享连接池、流式写盘、按 ETag/Last-Modified 复用缓存、按总大小淘汰最久未用的文件
+
+    同一 URL 下载过一次后，`max_age` 秒内直接使用缓存；之后带上条件请求头重新验证，
+    服务端返回 304 时不再下载。每个 URL 存放在单独的子目录里，保留原始文件名（发送文件时对方看到的名字）。
+    缓存目录与索引在第一次下载时才创建，从不下载网络资源时不会在磁盘上留下任何东西。
+
+    Args:
+        dir (str): 缓存目录，默认为 `default_cache_dir("downloads")`
+        max_bytes (int): 缓存总大小上限（字节）
+        max_age (float): 不重新验证直接使用缓存的时间（秒）
+        max_workers (int): 预取并发数，也是连接池大小
+        timeout (float): 单次请求超时（秒）
+    """
+
+    def __init__(self, dir: str = None, max_bytes: int = 512 << 20, max_age: float = 300, max_workers: int = 4,
+                 timeout: float = 60) -> None:
+        self.LOG = logging.getLogger("WCF")
+        self.dir = dir
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self.timeout = timeout
+
+        self.session = requests.Session()
+        self.session.headers.update(HEADERS)
+        adapter = HTTPAdapter(pool_connections=max_workers, pool_maxsize=max_workers)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="Download")
+
+        self._lock = Lock()
+        self._inflight = {}  # url -> Future，同一 URL 同时只下载一次
+        self._conn = None
+
+    @property
+    def _db(self) -> sqlite3.Connection:
+        # 持有 `_lock` 时访问：第一次用到时才创建目录与索引
+        if self._conn is None:
+            if self.dir is None:
+                self.dir = default_cache_dir("downloads")
+            os.makedirs(self.dir, exist_ok=True)
+            self._conn = sqlite3.connect(os.path.join(self.dir, "index.db"), check_same_thread=False)
+            self._conn.execute("""CREATE TABLE IF NOT EXISTS urls (url TEXT PRIMARY KEY, path TEXT, etag TEXT,
+                                  last_modified TEXT, size INTEGER, validated REAL, used REAL);""")
+            self._conn.commit()
+        return self._conn
+
+    def close(self) -> None:
+        self._pool.shutdown(wait=False)
+        self.session.close()
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+    def _entry(self, url: str) -> Optional[tuple]:
+        with self._lock:
+            row = self._db.execute("SELECT path, etag, last_modified, validated FROM urls WHERE url = ?;",
+                                   (url,)).fetchone()
+        if row and os.path.exists(row[0]):
+            return row
+        return None
+
+    @staticmethod
+    def _filename(url: str, content_type: str) -> str:
+        fname = os.path.basename(unquote(urlparse(url).path)) or "download"
+        ext = mimetypes.guess_extension((content_type or "").split(";")[0].strip())
+        if ext:
+            if ext not in fname:
+                fname = fname + ext
+            else:
+                fname = fname.split(ext)[0] + ext
+        return fname
+
+    def fetch(self, url: str) -> Optional[str]:
+        """下载 `url`，已缓存且未过期时直接返回缓存
+
+        Returns:
+            str: 本地文件路径；失败返回 None，原因见日志
+        """
+        with self._lock:
+            future = self._inflight.get(url)
+            owner = future is None
+            if owner:
+                future = self._inflight[url] = Future()
+
+        if not owner:
+            return future.result()
+
+        path = None
+        try:
+            path = self._fetch(url)
+        except Exception as e:
+            self.LOG.error(f"网络资源下载失败: {e}")
+        finally:
+            with self._lock:
+                del self._inflight[url]
+            future.set_result(path)
+        return path
+
+    def _fetch(self, url: str) -> str:
+        now = time()
+        entry = self._entry(url)
+        headers = {}
+        if entry:
+            path, etag, last_modified, validated = entry
+            if now - validated < self.max_age:
+                self._touch(url, now)
+                return path
+            if etag:
+                headers["If-None-Match"] = etag
+            if last_modified:
+                headers["If-Modified-Since"] = last_modified
+
+        with self.session.get(url, headers=headers, stream=True, timeout=self.timeout) as rsp:
+            if entry and rsp.status_code == 304:
+                with self._lock:
+                    self._db.execute("UPDATE urls SET validated = ?, used = ? WHERE url = ?;", (now, now, url))
+                    self._db.commit()
+                return entry[0]
+
+            rsp.raise_for_status()
+            rsp.raw.decode_content = True
+            sub = os.path.join(self.dir, hashlib.sha1(url.encode("utf-8")).hexdigest()[:16])
+            os.makedirs(sub, exist_ok=True)
+            path = os.path.normpath(os.path.join(sub, self._filename(url, rsp.headers.get("content-type"))))
+            tmp = f"{path}.part"
+            try:
+                with open(tmp, "wb") as of:
+                    shutil.copyfileobj(rsp.raw, of, 1 << 16)  # 边收边写，不把整个文件读进内存
+                os.replace(tmp, path)
+            except BaseException:
+                # 写了一半的文件不在索引里，不会被淘汰，这里删掉；目录空了一并删掉
+                if os.path.exists(tmp):
+                    os.remove(tmp)
+                try:
+                    os.rmdir(sub)
+                except OSError:
+                    pass
+                raise
+            if entry and entry[0] != path and os.path.exists(entry[0]):
+                os.remove(entry[0])
+
+            with self._lock:
+                self._db.execute("INSERT OR REPLACE INTO urls VALUES (?, ?, ?, ?, ?, ?, ?);",
+                                 (url, path, rsp.headers.get("ETag", ""), rsp.headers.get("Last-Modified", ""),
+                                  os.path.getsize(path), now, now))
+                self._db.commit()
+
+        self._evict(keep=url)
+        return path
+
+    def _touch(self, url: str, now: float) -> None:
+        with self._lock:
+            self._db.execute("UPDATE urls SET used = ? WHERE url = ?;", (now, url))
+            self._db.commit()
+
+    def _evict(self, keep: str = None, min_idle: float = 60) -> None:
+        # 超过 `max_bytes` 时从最久未用的开始删；`min_idle` 秒内用过的可能正在发送，不删
+        with self._lock:
+            total = self._db.execute("SELECT TOTAL(size) FROM urls;").fetchone()[0]
+            if total <= self.max_bytes:
+                return
+            rows = self._db.execute("SELECT url, path, size FROM urls WHERE used < ? ORDER BY used;",
+                                    (time() - min_idle,)).fetchall()
+            for url, path, size in rows:
+                if total <= self.max_bytes:
+                    break
+                if url == keep:
+                    continue
+                shutil.rmtree(os.path.dirname(path), ignore_errors=True)
+                self._db.execute("DELETE FROM urls WHERE url = ?;", (url,))
+                total -= size
+            self._db.commit()
+
+    def evict(self, url: str) -> None:
+        """删除 `url` 的缓存"""
+        with self._lock:
+            row = self._db.execute("SELECT path FROM urls WHERE url = ?;", (url,)).fetchone()
+            if row:
+                shutil.rmtree(os.path.dirname(row[0]), ignore_errors=True)
+                self._db.execute("DELETE FROM urls WHERE url = ?;", (url,))
+                self._db.commit()
+
+    def prefetch(self, urls: Iterable[str]) -> Dict[str, Future]:
+        """并发下载一批 URL，立即返回 {url: Future}，结果同 `fetch`"""
+        return {url: self._pool.submit(self.fetch, url) for url in dict.fromkeys(urls)}
+
+    def stats(self) -> Dict[str, int]:
+        """统计：{files, bytes}"""
+        with self._lock:
+            files, size = self._db.execute("SELECT COUNT(*), TOTAL(size) FROM urls;").fetchone()
+        return {"files": files, "bytes": int(size)}
@@ -0,0 +1,187 @@
+# -*- coding: utf-8 -*-
+
+import logging
+import os
+from collections import OrderedDict, deque
+from concurrent.futures import Future
+from datetime import datetime
+from threading import Condition, Thread
+from time import perf_counter
+from typing import Callable, Dict, Optional
+
+from wcferry.completion import resolved
+from wcferry.imagestore import ImageStore, imgdatahash_of
+from wcferry.wxmsg import WxMsg
+
+
+class ImageDownloader():
+    """图片下载服务：去重、限制并发、按群轮流下载，下载结果按 `layout` 存放
+
+    每个群（私聊按发送人）各有一个队列，空出下载名额时按群轮流取，一个群里刷屏的大量图片不会饿死其他群。
+    下载本身由 `Wcf.download_image_future` 完成，等待解密时不占用线程。
+
+    Args:
+        wcf (Wcf): `Wcf` 实例
+        dir (str): 图片根目录
+        layout (str): 子目录模板，可用 `{room}`（群 id，私聊为发送人）、`{sender}`、`{date}`（YYYY-MM-DD）、`{type}`
+        concurrency (int): 同时下载的图片数
+        timeout (float): 单张图片超时时间（秒）
+        max_seen (int): 记住多少个消息 id 用于去重
+        store (ImageStore): 图片库；设置后相同内容的图片只存一份，重复转发的图片不再下载
+
+    Example:
+        downloader = ImageDownloader(wcf, "C:/images", layout="{room}/{date}", concurrency=8)
+        future = downloader.submit(msg)
+        future.add_done_callback(lambda f: print(f.result()))
+    """
+
+    def __init__(self, wcf, dir: str, layout: str = "{room}/{date}", concurrency: int = 4, timeout: float = 30,
+                 max_seen: int = 10000, store: ImageStore = None) -> None:
+        self.LOG = logging.getLogger("WCF")
+        self._wcf = wcf
+        self.dir = dir
+        self.layout = layout
+        self.concurrency = max(1, concurrency)
+        self.timeout = timeout
+        self.max_seen = max_seen
+        self.store = store
+        self._rooms = OrderedDict()  # room -> deque[(msg, future, submitted)]，按轮转顺序排列
+        self._seen = OrderedDict()   # msg.id -> future
+        self._queued = 0
+        self._in_flight = 0
+        self._latencies = deque(maxlen=1000)
+        self._counts = {"completed": 0, "failed": 0, "duplicates": 0}
+        self._cond = Condition()
+        self._closed = False
+        self._thread = Thread(target=self._dispatch, name="ImageDownloader", daemon=True)
+        self._thread.start()
+
+    def path_for(self, msg: WxMsg) -> str:
+        """图片 `msg` 的存放目录"""
+        sub = self.layout.format(room=msg.roomid or msg.sender, sender=msg.sender, type=msg.type,
+                                 date=datetime.fromtimestamp(msg.ts).strftime("%Y-%m-%d"))
+        return os.path.join(self.dir, sub)
+
+    def submit(self, msg: WxMsg, callback: Optional[Callable[[Future], None]] = None) -> Future:
+        """提交一条图片消息；同一消息 id 重复提交时返回同一个 `Future`，下载失败后可以重新提交
+
+        Args:
+            msg (WxMsg): 图片消息（type 3）
+            callback (Callable): 完成时以 `Future` 为参数调用
+
+        Returns:
+            Future: 结果为图片路径；失败抛出 `TimeoutError`、`RuntimeError`
+
+        Raises:
+            ValueError: 不是图片消息
+        """
+        if msg.type != 3:
+            raise ValueError(f"不是图片消息: type {msg.type}")
+
+        with self._cond:
+            if self._closed:
+                raise RuntimeError("ImageDownloader 已关闭")
+
+            future = self._seen.get(msg.id)
+            if future is None:
+                future = Future()
+                self._seen[msg.id] = future
+                while len(self._seen) > self.max_seen:
+                    self._seen.popitem(last=False)
+
+                room = msg.roomid or msg.sender
+                queue = self._rooms.get(room)
+                if queue is None:
+                    queue = self._rooms[room] = deque()
+                queue.append((msg, future, perf_counter()))
+                self._queued += 1
+                self._cond.notify()
+            else:
+                self._counts["duplicates"] += 1
+
+        if callback is not None:
+            future.add_done_callback(callback)
+        return future
+
+    def _next(self) -> Optional[tuple]:
+        # 等到有空闲名额且有排队的图片，按群轮转取一张
+        with self._cond:
+            while not self._closed and (not self._queued or self._in_flight >= self.concurrency):
+                self._cond.wait()
+            if self._closed:
+                return None
+
+            room, queue = next(iter(self._rooms.items()))
+            item = queue.popleft()
+            if queue:
+                self._rooms.move_to_end(room)
+            else:
+                del self._rooms[room]
+            self._queued -= 1
+            self._in_flight += 1
+            return item
+
+    def _dispatch(self) -> None:
+        while True:
+            item = self._next()
+            if item is None:
+                return
+
+            msg, future, submitted = item
+            try:
+                dir = self.path_for(msg)
+                os.makedirs(dir, exist_ok=True)
+                download = self._wcf.download_image_future(msg.id, msg.extra, dir, self.timeout, store=self.store,
+                                                           imgdatahash=imgdatahash_of(msg.content) if self.store else "")
+            except Exception as e:
+                download = resolved(error=e)
+            download.add_done_callback(lambda f, item=item: self._done(f, *item))
+
+    def _done(self, download: Future, msg: WxMsg, future: Future, submitted: float) -> None:
+        error = None if download.cancelled() else download.exception()
+        failed = download.cancelled() or error is not None
+        with self._cond:
+            self._in_flight -= 1
+            self._latencies.append((perf_counter() - submitted) * 1000)
+            self._counts["failed" if failed else "completed"] += 1
+            if failed and self._seen.get(msg.id) is future:
+                del self._seen[msg.id]  # 失败的允许重新提交
+            self._cond.notify()
+
+        if download.cancelled():
+            future.cancel()
+        elif error is not None:
+            self.LOG.error(f"下载图片失败: {error!r}")
+            future.set_exception(error)
+        else:
+            future.set_result(download.result())
+
+    @property
+    def queued(self) -> int:
+        """排队中的图片数"""
+        return self._queued
+
+    @property
+    def in_flight(self) -> int:
+        """下载中的图片数"""
+        return self._in_flight
+
+    def stats(self) -> Dict:
+        """统计：{queued, in_flight, completed, failed, duplicates, p50_ms, p99_ms}，耗时为最近 1000 张从提交到完成"""
+        with self._cond:
+            latencies = sorted(self._latencies)
+            stats = {"queued": self._queued, "in_flight": self._in_flight, **self._counts}
+        stats["p50_ms"] = latencies[len(latencies) // 2] if latencies else 0
+        stats["p99_ms"] = latencies[max(0, int(len(latencies) * 0.99) - 1)] if latencies else 0
+        return stats
+
+    def close(self) -> None:
+        """停止下载，取消排队中的图片；已经在下载的不受影响"""
+        with self._cond:
+            self._closed = True
+            pending = [item for queue in self._rooms.values() for item in queue]
+            self._rooms.clear()
+            self._queued = 0
+            self._cond.notify_all()
+        for _, future, _ in pending:
+            future.cancel()
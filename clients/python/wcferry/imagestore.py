@@ -0,0 +1,171 @@
+# -*- coding: utf-8 -*-
+
+import hashlib
+import logging
+import os
+import re
+import shutil
+import sqlite3
+from threading import Lock
+from time import time
+from typing import Dict, Optional
+
+_IMGDATAHASH = re.compile(r'imgdatahash\s*=\s*"([^"]+)"')
+
+
+def imgdatahash_of(content: str) -> str:
+    """从图片消息的 XML 中取出 `imgdatahash`，没有返回空字符串"""
+    m = _IMGDATAHASH.search(content or "")
+    return m.group(1) if m else ""
+
+
+def default_cache_dir(*parts: str) -> str:
+    """本地缓存目录（OCR 结果、下载索引等），不存在时创建
+
+    依次取环境变量 `WCF_CACHE_DIR`、`LOCALAPPDATA`/`XDG_CACHE_HOME` 下的 `wcferry`，最后是 `~/.cache/wcferry`。
+
+    Args:
+        parts (str): 子目录
+    """
+    root = os.environ.get("WCF_CACHE_DIR")
+    if not root:
+        base = os.environ.get("LOCALAPPDATA") or os.environ.get("XDG_CACHE_HOME") or os.path.expanduser("~/.cache")
+        root = os.path.join(base, "wcferry")
+    path = os.path.join(root, *parts)
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+def sha256_file(path: str) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+class ImageStore():
+    """按内容寻址的图片库：同样内容的图片只存一份
+
+    图片按解密后内容的 sha256 存放在 `root/ab/cd/<sha256>.<ext>`；另有 sqlite 索引记录
+    消息 id、`imgdatahash` 到内容哈希的映射，重复转发的图片可以直接命中，不必再下载。
+    调用方需要的路径以硬链接的形式指向库里的文件，不占额外空间。
+
+    Args:
+        root (str): 图片库目录
+    """
+
+    def __init__(self, root: str) -> None:
+        self.LOG = logging.getLogger("WCF")
+        self.root = root
+        os.makedirs(root, exist_ok=True)
+        self._lock = Lock()
+        self._db = sqlite3.connect(os.path.join(root, "index.db"), check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL;")
+        self._db.executescript("""
+            CREATE TABLE IF NOT EXISTS blobs (hash TEXT PRIMARY KEY, ext TEXT, size INTEGER, refs INTEGER, created REAL);
+            CREATE TABLE IF NOT EXISTS msgs (msgid INTEGER PRIMARY KEY, hash TEXT);
+            CREATE TABLE IF NOT EXISTS imgdatahash (imgdatahash TEXT PRIMARY KEY, hash TEXT);
+        """)
+        self._db.commit()
+
+    def close(self) -> None:
+        with self._lock:
+            self._db.close()
+
+    def path_of(self, hash: str, ext: str) -> str:
+        """内容哈希对应的文件路径"""
+        return os.path.join(self.root, hash[:2], hash[2:4], f"{hash}{ext}")
+
+    def _blob_path(self, hash: str) -> Optional[str]:
+        row = self._db.execute("SELECT ext FROM blobs WHERE hash = ?;", (hash,)).fetchone()
+        if row is None:
+            return None
+        path = self.path_of(hash, row[0])
+        return path if os.path.exists(path) else None
+
+    def lookup(self, msgid: int = None, imgdatahash: str = "") -> Optional[str]:
+        """按消息 id 或 `imgdatahash` 查找已经存过的图片
+
+        Returns:
+            str: 库中的文件路径；没有返回 None
+        """
+        with self._lock:
+            row = None
+            if msgid:
+                row = self._db.execute("SELECT hash FROM msgs WHERE msgid = ?;", (msgid,)).fetchone()
+            if row is None and imgdatahash:
+                row = self._db.execute("SELECT hash FROM imgdatahash WHERE imgdatahash = ?;",
+                                       (imgdatahash,)).fetchone()
+            return self._blob_path(row[0]) if row else None
+
+    def add_file(self, path: str, msgid: int = None, imgdatahash: str = "", alias: bool = True) -> str:
+        """把图片移入图片库
+
+        Args:
+            path (str): 解密后的图片路径
+            msgid (int): 消息 id，记入索引
+            imgdatahash (str): 消息里的 `imgdatahash`，记入索引
+            alias (bool): 是否在 `path` 处留下指向库里文件的硬链接
+
+        Returns:
+            str: `alias` 为真时返回 `path`，否则返回库中的文件路径
+        """
+        hash = sha256_file(path)
+        ext = os.path.splitext(path)[1]
+        with self._lock:
+            stored = self._blob_path(hash)
+            if stored is None:
+                stored = self.path_of(hash, ext)
+                os.makedirs(os.path.dirname(stored), exist_ok=True)
+                shutil.move(path, stored)
+                self._db.execute("INSERT OR REPLACE INTO blobs VALUES (?, ?, ?, 1, ?);",
+                                 (hash, ext, os.path.getsize(stored), time()))
+            else:
+                os.remove(path)
+                if msgid is None or not self._db.execute("SELECT 1 FROM msgs WHERE msgid = ?;", (msgid,)).fetchone():
+                    self._db.execute("UPDATE blobs SET refs = refs + 1 WHERE hash = ?;", (hash,))
+
+            if msgid is not None:
+                self._db.execute("INSERT OR REPLACE INTO msgs VALUES (?, ?);", (msgid, hash))
+            if imgdatahash:
+                self._db.execute("INSERT OR REPLACE INTO imgdatahash VALUES (?, ?);", (imgdatahash, hash))
+            self._db.commit()
+
+        if not alias:
+            return stored
+        return self.link(stored, path)
+
+    def remember(self, stored: str, msgid: int = None, imgdatahash: str = "") -> None:
+        """命中后把新的消息 id、`imgdatahash` 也记到同一内容上"""
+        hash = os.path.splitext(os.path.basename(stored))[0]
+        with self._lock:
+            if msgid is not None and not self._db.execute("SELECT 1 FROM msgs WHERE msgid = ?;", (msgid,)).fetchone():
+                self._db.execute("INSERT INTO msgs VALUES (?, ?);", (msgid, hash))
+                self._db.execute("UPDATE blobs SET refs = refs + 1 WHERE hash = ?;", (hash,))
+            if imgdatahash:
+                self._db.execute("INSERT OR REPLACE INTO imgdatahash VALUES (?, ?);", (imgdatahash, hash))
+            self._db.commit()
+
+    def link(self, stored: str, dst: str) -> str:
+        """在 `dst` 建立指向库中文件的硬链接；不支持硬链接时复制一份
+
+        Returns:
+            str: `dst`
+        """
+        if os.path.exists(dst):
+            if os.path.samefile(stored, dst):
+                return dst
+            os.remove(dst)
+        try:
+            os.link(stored, dst)
+        except OSError:
+            shutil.copyfile(stored, dst)
+        return dst
+
+    def stats(self) -> Dict[str, int]:
+        """统计：{blobs, bytes, refs, msgs}；refs 与 blobs 之差即为去重省下的文件数"""
+        with self._lock:
+            blobs, size, refs = self._db.execute("SELECT COUNT(*), TOTAL(size), TOTAL(refs) FROM blobs;").fetchone()
+            msgs = self._db.execute("SELECT COUNT(*) FROM msgs;").fetchone()[0]
+        return {"blobs": blobs, "bytes": int(size), "refs": int(refs), "msgs": msgs}
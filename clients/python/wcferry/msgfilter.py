@@ -0,0 +1,93 @@
+# -*- coding: utf-8 -*-
+
+from typing import Callable, Dict, Iterable
+
+from wcferry import wcf_pb2
+from wcferry.wxmsg import _AT_ALL, parse_atuserlist
+
+# 规则按检查代价从低到高排列，便宜的先把大部分消息挡掉
+RULES = ("types", "is_group", "from_self", "roomids", "senders", "at_me")
+
+
+def _at_me(msg: wcf_pb2.WxMsg, wxid: str) -> bool:
+    # 与 `WxMsg.is_at` 相同的判断，直接作用于 protobuf
+    if not msg.is_group or wxid not in msg.xml:
+        return False
+    if wxid not in parse_atuserlist(msg.xml):
+        return False
+    return not _AT_ALL.search(msg.content)
+
+
+class MsgFilter():
+    """接收消息的过滤条件，在接收线程里作用于刚解析的 `wcf_pb2.WxMsg`，不符合的消息不会构造 `WxMsg`、不会入队
+
+    各条件之间为“且”，不设置（None）的条件不检查。`compile` 时只把设置了的条件按 `RULES` 的顺序
+    排成一串检查，逐个应用；每条规则各自统计挡掉了多少条消息。
+
+    Args:
+        types (Iterable[int]): 只要这些类型的消息
+        roomids (Iterable[str]): 只要这些群的消息
+        senders (Iterable[str]): 只要这些人发的消息
+        is_group (bool): True 只要群消息，False 只要私聊消息
+        from_self (bool): True 只要自己发的，False 不要自己发的
+        at_me (bool): True 只要 @ 自己的群消息（不含 @ 所有人），False 不要 @ 自己的
+
+    Example:
+        wcf.enable_receiving_msg(filter=MsgFilter(types={1, 3}, roomids={"xxx@chatroom"}))
+        wcf.msg_filter.stats()
+    """
+
+    def __init__(self, types: Iterable[int] = None, roomids: Iterable[str] = None, senders: Iterable[str] = None,
+                 is_group: bool = None, from_self: bool = None, at_me: bool = None) -> None:
+        self.types = None if types is None else frozenset(types)
+        self.roomids = None if roomids is None else frozenset(roomids)
+        self.senders = None if senders is None else frozenset(senders)
+        self.is_group = is_group
+        self.from_self = from_self
+        self.at_me = at_me
+        self._accepted = [0]
+        self._rejected = {rule: [0] for rule in RULES}
+        self._predicate = None
+
+    def compile(self, self_wxid: str = "") -> Callable[[wcf_pb2.WxMsg], bool]:
+        """生成判断函数：参数为 `wcf_pb2.WxMsg`，返回是否保留，同时更新计数
+
+        Args:
+            self_wxid (str): 自己的 wxid，`at_me` 需要
+        """
+        if self.at_me is not None and not self_wxid:
+            raise ValueError("at_me 需要自己的 wxid")
+
+        types, roomids, senders = self.types, self.roomids, self.senders
+        is_group, from_self, at_me = bool(self.is_group), bool(self.from_self), bool(self.at_me)
+        checks = {
+            "types": lambda m: m.type in types,
+            "is_group": lambda m: m.is_group == is_group,
+            "from_self": lambda m: m.is_self == from_self,
+            "roomids": lambda m: m.roomid in roomids,
+            "senders": lambda m: m.sender in senders,
+            "at_me": lambda m: _at_me(m, self_wxid) == at_me,
+        }
+        steps = [(checks[rule], self._rejected[rule]) for rule in RULES if getattr(self, rule) is not None]
+        accepted = self._accepted
+
+        def predicate(m: wcf_pb2.WxMsg) -> bool:
+            for check, rejected in steps:
+                if not check(m):
+                    rejected[0] += 1
+                    return False
+            accepted[0] += 1
+            return True
+
+        self._predicate = predicate
+        return self._predicate
+
+    def __call__(self, msg: wcf_pb2.WxMsg) -> bool:
+        if self._predicate is None:
+            self.compile()
+        return self._predicate(msg)
+
+    def stats(self) -> Dict[str, int]:
+        """统计：{accepted, rejected, rejected.<规则>}；计数只在接收线程里累加"""
+        rejected = {f"rejected.{rule}": c[0] for rule, c in self._rejected.items() if getattr(self, rule) is not None}
+        return {"accepted": self._accepted[0], "rejected": sum(rejected.values()), **rejected}
@@ -0,0 +1,243 @@
+# -*- coding: utf-8 -*-
+
+import os
+import struct
+import tempfile
+from collections import deque
+from queue import Empty, Full
+from threading import Condition, Lock
+from time import monotonic
+from typing import Callable, Dict, List, Optional
+
+from wcferry import wcf_pb2
+from wcferry.wxmsg import WxMsg
+
+BLOCK = "block"              # 队列满时阻塞接收线程，直到有空位
+DROP_OLDEST = "drop_oldest"  # 丢弃最早的消息，放入新消息
+DROP_NEWEST = "drop_newest"  # 丢弃新消息
+SPILL = "spill"              # 写入磁盘，内存里有空位时再按顺序读回
+POLICIES = (BLOCK, DROP_OLDEST, DROP_NEWEST, SPILL)
+
+_HEADER = struct.Struct("<Iq")  # 长度、消息日志序号（没有为 -1）
+
+
+class MsgQueue():
+    """有界消息队列，接口与 `queue.Queue` 一致（`put`、`get`、`qsize`、`empty`、`full`）
+
+    内存中最多存放 `maxsize` 条消息，满了以后按 `policy` 处理：阻塞、丢弃最早的、丢弃最新的或溢出到磁盘。
+    溢出到磁盘的消息以长度前缀的 `wcf_pb2.WxMsg` 追加到文件里，读取顺序不变；全部读回后文件清空。
+
+    Args:
+        maxsize (int): 内存中最多存放的消息数，0 为不限
+        policy (str): 队列满时的策略，`block`、`drop_oldest`、`drop_newest` 或 `spill`
+        spill_path (str): 溢出文件路径，默认在临时目录里新建
+        msg_type (type): 从磁盘读回时构造消息的类型，`WxMsg` 或 `LazyWxMsg`
+        on_drop (Callable): 按 `drop_oldest`、`drop_newest` 丢弃消息时调用，参数为被丢弃的消息；
+            在持有队列锁时调用，不能再操作本队列
+    """
+
+    def __init__(self, maxsize: int = 10000, policy: str = BLOCK, spill_path: str = None,
+                 msg_type: type = WxMsg, on_drop: Callable[[WxMsg], None] = None) -> None:
+        if policy not in POLICIES:
+            raise ValueError(f"不支持的溢出策略: {policy}")
+        self.maxsize = maxsize
+        self.policy = policy
+        self.msg_type = msg_type
+        self.on_drop = on_drop
+        self._q = deque()
+        self._lock = Lock()
+        self._not_empty = Condition(self._lock)
+        self._not_full = Condition(self._lock)
+        self._counts = {"enqueued": 0, "dequeued": 0, "dropped": 0, "spilled": 0}
+        self._high_water = 0
+        self._spill_path = spill_path
+        self._spill = None   # 溢出文件，用到时才创建
+        self._spill_read = 0
+        self._spill_write = 0
+        self._spill_pending = 0
+
+    def close(self) -> None:
+        """关闭并删除溢出文件，其中未读回的消息随之丢弃（设置了消息日志时，它们没有确认，下次启动会重放）"""
+        with self._lock:
+            if self._spill:
+                self._spill.close()
+                os.remove(self._spill.name)
+                self._spill = None
+
+    def qsize(self) -> int:
+        """排队中的消息数，包括溢出到磁盘的"""
+        return len(self._q) + self._spill_pending
+
+    def empty(self) -> bool:
+        return not self.qsize()
+
+    def full(self) -> bool:
+        return 0 < self.maxsize <= len(self._q)
+
+    def _append(self, msg: WxMsg) -> None:
+        self._q.append(msg)
+        self._counts["enqueued"] += 1
+        self._high_water = max(self._high_water, len(self._q))
+
+    def _drop(self, msg: WxMsg) -> None:
+        self._counts["dropped"] += 1
+        if self.on_drop:
+            self.on_drop(msg)
+
+    def _put(self, msg: WxMsg, block: bool, deadline: Optional[float]) -> None:
+        # 持有 `_lock` 时调用，不通知消费者，由调用方统一通知
+        if self._spill_pending:  # 磁盘上还有更早的消息，新消息排在它们后面
+            self._spill_one(msg)
+            return
+
+        if not self.full():
+            self._append(msg)
+            return
+
+        if self.policy == DROP_NEWEST:
+            self._drop(msg)
+            return
+
+        if self.policy == DROP_OLDEST:
+            self._drop(self._q.popleft())
+            self._append(msg)
+            return
+
+        if self.policy == SPILL:
+            self._spill_one(msg)
+            return
+
+        if not block:
+            raise Full
+        self._not_empty.notify_all()  # 先让消费者取走已经放进去的消息，否则可能互相等待
+        while self.full():
+            remaining = None if deadline is None else deadline - monotonic()
+            if remaining is not None and remaining <= 0:
+                raise Full
+            self._not_full.wait(remaining)
+        self._append(msg)
+
+    def put(self, msg: WxMsg, block: bool = True, timeout: Optional[float] = None) -> None:
+        """放入一条消息
+
+        Args:
+            msg (WxMsg): 消息
+            block (bool): `block` 策略下是否等待空位
+            timeout (float): `block` 策略下最多等待多久（秒），默认一直等
+
+        Raises:
+            Full: `block` 策略下等待超时，或不等待时队列已满
+        """
+        with self._lock:
+            self._put(msg, block, None if timeout is None else monotonic() + timeout)
+            self._not_empty.notify()
+
+    def put_many(self, msgs: List[WxMsg], block: bool = True, timeout: Optional[float] = None) -> None:
+        """放入一批消息，只加一次锁、只通知一次消费者；队列满时逐条按 `policy` 处理
+
+        Raises:
+            Full: `block` 策略下等待超时，或不等待时队列已满；之前的消息已经放入
+        """
+        if not msgs:
+            return
+        with self._lock:
+            deadline = None if timeout is None else monotonic() + timeout
+            try:
+                for msg in msgs:
+                    self._put(msg, block, deadline)
+            finally:
+                self._not_empty.notify(len(msgs))
+
+    def put_nowait(self, msg: WxMsg) -> None:
+        self.put(msg, False)
+
+    def get(self, block: bool = True, timeout: Optional[float] = None) -> WxMsg:
+        """取出一条消息
+
+        Raises:
+            Empty: 不等待时没有消息，或等待超时
+        """
+        with self._lock:
+            if not self._q:
+                if not block:
+                    raise Empty
+                if not self._not_empty.wait_for(lambda: self._q, timeout):
+                    raise Empty
+
+            msg = self._q.popleft()
+            self._counts["dequeued"] += 1
+            if self._spill_pending and len(self._q) <= self.maxsize // 2:  # 攒出一半空位再批量读回
+                self._unspill()
+            self._not_full.notify()  # 唤醒等空位的接收线程
+            return msg
+
+    def get_many(self, max_n: int, timeout: Optional[float] = None) -> List[WxMsg]:
+        """取出最多 `max_n` 条消息，只加一次锁
+
+        Args:
+            max_n (int): 最多取多少条
+            timeout (float): 没有消息时最多等待多久（秒），None 为一直等，0 为不等
+
+        Returns:
+            List[WxMsg]: 消息列表，超时返回空列表
+        """
+        with self._lock:
+            if not self._q and (timeout == 0 or not self._not_empty.wait_for(lambda: self._q, timeout)):
+                return []
+
+            q, msgs = self._q, []
+            while q and len(msgs) < max_n:
+                msgs.extend(q.popleft() for _ in range(min(max_n - len(msgs), len(q))))
+                if self._spill_pending and len(q) <= self.maxsize // 2:
+                    self._unspill()
+            self._counts["dequeued"] += len(msgs)
+            self._not_full.notify()
+            return msgs
+
+    def get_nowait(self) -> WxMsg:
+        return self.get(False)
+
+    def _spill_one(self, msg: WxMsg) -> None:
+        # 持有 `_lock` 时调用
+        if self._spill is None:
+            if self._spill_path:
+                self._spill = open(self._spill_path, "w+b")
+            else:
+                self._spill = tempfile.NamedTemporaryFile(prefix="wcf_spill_", delete=False)
+        data = msg.to_pb().SerializeToString()
+        self._spill.seek(self._spill_write)
+        self._spill.write(_HEADER.pack(len(data), -1 if msg.offset is None else msg.offset) + data)
+        self._spill_write = self._spill.tell()
+        self._spill_pending += 1
+        self._counts["enqueued"] += 1
+        self._counts["spilled"] += 1
+
+    def _unspill(self) -> None:
+        # 持有 `_lock` 时调用：按顺序把磁盘上的消息读回内存，直到内存里的空位用完
+        n = min(self._spill_pending, self.maxsize - len(self._q))
+        if n <= 0:
+            return
+        self._spill.flush()
+        self._spill.seek(self._spill_read)
+        for _ in range(n):
+            size, offset = _HEADER.unpack(self._spill.read(_HEADER.size))
+            pb = wcf_pb2.WxMsg()
+            pb.ParseFromString(self._spill.read(size))
+            msg = self.msg_type(pb)
+            msg.offset = None if offset < 0 else offset
+            self._q.append(msg)
+        self._spill_read = self._spill.tell()
+        self._spill_pending -= n
+        if not self._spill_pending:  # 全部读回，文件从头再用
+            self._spill.seek(0)
+            self._spill.truncate()
+            self._spill_read = self._spill_write = 0
+
+    def stats(self) -> Dict[str, int]:
+        """统计：{size, spill_pending, enqueued, dequeued, dropped, spilled, high_water}
+
+        `high_water` 为内存中排队消息数的最大值；`spilled` 为累计溢出到磁盘的条数，`spill_pending` 为还没读回的。
+        """
+        with self._lock:
+            return {"size": len(self._q), "spill_pending": self._spill_pending, **self._counts,
+                    "high_water": self._high_water}
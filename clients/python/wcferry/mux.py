@@ -0,0 +1,165 @@
+# -*- coding: utf-8 -*-
+
+import logging
+from concurrent.futures import Future
+from queue import Queue
+from threading import Lock, Thread
+from time import perf_counter
+from typing import Dict
+
+import pynng
+from wcferry import wcf_pb2
+
+
+class RequestMux():
+    """命令通道多路复用：多个线程可以同时发请求，由唯一的 I/O 线程独占 `socket` 收发。
+
+    服务端按收到的顺序逐个处理、逐个回包，因此请求与响应按先进先出对应，并用 `Response.func` 校验。
+    请求超时后，它的响应通常迟早还会回来，而同类请求的响应无法区分；因此之后的请求先等着，
+    把迟到的响应收完丢掉再发出。等满一个接收超时还没等到，就认为响应已经丢失（如服务端重启），
+    不再等待，照常发出请求，避免一条丢失的响应让之后的请求全部失败。
+
+    Args:
+        socket (pynng.Socket): 已经连接好的命令通道
+    """
+
+    def __init__(self, socket: pynng.Socket) -> None:
+        self.LOG = logging.getLogger("WCF")
+        self._socket = socket
+        self._q = Queue()
+        self._lock = Lock()  # `submit` 与 `close` 互斥，关闭之后不会再有请求进入队列
+        self._stale = 0  # 已超时但响应还没回来的请求数
+        self._stats = {}
+        self._stats_lock = Lock()
+        self._pending = 0  # 已提交但还没完成的请求数
+        self._is_running = True
+        self._thread = Thread(target=self._loop, name="RequestMux", daemon=True)
+        self._thread.start()
+
+    def close(self) -> None:
+        """停止 I/O 线程，未发出的请求以 `pynng.Closed` 结束"""
+        if not self._is_running:
+            return
+
+        with self._lock:
+            self._is_running = False
+            self._q.put(None)
+        self._thread.join()
+
+    def submit(self, req: wcf_pb2.Request) -> Future:
+        """提交请求，立即返回 `Future`，结果为 `wcf_pb2.Response`"""
+        fut = Future()
+        with self._lock:
+            if not self._is_running:
+                fut.set_exception(pynng.Closed("Object closed", 7))
+                return fut
+
+            with self._stats_lock:
+                self._pending += 1
+            fut.add_done_callback(self._done)
+            self._q.put((req, fut, perf_counter()))
+        return fut
+
+    @property
+    def pending(self) -> int:
+        """排队中与发送中的请求数"""
+        return self._pending
+
+    def _done(self, _: Future) -> None:
+        with self._stats_lock:
+            self._pending -= 1
+
+    def call(self, req: wcf_pb2.Request) -> wcf_pb2.Response:
+        """提交请求并等待响应，超时抛出 `pynng.Timeout`"""
+        return self.submit(req).result()
+
+    def stats(self) -> Dict[str, Dict]:
+        """按功能统计的排队耗时与往返耗时（毫秒）
+
+        Returns:
+            Dict[str, Dict]: {函数名: {count, errors, queue_avg, queue_max, rtt_avg, rtt_max}}
+        """
+        with self._stats_lock:
+            result = {}
+            for func, (count, errors, q_sum, q_max, rtt_sum, rtt_max) in self._stats.items():
+                n = max(count, 1)
+                result[wcf_pb2.Functions.Name(func)] = {
+                    "count": count,
+                    "errors": errors,
+                    "queue_avg": q_sum / n * 1000,
+                    "queue_max": q_max * 1000,
+                    "rtt_avg": rtt_sum / n * 1000,
+                    "rtt_max": rtt_max * 1000,
+                }
+            return result
+
+    def _record(self, func: int, queued: float, rtt: float, ok: bool) -> None:
+        with self._stats_lock:
+            s = self._stats.setdefault(func, [0, 0, 0.0, 0.0, 0.0, 0.0])
+            s[0] += 1
+            s[1] += 0 if ok else 1
+            s[2] += queued
+            s[3] = max(s[3], queued)
+            s[4] += rtt
+            s[5] = max(s[5], rtt)
+
+    def _drain(self) -> None:
+        # 发新请求之前收完超时请求的迟到响应；服务端按顺序回包，收够条数即可。等不到时认为响应已经丢失
+        while self._stale:
+            try:
+                data = self._socket.recv_msg().bytes
+            except pynng.Timeout:
+                self.LOG.warning(f"{self._stale} 个超时请求的响应没有等到，视为丢失")
+                self._stale = 0
+                return
+            rsp = wcf_pb2.Response()
+            rsp.ParseFromString(data)
+            self._stale -= 1
+            self.LOG.warning(f"丢弃超时请求的迟到响应: {wcf_pb2.Functions.Name(rsp.func)}")
+
+    def _recv(self, func: int) -> wcf_pb2.Response:
+        while True:
+            rsp = wcf_pb2.Response()
+            rsp.ParseFromString(self._socket.recv_msg().bytes)
+            if rsp.func == func:
+                return rsp
+
+            self.LOG.warning(f"丢弃无法匹配的响应: {wcf_pb2.Functions.Name(rsp.func)}")
+
+    def _loop(self) -> None:
+        while True:
+            item = self._q.get()
+            if item is None:
+                break
+
+            req, fut, submitted = item
+            if not fut.set_running_or_notify_cancel():
+                continue
+
+            sent = perf_counter()
+            try:
+                self._drain()
+                self._socket.send(req.SerializeToString())
+            except Exception as e:
+                self._record(req.func, sent - submitted, perf_counter() - sent, False)
+                fut.set_exception(e)
+                continue
+
+            try:
+                rsp = self._recv(req.func)
+            except pynng.Timeout as e:
+                self._stale += 1
+                self._record(req.func, sent - submitted, perf_counter() - sent, False)
+                fut.set_exception(e)
+            except Exception as e:
+                self._record(req.func, sent - submitted, perf_counter() - sent, False)
+                fut.set_exception(e)
+            else:
+                self._record(req.func, sent - submitted, perf_counter() - sent, True)
+                fut.set_result(rsp)
+
+        # 退出前把剩下的请求结束掉，避免调用方永远等待
+        while not self._q.empty():
+            item = self._q.get_nowait()
+            if item is not None and item[1].set_running_or_notify_cancel():
+                item[1].set_exception(pynng.Closed("Object closed", 7))
@@ -0,0 +1,163 @@
+# -*- coding: utf-8 -*-
+
+import logging
+import os
+import sqlite3
+from collections import deque
+from concurrent.futures import Future, as_completed
+from threading import Condition
+from time import time
+from typing import Dict, Iterable, Iterator, Tuple
+
+from wcferry.completion import resolved
+from wcferry.imagestore import default_cache_dir, sha256_file
+
+
+class OcrService():
+    """OCR 服务：结果按图片内容哈希持久缓存，限制同时进行的 OCR 数，批量提交时按完成顺序返回结果
+
+    同样内容的图片（如转发）只识别一次；等待结果使用 `Wcf.get_ocr_result_future`，不占用线程。
+    图片文件无法读取时（如连接远程服务端）退化为按路径缓存。只缓存成功且非空的结果，失败的下次重新识别。
+
+    Args:
+        wcf (Wcf): `Wcf` 实例
+        cache_path (str): 缓存数据库路径，默认为 `default_cache_dir()` 下的 `ocr.db`；`:memory:` 为只缓存在内存里
+        concurrency (int): 同时进行的 OCR 数
+        timeout (float): 单张图片超时时间（秒）
+    """
+
+    def __init__(self, wcf, cache_path: str = None, concurrency: int = 2, timeout: float = 2) -> None:
+        self.LOG = logging.getLogger("WCF")
+        self._wcf = wcf
+        self.concurrency = max(1, concurrency)
+        self.timeout = timeout
+        if cache_path is None:
+            cache_path = os.path.join(default_cache_dir(), "ocr.db")
+        self._db = sqlite3.connect(cache_path, check_same_thread=False)
+        self._db.execute("CREATE TABLE IF NOT EXISTS ocr (key TEXT PRIMARY KEY, result TEXT, created REAL);")
+        self._db.commit()
+        self._queue = deque()     # (key, extra, future)
+        self._running = {}        # key -> Future，排队中与识别中的
+        self._in_flight = 0
+        self._counts = {"hits": 0, "misses": 0, "failed": 0}
+        self._cond = Condition()
+        self._closed = False
+
+    def close(self) -> None:
+        """关闭缓存；还在排队的图片以 `RuntimeError` 结束，识别中的结果照常返回但不再写入缓存"""
+        with self._cond:
+            if self._closed:
+                return
+            self._closed = True
+            self._db.close()
+            queued = [future for _, _, future in self._queue]
+            self._running.clear()
+            self._queue.clear()
+        for future in queued:
+            if future.set_running_or_notify_cancel():
+                future.set_exception(RuntimeError("OcrService 已关闭"))
+
+    @staticmethod
+    def key_of(extra: str) -> str:
+        """缓存键：图片内容的 sha256，读不到文件时为路径"""
+        try:
+            return sha256_file(extra)
+        except OSError:
+            return f"path:{extra}"
+
+    def submit(self, extra: str) -> Future:
+        """提交一张图片
+
+        Args:
+            extra (str): 待识别的图片路径，消息里的 extra
+
+        Returns:
+            Future: 结果为 OCR 结果；超时抛出 `TimeoutError`。还在排队时可以取消，同一图片的提交共用这个 Future
+        """
+        key = self.key_of(extra)
+        with self._cond:
+            if self._closed:
+                return resolved(error=RuntimeError("OcrService 已关闭"))
+
+            row = self._db.execute("SELECT result FROM ocr WHERE key = ?;", (key,)).fetchone()
+            if row is not None:
+                self._counts["hits"] += 1
+                return resolved(row[0])
+
+            future = self._running.get(key)
+            if future is not None and not future.cancelled():  # 同样的图片正在识别，共用结果
+                self._counts["hits"] += 1
+                return future
+
+            self._counts["misses"] += 1
+            future = self._running[key] = Future()
+            self._queue.append((key, extra, future))
+            self._pump()
+        return future
+
+    def _pump(self) -> None:
+        # 持有 `_cond` 时调用：有空闲名额就开始识别排队中的图片
+        while self._queue and self._in_flight < self.concurrency:
+            key, extra, future = self._queue.popleft()
+            if not future.set_running_or_notify_cancel():  # 排队时被取消
+                if self._running.get(key) is future:
+                    del self._running[key]
+                continue
+            self._in_flight += 1
+            try:
+                ocr = self._wcf.get_ocr_result_future(extra, self.timeout)
+            except Exception as e:
+                ocr = resolved(error=e)
+            ocr.add_done_callback(lambda f, key=key, future=future: self._done(key, future, f))
+
+    def _done(self, key: str, future: Future, ocr: Future) -> None:
+        error = ocr.exception() if not ocr.cancelled() else RuntimeError("OCR 已取消")
+        if error is None and not ocr.result():
+            error = RuntimeError("OCR 结果为空")  # 不缓存，下次重新识别
+        with self._cond:
+            self._in_flight -= 1
+            if self._running.get(key) is future:
+                del self._running[key]
+            if error is not None:
+                self._counts["failed"] += 1
+            elif not self._closed:  # 关闭后数据库已经关掉，结果照常返回，只是不缓存
+                self._db.execute("INSERT OR REPLACE INTO ocr VALUES (?, ?, ?);", (key, ocr.result(), time()))
+                self._db.commit()
+            self._pump()
+
+        if error is None:
+            future.set_result(ocr.result())
+        else:
+            self.LOG.error(f"OCR failed: {error!r}")
+            future.set_exception(error)
+
+    def ocr(self, extra: str) -> str:
+        """识别一张图片并等待结果，失败返回空字符串"""
+        try:
+            return self.submit(extra).result()
+        except Exception:
+            return ""
+
+    def ocr_many(self, extras: Iterable[str]) -> Iterator[Tuple[str, str]]:
+        """批量识别，按完成顺序逐个返回
+
+        Args:
+            extras (Iterable[str]): 待识别的图片路径
+
+        Returns:
+            Iterator[Tuple[str, str]]: (extra, OCR 结果)，失败或被取消的结果为空字符串
+        """
+        # 同一张图片提交多次时共用 Future，这里按提交的 extra 逐个返回
+        pending = {}
+        for extra in extras:
+            pending.setdefault(self.submit(extra), []).append(extra)
+        for future in as_completed(pending):
+            result = "" if future.cancelled() or future.exception() else future.result()
+            for extra in pending[future]:
+                yield extra, result
+
+    def stats(self) -> Dict[str, int]:
+        """统计：{queued, in_flight, hits, misses, failed, cached}"""
+        with self._cond:
+            cached = 0 if self._closed else self._db.execute("SELECT COUNT(*) FROM ocr;").fetchone()[0]
+            return {"queued": len(self._queue), "in_flight": self._in_flight, **self._counts, "cached": cached}
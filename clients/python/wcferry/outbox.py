@@ -0,0 +1,254 @@
+# -*- coding: utf-8 -*-
+
+import heapq
+import itertools
+import logging
+from collections import OrderedDict, deque
+from concurrent.futures import Future
+from threading import Condition, Thread
+from time import monotonic
+from typing import Deque, Dict, Optional, Union
+
+
+class TokenBucket():
+    """令牌桶：平均每秒 `rate` 个，最多攒 `burst` 个
+
+    Args:
+        rate (float): 每秒补充的令牌数，必须大于 0
+        burst (float): 桶容量
+
+    Raises:
+        ValueError: `rate` 不大于 0
+    """
+
+    def __init__(self, rate: float, burst: float) -> None:
+        if rate <= 0:
+            raise ValueError(f"令牌补充速率必须大于 0: {rate}")
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.stamp = monotonic()
+
+    def _refill(self, now: float) -> None:
+        self.tokens = min(self.burst, self.tokens + (now - self.stamp) * self.rate)
+        self.stamp = now
+
+    def delay(self, now: float) -> float:
+        """还要等多久（秒）才有一个令牌"""
+        self._refill(now)
+        return 0 if self.tokens >= 1 else (1 - self.tokens) / self.rate
+
+    def take(self, now: float) -> None:
+        self._refill(now)
+        self.tokens -= 1
+
+    def full(self, now: float) -> bool:
+        self._refill(now)
+        return self.tokens >= self.burst
+
+
+class _Job():
+    __slots__ = ("kind", "receiver", "args", "priority", "futures")
+
+    def __init__(self, kind: str, receiver: str, args: tuple, priority: int) -> None:
+        self.kind = kind
+        self.receiver = receiver
+        self.args = args
+        self.priority = priority
+        self.futures = [Future()]
+
+
+class Outbox():
+    """发送队列：所有发送经由一个线程按优先级、限速、轮流地发出
+
+    - 全局与每个接收人各有一个令牌桶，避免短时间大量发送触发风控
+    - 优先级高的先发；优先级相同时在各接收人之间轮流，一个接收人的大量消息不会堵住其他人
+    - 同一接收人连续的、不 @ 人的文本消息合并成一条发送
+    - 每个任务返回 `Future`，结果为对应接口返回的 `status`
+
+    Args:
+        wcf (Wcf): `Wcf` 实例
+        rate (float): 全局每秒最多发送多少条
+        burst (float): 全局允许的突发条数
+        receiver_rate (float): 每个接收人每秒最多发送多少条
+        receiver_burst (float): 每个接收人允许的突发条数
+        coalesce (int): 合并文本的最大长度，0 为不合并
+        dry_run (bool): 只走排队、限速流程，不真正发送，结果为 0；`sent` 记录发送内容，用于压测
+        sent_maxlen (int): `sent` 最多保留最近多少条记录
+
+    Raises:
+        ValueError: `rate` 或 `receiver_rate` 不大于 0
+    """
+
+    def __init__(self, wcf, rate: float = 5, burst: float = 5, receiver_rate: float = 1, receiver_burst: float = 3,
+                 coalesce: int = 2000, dry_run: bool = False, sent_maxlen: int = 10000) -> None:
+        if rate <= 0 or receiver_rate <= 0:
+            raise ValueError(f"发送速率必须大于 0: rate={rate}, receiver_rate={receiver_rate}")
+        self.LOG = logging.getLogger("WCF")
+        self._wcf = wcf
+        self.coalesce = coalesce
+        self.dry_run = dry_run
+        self.sent: Deque[tuple] = deque(maxlen=sent_maxlen)  # dry_run 时最近的发送记录：(kind, receiver, args)
+        self._global = TokenBucket(rate, burst)
+        self._receiver_rate = receiver_rate
+        self._receiver_burst = receiver_burst
+        self._buckets = {}           # receiver -> TokenBucket
+        self._queues = OrderedDict()  # receiver -> [(-priority, seq, job)]，按轮转顺序排列
+        self._seq = itertools.count()
+        self._queued = 0
+        self._counts = {"sent": 0, "failed": 0, "coalesced": 0}
+        self._cond = Condition()
+        self._closed = False
+        self._thread = Thread(target=self._run, name="Outbox", daemon=True)
+        self._thread.start()
+
+    def _put(self, kind: str, receiver: str, args: tuple, priority: int) -> Future:
+        job = _Job(kind, receiver, args, priority)
+        with self._cond:
+            if self._closed:
+                raise RuntimeError("Outbox 已关闭")
+            queue = self._queues.get(receiver)
+            if queue is None:
+                queue = self._queues[receiver] = []
+            heapq.heappush(queue, (-priority, next(self._seq), job))
+            self._queued += 1
+            self._cond.notify()
+        return job.futures[0]
+
+    def send_text(self, msg: str, receiver: str, aters: Optional[str] = "", priority: int = 0) -> Future:
+        """排队发送文本消息，参数见 `Wcf.send_text`；`priority` 越大越先发"""
+        return self._put("text", receiver, (msg, aters or ""), priority)
+
+    def send_image(self, path: str, receiver: str, priority: int = 0) -> Future:
+        """排队发送图片，参数见 `Wcf.send_image`"""
+        return self._put("image", receiver, (path,), priority)
+
+    def send_file(self, path: str, receiver: str, priority: int = 0) -> Future:
+        """排队发送文件，参数见 `Wcf.send_file`"""
+        return self._put("file", receiver, (path,), priority)
+
+    def forward_msg(self, id: int, receiver: str, priority: int = 0) -> Future:
+        """排队转发消息，参数见 `Wcf.forward_msg`"""
+        return self._put("forward", receiver, (id,), priority)
+
+    @property
+    def queued(self) -> int:
+        """排队中的任务数"""
+        return self._queued
+
+    def stats(self) -> Dict[str, int]:
+        """统计：{queued, receivers, sent, failed, coalesced}"""
+        with self._cond:
+            return {"queued": self._queued, "receivers": len(self._queues), **self._counts}
+
+    def _bucket(self, receiver: str) -> TokenBucket:
+        bucket = self._buckets.get(receiver)
+        if bucket is None:
+            bucket = self._buckets[receiver] = TokenBucket(self._receiver_rate, self._receiver_burst)
+        return bucket
+
+    def _next(self) -> Union[_Job, float]:
+        # 持有 `_cond` 时调用：在令牌允许的接收人里，选优先级最高、轮转顺序最靠前的一个；都不允许时返回要等的秒数
+        now = monotonic()
+        wait = self._global.delay(now)
+        if wait:
+            return wait
+
+        best, best_priority, wait = None, None, None
+        for receiver, queue in self._queues.items():
+            delay = self._bucket(receiver).delay(now)
+            if delay:
+                wait = delay if wait is None else min(wait, delay)
+                continue
+            priority = queue[0][0]
+            if best is None or priority < best_priority:
+                best, best_priority = receiver, priority
+        if best is None:
+            return wait
+
+        queue = self._queues[best]
+        job = heapq.heappop(queue)[2]
+        self._queued -= 1
+        if job.kind == "text" and not job.args[1] and self.coalesce:
+            # 合并同一接收人后面紧跟着的同优先级、不 @ 人的文本
+            msg = job.args[0]
+            while queue and queue[0][0] == -job.priority:
+                nxt = queue[0][2]
+                if nxt.kind != "text" or nxt.args[1] or len(msg) + 1 + len(nxt.args[0]) > self.coalesce:
+                    break
+                heapq.heappop(queue)
+                self._queued -= 1
+                msg = f"{msg}\n{nxt.args[0]}"
+                job.futures.extend(nxt.futures)
+                self._counts["coalesced"] += 1
+            job.args = (msg, "")
+
+        if queue:
+            self._queues.move_to_end(best)
+        else:
+            del self._queues[best]
+        self._global.take(now)
+        self._bucket(best).take(now)
+        if len(self._buckets) > 4 * len(self._queues) + 1024:  # 清理不再需要的桶
+            self._buckets = {r: b for r, b in self._buckets.items() if r in self._queues or not b.full(now)}
+        return job
+
+    def _send(self, job: _Job) -> int:
+        if self.dry_run:
+            self.sent.append((job.kind, job.receiver, job.args))
+            return 0
+        wcf = self._wcf
+        if job.kind == "text":
+            return wcf.send_text(job.args[0], job.receiver, job.args[1])
+        if job.kind == "image":
+            return wcf.send_image(job.args[0], job.receiver)
+        if job.kind == "file":
+            return wcf.send_file(job.args[0], job.receiver)
+        return wcf.forward_msg(job.args[0], job.receiver)
+
+    def _run(self) -> None:
+        while True:
+            with self._cond:
+                while True:
+                    if not self._queued:
+                        if self._closed:
+                            return
+                        self._cond.wait()
+                        continue
+                    job = self._next()
+                    if isinstance(job, _Job):
+                        break
+                    self._cond.wait(job)
+
+            try:
+                status = self._send(job)
+            except Exception as e:
+                self.LOG.error(f"发送失败: {e}")
+                with self._cond:
+                    self._counts["failed"] += 1
+                for future in job.futures:
+                    future.set_exception(e)
+                continue
+
+            with self._cond:
+                self._counts["sent"] += 1
+            for future in job.futures:
+                future.set_result(status)
+
+    def close(self, drain: bool = True) -> None:
+        """关闭发送队列
+
+        Args:
+            drain (bool): 是否等排队中的任务发完；否则取消它们
+        """
+        with self._cond:
+            self._closed = True
+            if not drain:
+                for queue in self._queues.values():
+                    for _, _, job in queue:
+                        for future in job.futures:
+                            future.cancel()
+                self._queues.clear()
+                self._queued = 0
+            self._cond.notify()
+        self._thread.join()
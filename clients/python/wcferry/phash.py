@@ -0,0 +1,277 @@
+# -*- coding: utf-8 -*-
+
+"""感知哈希与近似重复图片检索
+
+`ahash`、`dhash`、`phash` 把图片压缩成 64 位整数，相似的图片汉明距离小。
+`HashIndex` 用多索引哈希（multi-index hashing）存放大量哈希：64 位分成 4 段 16 位，
+距离不超过 r 的两个哈希至少有一段的距离不超过 r // 4，只需在各段的有序表里查少量候选再逐个核对。
+
+需要安装 numpy；传入图片路径时需要安装 Pillow，也可以直接传入灰度 `numpy.ndarray`。
+"""
+
+import logging
+import os
+from threading import Lock
+from typing import Callable, Dict, List, Tuple, Union
+
+LOG = logging.getLogger("WCF")
+
+_CHUNKS = 4
+_CHUNK_BITS = 16
+_CHUNK_MASK = (1 << _CHUNK_BITS) - 1
+
+
+def _numpy():
+    try:
+        import numpy
+    except ImportError:
+        raise ImportError("感知哈希需要 numpy: pip install numpy")
+    return numpy
+
+
+def _gray(image, width: int, height: int):
+    """把图片路径、PIL 图片或二维数组缩放成 height x width 的灰度 float 数组"""
+    np = _numpy()
+    if isinstance(image, np.ndarray):
+        pixels = image.astype(np.float64)
+        if pixels.ndim == 3:
+            pixels = pixels[..., :3] @ np.array([0.299, 0.587, 0.114])
+        # 按块取平均缩放，与 PIL 的 BOX 缩放一致
+        rows = (np.arange(height) * pixels.shape[0]) // height
+        cols = (np.arange(width) * pixels.shape[1]) // width
+        sums = np.add.reduceat(np.add.reduceat(pixels, rows, axis=0), cols, axis=1)
+        counts = np.outer(np.diff(np.append(rows, pixels.shape[0])), np.diff(np.append(cols, pixels.shape[1])))
+        return sums / counts
+
+    try:
+        from PIL import Image
+    except ImportError:
+        raise ImportError("读取图片需要 Pillow: pip install Pillow")
+    if not isinstance(image, Image.Image):
+        with Image.open(image) as img:
+            return _gray(img, width, height)
+    return np.asarray(image.convert("L").resize((width, height), Image.BOX), dtype=np.float64)
+
+
+def _to_int(bits) -> int:
+    np = _numpy()
+    return int.from_bytes(np.packbits(bits.ravel().astype(np.uint8)).tobytes(), "big")
+
+
+def ahash(image) -> int:
+    """均值哈希：8x8 灰度图，高于均值记 1"""
+    pixels = _gray(image, 8, 8)
+    return _to_int(pixels > pixels.mean())
+
+
+def dhash(image) -> int:
+    """差值哈希：9x8 灰度图，每行相邻像素右边更亮记 1"""
+    pixels = _gray(image, 9, 8)
+    return _to_int(pixels[:, 1:] > pixels[:, :-1])
+
+
+_DCT = {}
+
+
+def _dct_matrix(n: int):
+    m = _DCT.get(n)
+    if m is None:
+        np = _numpy()
+        k = np.arange(n)
+        m = np.cos(np.pi * (2 * k[None, :] + 1) * k[:, None] / (2 * n)) * np.sqrt(2 / n)
+        m[0] /= np.sqrt(2)
+        _DCT[n] = m
+    return m
+
+
+def phash(image) -> int:
+    """DCT 哈希：32x32 灰度图做二维 DCT，取左上 8x8 低频系数，高于中位数（不含直流分量）记 1"""
+    np = _numpy()
+    c = _dct_matrix(32)
+    low = (c @ _gray(image, 32, 32) @ c.T)[:8, :8]
+    return _to_int(low > np.median(low.ravel()[1:]))
+
+
+HASHES: Dict[str, Callable] = {"ahash": ahash, "dhash": dhash, "phash": phash}
+
+
+def hamming(a: int, b: int) -> int:
+    """两个哈希的汉明距离"""
+    return bin(a ^ b).count("1")
+
+
+def _popcount(x):
+    np = _numpy()
+    if hasattr(np, "bitwise_count"):
+        return np.bitwise_count(x)
+    table = np.array([bin(i).count("1") for i in range(256)], dtype=np.uint8)
+    return table[x.view(np.uint8).reshape(-1, 8)].sum(axis=1)
+
+
+class HashIndex():
+    """感知哈希索引：增量插入、按汉明距离查找相似图片、保存到磁盘
+
+    新插入的哈希先放在缓冲区里线性扫描，攒满 `buffer` 个后并入有序表，插入与查询互不阻塞太久。
+
+    Args:
+        kind (str): 哈希算法，`ahash`、`dhash` 或 `phash`
+        buffer (int): 缓冲区大小
+
+    Example:
+        index = HashIndex.load("hashes.npz") if os.path.exists("hashes.npz") else HashIndex()
+        downloader.submit(msg, lambda f: index.add(f.result()))
+        index.find_similar("new.jpg", max_distance=8)
+    """
+
+    def __init__(self, kind: str = "phash", buffer: int = 8192) -> None:
+        np = _numpy()
+        if kind not in HASHES:
+            raise ValueError(f"不支持的哈希算法: {kind}")
+        self.kind = kind
+        self.buffer = buffer
+        self._keys = []
+        self._hashes = np.empty(0, dtype=np.uint64)
+        self._orders = [np.empty(0, dtype=np.uint32) for _ in range(_CHUNKS)]  # 各段值的排序下标
+        self._values = [np.empty(0, dtype=np.uint16) for _ in range(_CHUNKS)]  # 各段排好序的值
+        self._delta = np.empty(buffer, dtype=np.uint64)
+        self._nd = 0
+        self._flips = {}
+        self._lock = Lock()
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+    def hash_of(self, image) -> int:
+        """用本索引的算法计算哈希"""
+        return HASHES[self.kind](image)
+
+    def add(self, key: str, image=None) -> int:
+        """插入一张图片
+
+        Args:
+            key (str): 图片的标识，查询时返回，通常就是图片路径；不能包含换行
+            image: 图片路径、PIL 图片、灰度数组或已算好的哈希（int）；默认为 `key`
+
+        Returns:
+            int: 哈希
+        """
+        image = key if image is None else image
+        h = image if isinstance(image, int) else self.hash_of(image)
+        with self._lock:
+            if self._nd == self.buffer:
+                self._merge()
+            self._delta[self._nd] = h
+            self._nd += 1
+            self._keys.append(key)
+        return h
+
+    def _merge(self) -> None:
+        # 缓冲区单独排序后插入各段的有序表，不对整个索引重新排序
+        np = _numpy()
+        delta = self._delta[:self._nd].copy()
+        base = len(self._hashes)
+        orders, values = [], []
+        for i in range(_CHUNKS):
+            chunk = self._chunk(delta, i)
+            order = np.argsort(chunk, kind="stable")
+            chunk = chunk[order]
+            pos = np.searchsorted(self._values[i], chunk, "right")
+            orders.append(np.insert(self._orders[i], pos, (order + base).astype(np.uint32)))
+            values.append(np.insert(self._values[i], pos, chunk))
+        self._hashes = np.concatenate([self._hashes, delta])
+        self._orders, self._values = orders, values
+        self._nd = 0
+
+    def _build(self, hashes, orders=None) -> None:
+        np = _numpy()
+        self._hashes = hashes
+        if orders is None:
+            orders = [np.argsort(self._chunk(hashes, i), kind="stable").astype(np.uint32) for i in range(_CHUNKS)]
+        self._orders = orders
+        self._values = [self._chunk(hashes[o], i) for i, o in enumerate(orders)]
+
+    @staticmethod
+    def _chunk(hashes, i: int):
+        np = _numpy()
+        return ((hashes >> np.uint64(i * _CHUNK_BITS)) & np.uint64(_CHUNK_MASK)).astype(np.uint16)
+
+    def _masks(self, radius: int):
+        # 16 位内汉明距离不超过 `radius` 的所有异或掩码
+        masks = self._flips.get(radius)
+        if masks is None:
+            np = _numpy()
+            all16 = np.arange(1 << _CHUNK_BITS, dtype=np.uint32)
+            masks = self._flips[radius] = all16[_popcount(all16) <= radius].astype(np.uint16)
+        return masks
+
+    def find_similar(self, path_or_hash: Union[str, int], max_distance: int = 8,
+                     limit: int = None) -> List[Tuple[str, int]]:
+        """查找相似的图片
+
+        Args:
+            path_or_hash (str | int): 图片路径（或 PIL 图片、灰度数组）或哈希
+            max_distance (int): 最大汉明距离
+            limit (int): 最多返回多少个
+
+        Returns:
+            List[Tuple[str, int]]: [(key, 距离)]，按距离从小到大排列
+        """
+        np = _numpy()
+        q = path_or_hash if isinstance(path_or_hash, int) else self.hash_of(path_or_hash)
+        qa = np.uint64(q)
+        masks = self._masks(max_distance // _CHUNKS)
+
+        with self._lock:
+            hashes, keys = self._hashes, self._keys
+            found = []
+            if len(hashes):
+                parts = []
+                for i in range(_CHUNKS):
+                    targets = np.uint16((q >> (i * _CHUNK_BITS)) & _CHUNK_MASK) ^ masks
+                    lo = np.searchsorted(self._values[i], targets, "left")
+                    hi = np.searchsorted(self._values[i], targets, "right")
+                    lens = hi - lo
+                    total = int(lens.sum())
+                    if total:
+                        # 把各个 [lo, hi) 区间展开成下标，不逐个切片
+                        starts = np.repeat(lo - np.cumsum(lens) + lens, lens)
+                        parts.append(self._orders[i][starts + np.arange(total)])
+                if parts:
+                    idx = np.concatenate(parts)
+                    dist = _popcount(hashes[idx] ^ qa)
+                    ok = dist <= max_distance
+                    found.extend(dict(zip(idx[ok].tolist(), dist[ok].tolist())).items())  # 多段命中的去重
+
+            if self._nd:
+                dist = _popcount(self._delta[:self._nd] ^ qa)
+                ok = np.nonzero(dist <= max_distance)[0]
+                base = len(hashes)
+                found.extend(zip((ok + base).tolist(), dist[ok].tolist()))
+
+            found.sort(key=lambda x: x[1])
+            if limit is not None:
+                found = found[:limit]
+            return [(keys[i], d) for i, d in found]
+
+    def save(self, path: str) -> None:
+        """保存到 `path`（.npz），包括排好序的下标，加载时不用重新排序"""
+        np = _numpy()
+        with self._lock:
+            if self._nd:
+                self._merge()
+            keys = np.frombuffer("\n".join(self._keys).encode("utf-8"), dtype=np.uint8)
+            tmp = f"{path}.tmp"
+            with open(tmp, "wb") as f:
+                np.savez(f, *self._orders, kind=np.array(self.kind), hashes=self._hashes, keys=keys)
+            os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path: str, buffer: int = 8192) -> "HashIndex":
+        """从 `save` 保存的文件加载"""
+        np = _numpy()
+        data = np.load(path)
+        index = cls(str(data["kind"]), buffer)
+        keys = data["keys"].tobytes().decode("utf-8")
+        index._keys = keys.split("\n") if keys else []
+        index._build(data["hashes"], [data[f"arr_{i}"] for i in range(_CHUNKS)])
+        return index
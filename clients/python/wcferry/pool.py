@@ -0,0 +1,107 @@
+# -*- coding: utf-8 -*-
+
+import logging
+from concurrent.futures import Future
+from typing import Dict, List
+
+import pynng
+from wcferry import wcf_pb2
+from wcferry.mux import RequestMux
+
+# 耗时长的功能，开启专用通道后只走最后一条连接，不会堵住发消息等短请求
+SLOW_FUNCS = {
+    wcf_pb2.FUNC_EXEC_DB_QUERY,
+    wcf_pb2.FUNC_EXEC_OCR,
+    wcf_pb2.FUNC_DECRYPT_IMAGE,
+    wcf_pb2.FUNC_GET_AUDIO_MSG,
+}
+
+
+def dial(url: str, timeout: int = 5000) -> pynng.Pair1:
+    """连接命令通道，收发各 `timeout` 毫秒超时"""
+    sock = pynng.Pair1()
+    sock.send_timeout = timeout
+    sock.recv_timeout = timeout
+    sock.dial(url, block=True)
+    return sock
+
+
+class WcfPool():
+    """命令通道连接池：向同一地址建立 `size` 条连接，按未完成请求数最少的原则分配请求。
+
+    接口与 `RequestMux` 相同，可直接作为 `Wcf` 的请求通道（`Wcf(pool_size=N)`）。
+
+    注意：官方注入的 RPC 服务端使用单连接的 `Pair1` 监听，只接受一个对端，
+    需要服务端以多连接（polyamorous）方式监听或前置代理，连接池才能真正并行。
+
+    Args:
+        url (str): 命令通道地址，如 `tcp://127.0.0.1:10086`
+        size (int): 连接数
+        slow_lane (bool): 是否把 `SLOW_FUNCS` 固定分配到最后一条连接（`size` 大于 1 时有效）
+        primary (pynng.Socket): 已有的连接，作为第一条连接复用，关闭连接池时不会关闭它
+        timeout (int): 收发超时（毫秒）
+    """
+
+    def __init__(self, url: str, size: int = 2, slow_lane: bool = True, primary: pynng.Socket = None,
+                 timeout: int = 5000) -> None:
+        self.LOG = logging.getLogger("WCF")
+        self.url = url
+        self._owned = []
+        sockets = [primary] if primary else []
+        while len(sockets) < size:
+            sock = dial(url, timeout)
+            self._owned.append(sock)
+            sockets.append(sock)
+
+        self.sockets = sockets
+        self._lanes = [RequestMux(sock) for sock in sockets]
+        if slow_lane and size > 1:
+            self._fast, self._slow = self._lanes[:-1], self._lanes[-1:]
+        else:
+            self._fast, self._slow = self._lanes, self._lanes
+
+    def close(self) -> None:
+        """关闭所有通道及连接池自己建立的连接"""
+        for lane in self._lanes:
+            lane.close()
+        for sock in self._owned:
+            sock.close()
+
+    def _pick(self, func: int) -> RequestMux:
+        lanes = self._slow if func in SLOW_FUNCS else self._fast
+        return min(lanes, key=lambda lane: lane.pending)
+
+    def submit(self, req: wcf_pb2.Request) -> Future:
+        """提交请求，立即返回 `Future`，结果为 `wcf_pb2.Response`"""
+        return self._pick(req.func).submit(req)
+
+    def call(self, req: wcf_pb2.Request) -> wcf_pb2.Response:
+        """提交请求并等待响应，超时抛出 `pynng.Timeout`"""
+        return self.submit(req).result()
+
+    @property
+    def pending(self) -> int:
+        """所有连接上排队中与发送中的请求数"""
+        return sum(lane.pending for lane in self._lanes)
+
+    def stats(self) -> Dict[str, Dict]:
+        """合并所有连接的调用统计，格式同 `RequestMux.stats`"""
+        merged = {}
+        for lane in self._lanes:
+            for name, s in lane.stats().items():
+                m = merged.get(name)
+                if m is None:
+                    merged[name] = dict(s)
+                    continue
+                total = m["count"] + s["count"]
+                for key in ("queue_avg", "rtt_avg"):
+                    m[key] = (m[key] * m["count"] + s[key] * s["count"]) / max(total, 1)
+                for key in ("queue_max", "rtt_max"):
+                    m[key] = max(m[key], s[key])
+                m["errors"] += s["errors"]
+                m["count"] = total
+        return merged
+
+    def lane_stats(self) -> List[Dict[str, Dict]]:
+        """逐条连接的调用统计"""
+        return [lane.stats() for lane in self._lanes]
@@ -0,0 +1,255 @@
+# -*- coding: utf-8 -*-
+
+import logging
+import random
+from concurrent.futures import Future
+from threading import Lock
+from time import monotonic, sleep
+from typing import Callable, Dict, Iterable
+
+import pynng
+from wcferry import wcf_pb2
+from wcferry.completion import resolved
+
+# 重复执行没有副作用的功能，失败后可以放心重试；发消息、转发、撤回、群管理等不在其中
+IDEMPOTENT_FUNCS = frozenset({
+    wcf_pb2.FUNC_IS_LOGIN,
+    wcf_pb2.FUNC_GET_SELF_WXID,
+    wcf_pb2.FUNC_GET_MSG_TYPES,
+    wcf_pb2.FUNC_GET_CONTACTS,
+    wcf_pb2.FUNC_GET_DB_NAMES,
+    wcf_pb2.FUNC_GET_DB_TABLES,
+    wcf_pb2.FUNC_GET_USER_INFO,
+    wcf_pb2.FUNC_GET_AUDIO_MSG,
+    wcf_pb2.FUNC_EXEC_DB_QUERY,
+    wcf_pb2.FUNC_DOWNLOAD_ATTACH,
+    wcf_pb2.FUNC_GET_CONTACT_INFO,
+    wcf_pb2.FUNC_REFRESH_QRCODE,
+    wcf_pb2.FUNC_DECRYPT_IMAGE,
+    wcf_pb2.FUNC_EXEC_OCR,
+})
+
+# 可以重试的异常：超时、暂时不可用；连接被关闭等错误重试也没用
+RETRYABLE_ERRORS = (pynng.Timeout, pynng.TryAgain)
+
+
+def failed_response() -> wcf_pb2.Response:
+    """请求失败时代替响应返回：`func` 为 0，`status` 为 -1"""
+    return wcf_pb2.Response(status=-1)
+
+
+class CircuitOpenError(Exception):
+    """熔断期间被直接拒绝的请求"""
+
+
+class RetryPolicy():
+    """重试策略：指数退避加随机抖动，只重试幂等的功能
+
+    Args:
+        max_attempts (int): 最多尝试次数（含第一次）
+        base_delay (float): 第一次重试前的等待上限（秒），之后每次翻倍
+        max_delay (float): 单次等待上限（秒）
+        jitter (bool): 是否在 [0, 上限] 内随机等待，避免多个调用方同时重试
+        idempotent (Iterable[int]): 允许重试的 `Functions`
+    """
+
+    def __init__(self, max_attempts: int = 3, base_delay: float = 0.1, max_delay: float = 2.0, jitter: bool = True,
+                 idempotent: Iterable[int] = IDEMPOTENT_FUNCS) -> None:
+        self.max_attempts = max(1, max_attempts)
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.jitter = jitter
+        self.idempotent = frozenset(idempotent)
+
+    def attempts(self, func: int) -> int:
+        """`func` 最多尝试几次"""
+        return self.max_attempts if func in self.idempotent else 1
+
+    def backoff(self, retry: int) -> float:
+        """第 `retry` 次重试（从 1 开始）前的等待时间（秒）"""
+        delay = min(self.max_delay, self.base_delay * (2 ** (retry - 1)))
+        return random.uniform(0, delay) if self.jitter else delay
+
+
+class CircuitBreaker():
+    """熔断器：连续失败 `failure_threshold` 次后打开，`reset_timeout` 秒内的请求直接失败；
+    之后放行一个探测请求（半开），成功则关闭，失败则重新打开。
+
+    Args:
+        failure_threshold (int): 连续失败多少次后熔断
+        reset_timeout (float): 熔断持续时间（秒）
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 10) -> None:
+        self.LOG = logging.getLogger("WCF")
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._state = self.CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probing = False
+        self._lock = Lock()
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            if self._state == self.OPEN and monotonic() - self._opened_at >= self.reset_timeout:
+                return self.HALF_OPEN
+            return self._state
+
+    def allow(self) -> bool:
+        """是否放行本次请求"""
+        with self._lock:
+            if self._state == self.CLOSED:
+                return True
+
+            if self._state == self.OPEN:
+                if monotonic() - self._opened_at < self.reset_timeout:
+                    return False
+                self._state = self.HALF_OPEN
+
+            # 半开状态只放行一个探测请求
+            if self._probing:
+                return False
+            self._probing = True
+            return True
+
+    def record_success(self) -> None:
+        with self._lock:
+            if self._state != self.CLOSED:
+                self.LOG.info("RPC 服务恢复，熔断器关闭")
+            self._state = self.CLOSED
+            self._failures = 0
+            self._probing = False
+
+    def release(self) -> None:
+        """放行的请求没有发出（如被取消），不算成功也不算失败；半开状态下可以再放行一个探测请求"""
+        with self._lock:
+            self._probing = False
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self._failures += 1
+            self._probing = False
+            if self._state == self.HALF_OPEN or self._failures >= self.failure_threshold:
+                if self._state != self.OPEN:
+                    self.LOG.error(f"RPC 服务连续失败 {self._failures} 次，熔断 {self.reset_timeout} 秒")
+                self._state = self.OPEN
+                self._opened_at = monotonic()
+
+
+class RpcGuard():
+    """按 `RetryPolicy` 重试、经 `CircuitBreaker` 熔断地发送请求，并按功能统计失败次数
+
+    失败（重试用尽、熔断、不可重试的异常）时不抛异常、不退出进程，返回 `status` 为 -1 的空 `wcf_pb2.Response`，
+    调用方不会把没有发出或没有响应的请求当成成功（发消息等接口以 0 表示成功）。
+
+    Args:
+        retry (RetryPolicy): 重试策略，默认 `RetryPolicy()`
+        breaker (CircuitBreaker): 熔断器，默认 `CircuitBreaker()`；传入 `False` 关闭熔断
+    """
+
+    def __init__(self, retry: RetryPolicy = None, breaker: CircuitBreaker = None) -> None:
+        self.LOG = logging.getLogger("WCF")
+        self.retry = retry or RetryPolicy()
+        self.breaker = CircuitBreaker() if breaker is None else breaker
+        self._stats = {}
+        self._lock = Lock()
+
+    def _count(self, func: int, key: str, error: Exception = None) -> None:
+        with self._lock:
+            s = self._stats.setdefault(func, {"calls": 0, "retries": 0, "timeouts": 0, "errors": 0,
+                                              "rejected": 0, "failed": 0, "last_error": ""})
+            s[key] += 1
+            if error is not None:
+                s["last_error"] = repr(error)
+
+    def stats(self) -> Dict[str, Dict]:
+        """按功能统计的失败计数
+
+        Returns:
+            Dict[str, Dict]: {函数名: {calls, retries, timeouts, errors, rejected, failed, last_error}}
+        """
+        with self._lock:
+            return {wcf_pb2.Functions.Name(func): dict(s) for func, s in self._stats.items()}
+
+    def call(self, req: wcf_pb2.Request, send: Callable[[wcf_pb2.Request], wcf_pb2.Response]) -> wcf_pb2.Response:
+        func = req.func
+        self._count(func, "calls")
+        if self.breaker and not self.breaker.allow():
+            self._count(func, "rejected")
+            self._count(func, "failed")
+            self.LOG.error(f"Call {wcf_pb2.Functions.Name(func)} rejected: circuit open")
+            return failed_response()
+
+        attempts = self.retry.attempts(func)
+        for attempt in range(1, attempts + 1):
+            try:
+                rsp = send(req)
+            except RETRYABLE_ERRORS as e:
+                self._count(func, "timeouts", e)
+                error = e
+            except Exception as e:  # 其他异常不重试
+                self._count(func, "errors", e)
+                error = e
+                break
+            else:
+                if self.breaker:
+                    self.breaker.record_success()
+                return rsp
+
+            if attempt >= attempts:
+                break
+
+            self._count(func, "retries")
+            sleep(self.retry.backoff(attempt))
+
+        if self.breaker:
+            self.breaker.record_failure()
+        self._count(func, "failed")
+        self.LOG.error(f"Call {wcf_pb2.Functions.Name(func)} failed: {error}")
+        return failed_response()
+
+    def submit(self, req: wcf_pb2.Request, submit: Callable[[wcf_pb2.Request], Future]) -> Future:
+        """不等待响应地发出请求，结果同样计入失败统计与熔断器，但不重试：
+        流水线里失败的请求可能已经送达服务端，重发会重复执行
+
+        Args:
+            req (wcf_pb2.Request): 请求
+            submit (Callable): 提交请求、返回 `Future` 的通道，如 `RequestMux.submit`
+
+        Returns:
+            Future: 结果为 `wcf_pb2.Response`；熔断时抛出 `CircuitOpenError`，超时等失败时抛出对应异常
+        """
+        func = req.func
+        self._count(func, "calls")
+        if self.breaker and not self.breaker.allow():
+            self._count(func, "rejected")
+            self._count(func, "failed")
+            return resolved(error=CircuitOpenError(f"{wcf_pb2.Functions.Name(func)} 熔断中"))
+
+        future = submit(req)
+        future.add_done_callback(lambda f: self._settle(func, f))
+        return future
+
+    def _settle(self, func: int, future: Future) -> None:
+        if future.cancelled():
+            if self.breaker:
+                self.breaker.release()
+            return
+
+        error = future.exception()
+        if error is None:
+            if self.breaker:
+                self.breaker.record_success()
+            return
+
+        self._count(func, "timeouts" if isinstance(error, RETRYABLE_ERRORS) else "errors", error)
+        if self.breaker:
+            self.breaker.record_failure()
+        self._count(func, "failed")
+        self.LOG.error(f"Call {wcf_pb2.Functions.Name(func)} failed: {error}")
@@ -0,0 +1,109 @@
+# -*- coding: utf-8 -*-
+
+import re
+from threading import Lock
+from time import monotonic
+from typing import Dict
+
+from wcferry import rpc, wcf_pb2
+from wcferry import sql as sql_util
+from wcferry.wxmsg import WxMsg
+
+# 群成员变动的系统消息："xxx"邀请"yyy"加入了群聊、"xxx"通过扫描二维码加入群聊、你将"xxx"移出了群聊 等
+_MEMBER_CHANGED = re.compile(r"加入(?:了)?群聊|出了群聊")
+
+
+class _QueryFailed(Exception):
+    """查询失败（超时、熔断等），结果不缓存"""
+
+
+class RoomCache():
+    """群成员缓存：解析过的 `RoomData` 成员及 wxid → 昵称 常驻内存，查询为字典访问。
+
+    群成员在首次查询时加载；收到该群"加入了群聊/出了群聊"的系统消息（type 10000）时作废，
+    下次查询再重新加载。为防止漏掉消息（如未开启接收消息），超过 `ttl` 秒也会重新加载；
+    wxid → 昵称 表同样超过 `ttl` 秒重新加载，以便看到改过的昵称。查询失败时返回空结果，不缓存。
+
+    Args:
+        wcf (Wcf): 用于查询数据库的 `Wcf` 实例
+        ttl (float): 群成员最长缓存时间（秒）
+    """
+
+    def __init__(self, wcf, ttl: float = 3600) -> None:
+        self._wcf = wcf
+        self.ttl = ttl
+        self._rooms = {}       # roomid -> (加载时间, {wxid: 群昵称})
+        self._nicknames = None  # wxid -> 昵称
+        self._nicknames_at = 0.0
+        self._lock = Lock()
+
+    def _query(self, sql: str, params=None) -> list:
+        rsp = self._wcf._send_request(rpc.query_sql("MicroMsg.db", sql_util.bind(sql, params)))
+        if rsp.func != wcf_pb2.FUNC_EXEC_DB_QUERY:  # 失败时是空响应，不能当成查询结果缓存
+            raise _QueryFailed(sql)
+        return rpc.parse_rows(rsp)
+
+    def _load_nicknames(self) -> Dict[str, str]:
+        if self._nicknames is None or monotonic() - self._nicknames_at >= self.ttl:
+            contacts = self._query("SELECT UserName, NickName FROM Contact;")
+            self._nicknames = {c["UserName"]: c["NickName"] for c in contacts}
+            self._nicknames_at = monotonic()
+        return self._nicknames
+
+    def _load_room(self, roomid: str) -> Dict[str, str]:
+        entry = self._rooms.get(roomid)
+        if entry and monotonic() - entry[0] < self.ttl:
+            return entry[1]
+
+        crs = self._query("SELECT RoomData FROM ChatRoom WHERE ChatRoomName = ?;", (roomid,))
+        aliases = rpc.parse_room_members(crs[0].get("RoomData") if crs else b"", {})
+
+        # 新进群的人可能还不在昵称表里，只补查缺的
+        nicknames = self._load_nicknames()
+        missing = [wxid for wxid in aliases if wxid not in nicknames]
+        if missing:
+            marks = ",".join("?" * len(missing))
+            for c in self._query(f"SELECT UserName, NickName FROM Contact WHERE UserName IN ({marks});", missing):
+                nicknames[c["UserName"]] = c["NickName"]
+
+        self._rooms[roomid] = (monotonic(), aliases)
+        return aliases
+
+    def members(self, roomid: str) -> Dict[str, str]:
+        """获取群成员
+
+        Returns:
+            Dict[str, str]: {wxid: 群昵称，没有则为昵称}
+        """
+        with self._lock:
+            try:
+                aliases = self._load_room(roomid)
+            except _QueryFailed:
+                return {}
+            nicknames = self._nicknames
+            return {wxid: alias or nicknames.get(wxid, "") for wxid, alias in aliases.items()}
+
+    def alias(self, wxid: str, roomid: str) -> str:
+        """获取群名片，没有群名片则为昵称；不在群里返回空字符串"""
+        with self._lock:
+            try:
+                aliases = self._load_room(roomid)
+            except _QueryFailed:
+                return ""
+            if wxid not in aliases:
+                return ""
+            return aliases[wxid] or self._nicknames.get(wxid, "")
+
+    def invalidate(self, roomid: str = None) -> None:
+        """作废缓存；不指定 `roomid` 时作废全部（包括昵称表）"""
+        with self._lock:
+            if roomid is None:
+                self._rooms.clear()
+                self._nicknames = None
+            else:
+                self._rooms.pop(roomid, None)
+
+    def on_msg(self, msg: WxMsg) -> None:
+        """处理接收到的消息（`WxMsg` 或 `wcf_pb2.WxMsg`），群成员变动时作废对应的群"""
+        if msg.type == 10000 and msg.roomid and msg.roomid in self._rooms and _MEMBER_CHANGED.search(msg.content):
+            self.invalidate(msg.roomid)
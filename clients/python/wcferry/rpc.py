@@ -0,0 +1,342 @@
+# -*- coding: utf-8 -*-
+
+"""请求构造与响应解析
+
+`Wcf` 与 `AsyncWcf` 共用这里的函数，保证同步、异步两套接口发出的请求完全一致。
+"""
+
+import sys
+from typing import Dict, List
+
+from google.protobuf import json_format
+from wcferry import wcf_pb2
+from wcferry.wcf_pb2 import RoomData
+
+SQL_TYPES = {1: int, 2: float, 3: lambda x: x.decode("utf-8"), 4: bytes, 5: lambda x: None}
+
+
+def _request(func: int) -> wcf_pb2.Request:
+    req = wcf_pb2.Request()
+    req.func = func
+    return req
+
+
+def is_login() -> wcf_pb2.Request:
+    return _request(wcf_pb2.FUNC_IS_LOGIN)
+
+
+def get_qrcode() -> wcf_pb2.Request:
+    return _request(wcf_pb2.FUNC_REFRESH_QRCODE)
+
+
+def get_self_wxid() -> wcf_pb2.Request:
+    return _request(wcf_pb2.FUNC_GET_SELF_WXID)
+
+
+def get_msg_types() -> wcf_pb2.Request:
+    return _request(wcf_pb2.FUNC_GET_MSG_TYPES)
+
+
+def get_contacts() -> wcf_pb2.Request:
+    return _request(wcf_pb2.FUNC_GET_CONTACTS)
+
+
+def get_dbs() -> wcf_pb2.Request:
+    return _request(wcf_pb2.FUNC_GET_DB_NAMES)
+
+
+def get_tables(db: str) -> wcf_pb2.Request:
+    req = _request(wcf_pb2.FUNC_GET_DB_TABLES)
+    req.str = db
+    return req
+
+
+def get_user_info() -> wcf_pb2.Request:
+    return _request(wcf_pb2.FUNC_GET_USER_INFO)
+
+
+def get_audio_msg(id: int, dir: str) -> wcf_pb2.Request:
+    req = _request(wcf_pb2.FUNC_GET_AUDIO_MSG)
+    req.am.id = id
+    req.am.dir = dir
+    return req
+
+
+def send_text(msg: str, receiver: str, aters: str = "") -> wcf_pb2.Request:
+    req = _request(wcf_pb2.FUNC_SEND_TXT)
+    req.txt.msg = msg
+    req.txt.receiver = receiver
+    if aters:
+        req.txt.aters = aters
+    return req
+
+
+def send_image(path: str, receiver: str) -> wcf_pb2.Request:
+    req = _request(wcf_pb2.FUNC_SEND_IMG)
+    req.file.path = path
+    req.file.receiver = receiver
+    return req
+
+
+def send_file(path: str, receiver: str) -> wcf_pb2.Request:
+    req = _request(wcf_pb2.FUNC_SEND_FILE)
+    req.file.path = path
+    req.file.receiver = receiver
+    return req
+
+
+def send_xml(receiver: str, xml: str, type: int, path: str = None) -> wcf_pb2.Request:
+    req = _request(wcf_pb2.FUNC_SEND_XML)
+    req.xml.receiver = receiver
+    req.xml.content = xml
+    req.xml.type = type
+    if path:
+        req.xml.path = path
+    return req
+
+
+def send_emotion(path: str, receiver: str) -> wcf_pb2.Request:
+    req = _request(wcf_pb2.FUNC_SEND_EMOTION)
+    req.file.path = path
+    req.file.receiver = receiver
+    return req
+
+
+def send_rich_text(
+        name: str, account: str, title: str, digest: str, url: str, thumburl: str, receiver: str) -> wcf_pb2.Request:
+    req = _request(wcf_pb2.FUNC_SEND_RICH_TXT)
+    req.rt.name = name
+    req.rt.account = account
+    req.rt.title = title
+    req.rt.digest = digest
+    req.rt.url = url
+    req.rt.thumburl = thumburl
+    req.rt.receiver = receiver
+    return req
+
+
+def send_pat_msg(roomid: str, wxid: str) -> wcf_pb2.Request:
+    req = _request(wcf_pb2.FUNC_SEND_PAT_MSG)
+    req.pm.roomid = roomid
+    req.pm.wxid = wxid
+    return req
+
+
+def forward_msg(id: int, receiver: str) -> wcf_pb2.Request:
+    req = _request(wcf_pb2.FUNC_FORWARD_MSG)
+    req.fm.id = id
+    req.fm.receiver = receiver
+    return req
+
+
+def enable_receiving_msg(pyq: bool = False) -> wcf_pb2.Request:
+    req = _request(wcf_pb2.FUNC_ENABLE_RECV_TXT)
+    req.flag = pyq
+    return req
+
+
+def disable_recv_msg() -> wcf_pb2.Request:
+    return _request(wcf_pb2.FUNC_DISABLE_RECV_TXT)
+
+
+def query_sql(db: str, sql: str) -> wcf_pb2.Request:
+    req = _request(wcf_pb2.FUNC_EXEC_DB_QUERY)
+    req.query.db = db
+    req.query.sql = sql
+    return req
+
+
+def accept_new_friend(v3: str, v4: str, scene: int = 30) -> wcf_pb2.Request:
+    req = _request(wcf_pb2.FUNC_ACCEPT_FRIEND)
+    req.v.v3 = v3
+    req.v.v4 = v4
+    req.v.scene = scene
+    return req
+
+
+def receive_transfer(wxid: str, transferid: str, transactionid: str) -> wcf_pb2.Request:
+    req = _request(wcf_pb2.FUNC_RECV_TRANSFER)
+    req.tf.wxid = wxid
+    req.tf.tfid = transferid
+    req.tf.taid = transactionid
+    return req
+
+
+def refresh_pyq(id: int = 0) -> wcf_pb2.Request:
+    req = _request(wcf_pb2.FUNC_REFRESH_PYQ)
+    req.ui64 = id
+    return req
+
+
+def download_attach(id: int, thumb: str, extra: str) -> wcf_pb2.Request:
+    req = _request(wcf_pb2.FUNC_DOWNLOAD_ATTACH)
+    req.att.id = id
+    req.att.thumb = thumb
+    req.att.extra = extra
+    return req
+
+
+def get_info_by_wxid(wxid: str) -> wcf_pb2.Request:
+    req = _request(wcf_pb2.FUNC_GET_CONTACT_INFO)
+    req.str = wxid
+    return req
+
+
+def revoke_msg(id: int = 0) -> wcf_pb2.Request:
+    req = _request(wcf_pb2.FUNC_REVOKE_MSG)
+    req.ui64 = id
+    return req
+
+
+def decrypt_image(src: str, dir: str) -> wcf_pb2.Request:
+    req = _request(wcf_pb2.FUNC_DECRYPT_IMAGE)
+    req.dec.src = src
+    req.dec.dst = dir
+    return req
+
+
+def get_ocr_result(extra: str) -> wcf_pb2.Request:
+    req = _request(wcf_pb2.FUNC_EXEC_OCR)
+    req.str = extra
+    return req
+
+
+def add_chatroom_members(roomid: str, wxids: str) -> wcf_pb2.Request:
+    req = _request(wcf_pb2.FUNC_ADD_ROOM_MEMBERS)
+    req.m.roomid = roomid
+    req.m.wxids = wxids
+    return req
+
+
+def del_chatroom_members(roomid: str, wxids: str) -> wcf_pb2.Request:
+    req = _request(wcf_pb2.FUNC_DEL_ROOM_MEMBERS)
+    req.m.roomid = roomid
+    req.m.wxids = wxids.replace(" ", "")
+    return req
+
+
+def invite_chatroom_members(roomid: str, wxids: str) -> wcf_pb2.Request:
+    req = _request(wcf_pb2.FUNC_INV_ROOM_MEMBERS)
+    req.m.roomid = roomid
+    req.m.wxids = wxids.replace(" ", "")
+    return req
+
+
+def parse_msg_types(rsp: wcf_pb2.Response) -> Dict:
+    types = json_format.MessageToDict(rsp.types).get("types", {})
+    types = {int(k): v for k, v in types.items()}
+    return dict(sorted(dict(types).items()))
+
+
+def _contact_to_dict(cnt: Dict) -> Dict:
+    gender = cnt.get("gender", "")
+    if gender == 1:
+        gender = "男"
+    elif gender == 2:
+        gender = "女"
+    else:
+        gender = ""
+    return {
+        "wxid": cnt.get("wxid", ""),
+        "code": cnt.get("code", ""),
+        "remark": cnt.get("remark", ""),
+        "name": cnt.get("name", ""),
+        "country": cnt.get("country", ""),
+        "province": cnt.get("province", ""),
+        "city": cnt.get("city", ""),
+        "gender": gender}
+
+
+def parse_contacts(rsp: wcf_pb2.Response) -> List[Dict]:
+    contacts = json_format.MessageToDict(rsp.contacts).get("contacts", [])
+    return [_contact_to_dict(cnt) for cnt in contacts]
+
+
+def parse_dbs(rsp: wcf_pb2.Response) -> List[str]:
+    return json_format.MessageToDict(rsp.dbs).get("names", [])
+
+
+def parse_tables(rsp: wcf_pb2.Response) -> List[Dict]:
+    return json_format.MessageToDict(rsp.tables).get("tables", [])
+
+
+def parse_user_info(rsp: wcf_pb2.Response) -> Dict:
+    return json_format.MessageToDict(rsp.ui)
+
+
+def _decode_fields(fields, blob_view: bool) -> tuple:
+    # 逐字段内联判断，比查表调用转换函数快
+    row = []
+    append = row.append
+    for f in fields:
+        t = f.type
+        c = f.content
+        if t == 3:
+            append(c.decode("utf-8"))
+        elif t == 1:
+            append(int(c))
+        elif t == 2:
+            append(float(c))
+        elif t == 4:
+            append(memoryview(c) if blob_view else c)
+        else:
+            append(None)
+    return tuple(row)
+
+
+def parse_rows(rsp: wcf_pb2.Response, form: str = "dict", blob_view: bool = False):
+    """直接从 `DbRows` 解码查询结果，不经过 `MessageToDict` 与 base64 的来回转换
+
+    Args:
+        rsp (wcf_pb2.Response): `FUNC_EXEC_DB_QUERY` 的响应
+        form (str): 返回形式
+            - `dict`: List[Dict]，每行一个字典（默认，与原先一致）
+            - `tuple`: (列名列表, List[tuple])
+            - `columns`: Dict[列名, List]，按列存放
+        blob_view (bool): BLOB 字段是否以 `memoryview` 返回（不再复制）
+
+    Returns:
+        见 `form`
+    """
+    rows = rsp.rows.rows
+    columns = []
+    if rows:
+        # 同一结果集每行的列顺序相同，列名只取一次并驻留
+        columns = [sys.intern(f.column) for f in rows[0].fields]
+
+    ncol = len(columns)
+    values = []
+    for r in rows:
+        fields = r.fields
+        if len(fields) != ncol:  # 理论上不会出现，保险起见按字段名对齐
+            row = dict(zip([f.column for f in fields], _decode_fields(fields, blob_view)))
+            values.append(tuple(row.get(c) for c in columns))
+            continue
+        values.append(_decode_fields(fields, blob_view))
+
+    if form == "tuple":
+        return columns, values
+    if form == "columns":
+        return {c: list(col) for c, col in zip(columns, zip(*values))} if values else {c: [] for c in columns}
+    return [dict(zip(columns, v)) for v in values]
+
+
+def parse_ocr(rsp: wcf_pb2.Response) -> tuple:
+    if rsp.func != wcf_pb2.FUNC_EXEC_OCR:  # 请求失败（超时、熔断等）时是空响应，不是识别完成
+        return -1, ""
+    ocr = json_format.MessageToDict(rsp.ocr)
+    return ocr.get("status", 0), ocr.get("result", "")
+
+
+def parse_room_members(room_data: bytes, nicknames: Dict[str, str]) -> Dict[str, str]:
+    """解析 `ChatRoom.RoomData`，返回 {wxid: 群昵称}，没有群昵称的用 `nicknames` 里的昵称补上"""
+    members = {}
+    if not room_data:
+        return members
+
+    crd = RoomData()
+    crd.ParseFromString(room_data)
+    for member in crd.members:
+        members[member.wxid] = member.name if member.name else nicknames.get(member.wxid, "")
+
+    return members
@@ -0,0 +1,261 @@
+# -*- coding: utf-8 -*-
+
+import bisect
+import logging
+import os
+import re
+import struct
+import zlib
+from threading import Condition, Event, Lock, Thread
+from time import monotonic
+from typing import Dict, Iterator, List, Tuple
+
+from wcferry import wcf_pb2
+
+_HEADER = struct.Struct("<II")  # 长度、crc32
+_SEGMENT = re.compile(r"^(\d{20})\.seg$")
+
+
+class MsgSpool():
+    """接收消息的磁盘日志：先落盘再交给消费者，消费者处理完再确认，进程重启后从上次确认的位置重放
+
+    消息以 `[长度][crc32][wcf_pb2.WxMsg]` 追加写入分段文件 `<起始序号>.seg`，序号从 0 开始连续递增。
+    每攒 `sync_batch` 条或每隔 `sync_interval` 秒 fsync 一次，最多丢失这段时间内的消息；
+    段文件超过 `segment_bytes` 后新开一段，所有消费者都确认过的旧段会被删除（`compact`）。
+    打开时检查最后一段，丢弃写了一半的记录。
+
+    消费者确认可以乱序：`ack` 记录处理完的序号，已确认位置只推进到第一个还没确认的序号，
+    因此重启后没确认的消息一定会重放，可能重复但不会丢（至少一次）。
+
+    Args:
+        dir (str): 日志目录
+        segment_bytes (int): 单个段文件的大小上限（字节）
+        sync_interval (float): 最长多久 fsync 一次（秒）
+        sync_batch (int): 最多攒多少条 fsync 一次
+    """
+
+    def __init__(self, dir: str, segment_bytes: int = 64 << 20, sync_interval: float = 0.1,
+                 sync_batch: int = 1024) -> None:
+        self.LOG = logging.getLogger("WCF")
+        self.dir = dir
+        self.segment_bytes = segment_bytes
+        self.sync_interval = sync_interval
+        self.sync_batch = sync_batch
+        os.makedirs(dir, exist_ok=True)
+
+        self._lock = Lock()
+        self._appended = Condition(self._lock)
+        self._bases = sorted(int(m.group(1)) for m in map(_SEGMENT.match, os.listdir(dir)) if m)
+        if not self._bases:
+            self._bases = [0]
+        self._next = self._recover(self._bases[-1])
+        self._file = open(self._path(self._bases[-1]), "ab", buffering=1 << 20)
+        self._size = self._file.tell()
+        self._unsynced = 0
+        self._synced_at = monotonic()
+
+        self._committed = {}  # consumer -> 已确认位置（下一条要处理的序号）
+        self._acked = {}      # consumer -> 已确认位置之后、已经处理完的序号
+        self._dirty = set()   # 已确认位置变了、还没写盘的消费者
+        for fname in os.listdir(dir):
+            if fname.endswith(".offset"):
+                with open(os.path.join(dir, fname), "r") as f:
+                    self._committed[fname[:-len(".offset")]] = int(f.read().strip() or 0)
+
+        self._closed = Event()
+        self._thread = Thread(target=self._sync_loop, name="MsgSpool", daemon=True)
+        self._thread.start()
+
+    def _path(self, base: int) -> str:
+        return os.path.join(self.dir, f"{base:020d}.seg")
+
+    def _recover(self, base: int) -> int:
+        # 扫描最后一段，截掉末尾不完整或校验失败的记录，返回下一条的序号
+        path = self._path(base)
+        if not os.path.exists(path):
+            open(path, "wb").close()
+            return base
+        count, good = 0, 0
+        with open(path, "r+b") as f:
+            for _, end in self._scan(f):
+                count += 1
+                good = end
+            if good != f.seek(0, os.SEEK_END):
+                self.LOG.warning(f"消息日志 {path} 末尾有 {f.tell() - good} 字节不完整，已丢弃")
+                f.truncate(good)
+        return base + count
+
+    @staticmethod
+    def _scan(f) -> Iterator[Tuple[bytes, int]]:
+        # 从文件开头逐条读出 (消息, 结束位置)，遇到不完整或校验失败的记录停止
+        f.seek(0)
+        pos = 0
+        while True:
+            header = f.read(_HEADER.size)
+            if len(header) < _HEADER.size:
+                return
+            size, crc = _HEADER.unpack(header)
+            data = f.read(size)
+            if len(data) < size or zlib.crc32(data) != crc:
+                return
+            pos += _HEADER.size + size
+            yield data, pos
+
+    def append(self, msg) -> int:
+        """追加一条消息
+
+        Args:
+            msg (wcf_pb2.WxMsg | bytes): 消息或序列化好的消息
+
+        Returns:
+            int: 消息序号
+        """
+        data = msg if isinstance(msg, bytes) else msg.SerializeToString()
+        record = _HEADER.pack(len(data), zlib.crc32(data)) + data
+        with self._lock:
+            if self._size + len(record) > self.segment_bytes and self._size:
+                self._rotate()
+            self._file.write(record)
+            self._size += len(record)
+            offset = self._next
+            self._next += 1
+            self._unsynced += 1
+            if self._unsynced >= self.sync_batch:
+                self._sync()
+            self._appended.notify_all()
+        return offset
+
+    def _rotate(self) -> None:
+        # 持有 `_lock` 时调用
+        self._sync()
+        self._file.close()
+        self._bases.append(self._next)
+        self._file = open(self._path(self._next), "ab", buffering=1 << 20)
+        self._size = 0
+        self._compact()
+
+    def _sync(self) -> None:
+        # 持有 `_lock` 时调用
+        if self._unsynced:
+            self._file.flush()
+            os.fsync(self._file.fileno())
+            self._unsynced = 0
+        self._synced_at = monotonic()
+        for consumer in self._dirty:
+            path = os.path.join(self.dir, f"{consumer}.offset")
+            with open(f"{path}.tmp", "w") as f:
+                f.write(str(self._committed[consumer]))
+            os.replace(f"{path}.tmp", path)
+        self._dirty.clear()
+
+    def sync(self) -> None:
+        """立即把消息与各消费者的确认位置写盘"""
+        with self._lock:
+            self._sync()
+
+    def _sync_loop(self) -> None:
+        while not self._closed.wait(self.sync_interval):
+            with self._lock:
+                if (self._unsynced or self._dirty) and monotonic() - self._synced_at >= self.sync_interval:
+                    self._sync()
+
+    def read(self, start: int, max_n: int = None) -> Iterator[Tuple[int, wcf_pb2.WxMsg]]:
+        """从序号 `start` 开始按顺序读出已经写入的消息
+
+        Args:
+            start (int): 起始序号
+            max_n (int): 最多读多少条，默认读到末尾
+
+        Returns:
+            Iterator[Tuple[int, wcf_pb2.WxMsg]]: (序号, 消息)
+        """
+        with self._lock:
+            self._file.flush()
+            end = self._next
+            bases = list(self._bases)
+        if max_n is not None:
+            end = min(end, start + max_n)
+        start = max(start, bases[0])
+
+        i = max(bisect.bisect_right(bases, start) - 1, 0)
+        offset = bases[i]
+        while offset < end and i < len(bases):
+            try:
+                f = open(self._path(bases[i]), "rb")
+            except FileNotFoundError:  # 刚被 compact 删掉
+                i += 1
+                offset = bases[i] if i < len(bases) else end
+                continue
+            with f:
+                for data, _ in self._scan(f):
+                    if offset >= end:
+                        break
+                    if offset >= start:
+                        msg = wcf_pb2.WxMsg()
+                        msg.ParseFromString(data)
+                        yield offset, msg
+                    offset += 1
+            i += 1
+
+    def wait(self, offset: int, timeout: float = None) -> bool:
+        """等到序号 `offset` 的消息写入，超时返回 False"""
+        with self._lock:
+            return self._appended.wait_for(lambda: self._next > offset, timeout)
+
+    @property
+    def next_offset(self) -> int:
+        """下一条消息的序号"""
+        return self._next
+
+    def committed(self, consumer: str = "default") -> int:
+        """消费者的已确认位置：之前的消息都已处理完，重启后从这里重放"""
+        with self._lock:
+            return self._committed.setdefault(consumer, self._bases[0])  # 新消费者从最早保留的消息开始，并参与 compact
+
+    def ack(self, offset: int, consumer: str = "default") -> None:
+        """确认一条消息已经处理完，可以乱序确认"""
+        with self._lock:
+            committed = self._committed.setdefault(consumer, self._bases[0])
+            if offset < committed:
+                return
+            acked = self._acked.setdefault(consumer, set())
+            acked.add(offset)
+            while committed in acked:
+                acked.remove(committed)
+                committed += 1
+            if committed != self._committed[consumer]:
+                self._committed[consumer] = committed
+                self._dirty.add(consumer)
+
+    def _compact(self) -> List[int]:
+        # 持有 `_lock` 时调用：删除所有消费者都确认过的段，当前在写的段保留
+        low = min(self._committed.values(), default=self._bases[0])
+        removed = []
+        while len(self._bases) > 1 and self._bases[1] <= low:
+            base = self._bases.pop(0)
+            os.remove(self._path(base))
+            removed.append(base)
+        return removed
+
+    def compact(self) -> int:
+        """删除所有消费者都确认过的段，返回删除的段数；新开一段时会自动调用"""
+        with self._lock:
+            return len(self._compact())
+
+    def stats(self) -> Dict[str, int]:
+        """统计：{segments, first, next, bytes, 各消费者的 lag}"""
+        with self._lock:
+            size = sum(os.path.getsize(self._path(b)) for b in self._bases[:-1]) + self._size
+            result = {"segments": len(self._bases), "first": self._bases[0], "next": self._next, "bytes": size}
+            for consumer, committed in self._committed.items():
+                result[f"lag.{consumer}"] = self._next - committed
+            return result
+
+    def close(self) -> None:
+        if self._closed.is_set():
+            return
+        self._closed.set()
+        self._thread.join()
+        with self._lock:
+            self._sync()
+            self._file.close()
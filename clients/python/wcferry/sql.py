@@ -0,0 +1,236 @@
+# -*- coding: utf-8 -*-
+
+"""SQL 辅助函数：字面量转义、参数绑定、语句缓存、键集分页"""
+
+import math
+import re
+from collections import OrderedDict
+from collections.abc import Mapping
+from queue import Full, Queue
+from threading import Event, Lock, Thread
+from time import monotonic
+from typing import Any, Callable, Dict, Hashable, Iterator, List, Optional, Tuple, Union
+
+# 字符串字面量、带引号的标识符、注释、`?` 占位符、`:name` 占位符
+_TOKEN = re.compile(r"""('(?:[^']|'')*')|("(?:[^"]|"")*")|(--[^\n]*|/\*.*?(?:\*/|$))|(\?)|(?<![:\w]):([A-Za-z_]\w*)""",
+                    re.S)
+# 规范化时原样保留的部分：字符串字面量、带引号的标识符、注释
+_QUOTED = re.compile(r"""('(?:[^']|'')*'|"(?:[^"]|"")*"|--[^\n]*\n?|/\*.*?(?:\*/|$))""", re.S)
+_SPACES = re.compile(r"\s+")
+_MISSING = object()
+
+Params = Optional[Union[tuple, list, Mapping]]
+
+
+def literal(value: Any) -> str:
+    """把 Python 值转成 SQLite 字面量"""
+    if value is None:
+        return "NULL"
+    if isinstance(value, bool):
+        return "1" if value else "0"
+    if isinstance(value, float) and not math.isfinite(value):
+        # 与 sqlite3 绑定参数时一致：NaN 存为 NULL，无穷大写成溢出的实数
+        return "NULL" if math.isnan(value) else ("9e999" if value > 0 else "-9e999")
+    if isinstance(value, (int, float)):
+        return repr(value)
+    if isinstance(value, (bytes, bytearray, memoryview)):
+        return f"X'{bytes(value).hex()}'"
+    return "'" + str(value).replace("'", "''") + "'"
+
+
+def bind(sql: str, params: Params = None) -> str:
+    """把参数安全地代入 SQL：`?` 按顺序取 `params` 序列，`:name` 取 `params` 字典；引号内与注释里的内容不处理
+
+    服务端接口只接受完整的 SQL 文本，这里在客户端完成转义，避免拼接字符串带来的注入问题。
+
+    Args:
+        sql (str): 带占位符的 SQL，如 `SELECT NickName FROM Contact WHERE UserName = ?;`
+        params (tuple | list | Mapping): 参数
+
+    Returns:
+        str: 代入参数后的 SQL
+
+    Raises:
+        ValueError: 参数个数与占位符不匹配
+    """
+    if params is None:
+        return sql
+
+    named = isinstance(params, Mapping)
+    seq = iter(()) if named else iter(params)
+
+    def repl(m):
+        if m.group(1) or m.group(2) or m.group(3):
+            return m.group(0)
+        if m.group(4):
+            if named:
+                raise ValueError("`?` 占位符需要序列参数")
+            try:
+                return literal(next(seq))
+            except StopIteration:
+                raise ValueError("SQL 参数个数少于占位符个数")
+        if not named:
+            raise ValueError(f"`:{m.group(5)}` 占位符需要字典参数")
+        try:
+            return literal(params[m.group(5)])
+        except KeyError:
+            raise ValueError(f"缺少 SQL 参数: {m.group(5)}")
+
+    bound = _TOKEN.sub(repl, sql)
+    if next(seq, _MISSING) is not _MISSING:
+        raise ValueError("SQL 参数个数多于占位符个数")
+    return bound
+
+
+def normalize(sql: str) -> str:
+    """规范化 SQL 文本：合并引号外的空白，去掉结尾分号，使写法不同的同一语句得到相同的缓存键"""
+    parts = _QUOTED.split(sql.strip().rstrip(";").strip())
+    return "".join(p if i % 2 else _SPACES.sub(" ", p) for i, p in enumerate(parts))
+
+
+def params_key(params: Params) -> Hashable:
+    """把参数转成可作为缓存键的形式"""
+    if params is None:
+        return None
+    if isinstance(params, Mapping):
+        return tuple(sorted((k, _hashable(v)) for k, v in params.items()))
+    return tuple(_hashable(v) for v in params)
+
+
+def _hashable(value: Any) -> Hashable:
+    if isinstance(value, (bytearray, memoryview)):
+        return bytes(value)
+    return value
+
+
+class StatementCache():
+    """查询结果缓存：按 (数据库, 规范化 SQL, 参数) 缓存，超过 `ttl` 秒过期，超过 `maxsize` 条时淘汰最久未用的
+
+    Args:
+        maxsize (int): 最多缓存多少条结果
+        ttl (float): 过期时间（秒）
+    """
+
+    def __init__(self, maxsize: int = 256, ttl: float = 60) -> None:
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._data = OrderedDict()
+        self._lock = Lock()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def get(self, key: Hashable) -> Any:
+        """取缓存，未命中或已过期返回 None"""
+        with self._lock:
+            item = self._data.get(key)
+            if item is None or monotonic() - item[0] > self.ttl:
+                if item is not None:
+                    del self._data[key]
+                self.misses += 1
+                return None
+
+            self._data.move_to_end(key)
+            self.hits += 1
+            return item[1]
+
+    def put(self, key: Hashable, value: Any) -> None:
+        with self._lock:
+            self._data[key] = (monotonic(), value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, db: str = None) -> None:
+        """清空缓存；指定 `db` 时只清空该数据库的结果"""
+        with self._lock:
+            if db is None:
+                self._data.clear()
+                return
+            for key in [k for k in self._data if k[0] == db]:
+                del self._data[key]
+
+    def stats(self) -> Dict[str, int]:
+        """命中统计：{hits, misses, evictions, size}"""
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "evictions": self.evictions, "size": len(self._data)}
+
+
+def keyset_page(sql: str, key: str, last: Any, page_size: int) -> str:
+    """把 `sql` 包装成按 `key` 递增的一页：`key > last`，取 `page_size` 行
+
+    Args:
+        sql (str): 原始查询，结果里必须包含 `key` 列
+        key (str): 分页键，需唯一且有索引，如 `localId`
+        last (Any): 上一页最后一行的 `key`，`None` 表示第一页
+        page_size (int): 每页行数
+    """
+    sql = sql.strip().rstrip(";")
+    where = "" if last is None else f" WHERE {key} > {literal(last)}"
+    return f"SELECT * FROM ({sql}\n){where} ORDER BY {key} LIMIT {page_size};"  # 换行避免末尾的 `--` 注释吞掉括号
+
+
+def iter_pages(fetch: Callable[[str], Tuple[List[str], List[tuple]]], sql: str, key: str, page_size: int,
+               prefetch: bool = True) -> Iterator[Tuple[List[str], List[tuple]]]:
+    """逐页执行 `sql`，每次产出一页 (列名, 行)
+
+    Args:
+        fetch (Callable): 执行一条 SQL，返回 (列名, 元组列表)；空列表表示没有更多数据，查询失败时必须抛出异常
+        sql (str): 原始查询
+        key (str): 分页键
+        page_size (int): 每页行数
+        prefetch (bool): 是否在后台线程预取下一页
+    """
+    def pages():
+        last = None
+        while True:
+            columns, rows = fetch(keyset_page(sql, key, last, page_size))
+            if not rows:
+                return
+            yield columns, rows
+            if len(rows) < page_size:
+                return
+            last = rows[-1][columns.index(key)]
+
+    if not prefetch:
+        yield from pages()
+        return
+
+    q = Queue(maxsize=1)  # 最多缓存一页，内存占用与总行数无关
+    stop = Event()
+    done = object()
+
+    def put(item) -> bool:
+        while not stop.is_set():
+            try:
+                q.put(item, timeout=0.1)
+                return True
+            except Full:
+                continue
+        return False
+
+    def producer():
+        try:
+            for page in pages():
+                if not put(page):
+                    return
+        except Exception as e:
+            put(e)
+            return
+        put(done)
+
+    Thread(target=producer, name="SqlPrefetch", daemon=True).start()
+    try:
+        while True:
+            page = q.get()
+            if page is done:
+                return
+            if isinstance(page, Exception):
+                raise page
+            yield page
+    finally:
+        stop.set()
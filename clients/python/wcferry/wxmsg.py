@@ -5,34 +5,37 @@ from datetime import datetime
 
 from wcferry import wcf_pb2
 
+_AT_ALL = re.compile(r"@(?:所有人|all|All)")
+_NO_AT = frozenset()
 
-class WxMsg():
-    """微信消息
 
-    Attributes:
-        type (int): 消息类型，可通过 `get_msg_types` 获取
-        id (str): 消息 id
+def parse_atuserlist(xml: str) -> frozenset:
+    """从消息 xml 中取出 @ 名单（`<atuserlist>` 里逗号分隔的 wxid）
+
+    只用 `str.find` 定位标签，耗时与 xml 长度成线性，没有正则回溯。
+
+    Args:
         xml (str): 消息 xml 部分
-        sender (str): 消息发送人
-        roomid (str): （仅群消息有）群 id
-        content (str): 消息内容
-        thumb (str): 视频或图片消息的缩略图路径
-        extra (str): 视频或图片消息的路径
+
+    Returns:
+        frozenset: 被 @ 的 wxid，没有 @ 时为空
     """
+    start = xml.find("<atuserlist>")
+    if start < 0:
+        return _NO_AT
+    start += len("<atuserlist>")
+    end = xml.find("</atuserlist>", start)
+    if end < 0:
+        return _NO_AT
+    users = xml[start:end].strip()
+    if users.startswith("<![CDATA[") and users.endswith("]]>"):
+        users = users[len("<![CDATA["):-len("]]>")]
+    return frozenset(u for u in map(str.strip, users.split(",")) if u)
 
-    def __init__(self, msg: wcf_pb2.WxMsg) -> None:
-        self._is_self = msg.is_self
-        self._is_group = msg.is_group
-        self.type = msg.type
-        self.id = msg.id
-        self.ts = msg.ts
-        self.sign = msg.sign
-        self.xml = msg.xml
-        self.sender = msg.sender
-        self.roomid = msg.roomid
-        self.content = msg.content
-        self.thumb = msg.thumb
-        self.extra = msg.extra
+
+class _MsgMethods():
+    """`WxMsg` 与 `LazyWxMsg` 共用的方法，只通过属性访问字段"""
+    __slots__ = ()
 
     def __str__(self) -> str:
         s = f"{'自己发的:' if self._is_self else ''}"
@@ -51,15 +54,22 @@ class WxMsg():
         """是否群聊消息"""
         return self._is_group
 
+    def at_users(self) -> frozenset:
+        """被 @ 的 wxid；第一次调用时解析 xml 并缓存在消息上，之后修改 `xml` 不会更新"""
+        at = self._at
+        if at is None:
+            at = self._at = parse_atuserlist(self.xml)
+        return at
+
     def is_at(self, wxid) -> bool:
         """是否被 @：群消息，在 @ 名单里，并且不是 @ 所有人"""
         if not self.from_group():
             return False  # 只有群消息才能 @
 
-        if not re.findall(f"<atuserlist>[\s|\S]*({wxid})[\s|\S]*</atuserlist>", self.xml):
+        if wxid not in self.at_users():
             return False  # 不在 @ 清单里
 
-        if re.findall(r"@(?:所有人|all|All)", self.content):
+        if _AT_ALL.search(self.content):
             return False  # 排除 @ 所有人
 
         return True
@@ -67,3 +77,86 @@ class WxMsg():
     def is_text(self) -> bool:
         """是否文本消息"""
         return self.type == 1
+
+
+class WxMsg(_MsgMethods):
+    """微信消息
+
+    Attributes:
+        type (int): 消息类型，可通过 `get_msg_types` 获取
+        id (str): 消息 id
+        xml (str): 消息 xml 部分
+        sender (str): 消息发送人
+        roomid (str): （仅群消息有）群 id
+        content (str): 消息内容
+        thumb (str): 视频或图片消息的缩略图路径
+        extra (str): 视频或图片消息的路径
+        offset (int): 在消息日志（`MsgSpool`）中的序号，没有写入日志时为 None
+    """
+
+    def __init__(self, msg: wcf_pb2.WxMsg) -> None:
+        self._is_self = msg.is_self
+        self._is_group = msg.is_group
+        self.type = msg.type
+        self.id = msg.id
+        self.ts = msg.ts
+        self.sign = msg.sign
+        self.xml = msg.xml
+        self.sender = msg.sender
+        self.roomid = msg.roomid
+        self.content = msg.content
+        self.thumb = msg.thumb
+        self.extra = msg.extra
+        self.offset = None
+        self._at = None  # `at_users` 的缓存
+
+    def to_pb(self) -> wcf_pb2.WxMsg:
+        """转回 `wcf_pb2.WxMsg`，用于序列化"""
+        return wcf_pb2.WxMsg(is_self=self._is_self, is_group=self._is_group, id=self.id, type=self.type, ts=self.ts,
+                             roomid=self.roomid, content=self.content, sender=self.sender, sign=self.sign,
+                             thumb=self.thumb, extra=self.extra, xml=self.xml)
+
+
+# LazyWxMsg 属性名 -> wcf_pb2.WxMsg 字段名
+_LAZY_FIELDS = {"_is_self": "is_self", "_is_group": "is_group", "type": "type", "id": "id", "ts": "ts",
+                "sign": "sign", "xml": "xml", "sender": "sender", "roomid": "roomid", "content": "content",
+                "thumb": "thumb", "extra": "extra"}
+
+
+class LazyWxMsg(_MsgMethods):
+    """按需取字段的微信消息，用法与 `WxMsg` 相同
+
+    只保存解析好的 `wcf_pb2.WxMsg`，第一次访问某个字段时才从中取出并缓存在槽里；
+    只看 `type`、`roomid` 的消费者不会为 `xml`、`content` 等大字段创建字符串。
+    传入的 `msg` 之后不能再被修改或重新解析（例如循环里复用的 `Response`）。
+
+    Args:
+        msg (wcf_pb2.WxMsg): 消息
+    """
+    __slots__ = ("_pb", "offset", "_at") + tuple(_LAZY_FIELDS)
+
+    def __init__(self, msg: wcf_pb2.WxMsg) -> None:
+        self._pb = msg
+        self.offset = None
+        self._at = None
+
+    def __getattr__(self, name: str):
+        # 只有槽还没赋值时才会走到这里
+        field = _LAZY_FIELDS.get(name)
+        if field is None:
+            raise AttributeError(f"'LazyWxMsg' object has no attribute '{name}'")
+        value = getattr(self._pb, field)
+        setattr(self, name, value)
+        return value
+
+    def to_pb(self) -> wcf_pb2.WxMsg:
+        """转回 `wcf_pb2.WxMsg`，包括对字段的修改"""
+        pb = wcf_pb2.WxMsg()
+        pb.CopyFrom(self._pb)
+        for name, field in _LAZY_FIELDS.items():
+            try:
+                value = object.__getattribute__(self, name)
+            except AttributeError:
+                continue
+            setattr(pb, field, value)
+        return pb